@@ -1,20 +1,97 @@
 # app/main.py
+import asyncio
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 import uvicorn
 
+from app.models.disease_classifier import classifier
+from app.models.registry import model_registry
+from app.routes.admin import router as admin_router
 from app.routes.analysis import router as analysis_router
+from app.routes.jobs import router as jobs_router
+from app.routes.similarity import router as similarity_router
+from app.routes.stats import router as stats_router
+from app.routes.stream import router as stream_router
+from app.services.batching import batcher
+from app.services.executor import executor
+from app.services.jobs import get_job_queue
+from app.services.jobs.worker import JobWorker
+from app.services.model_manager import model_manager
+from app.services.prediction_log import prediction_log
+from app.services.upload import RequestBodyLimitMiddleware
 from app.utils.config import settings
+from app.utils.metrics import registry as metrics_registry
+
+logger = logging.getLogger(__name__)
+
+def _log_load_failure(task: asyncio.Task):
+    """Report a failed background model load; /ready returns the error"""
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"Background model load failed, service stays not ready: {classifier.load_error or task.exception()}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    executor.start()
+    batcher.start()
+    
+    # Load and warm up the model on the inference pool
+    warmup_batch_sizes = settings.WARMUP_BATCH_SIZES or sorted({1, settings.BATCH_MAX_SIZE})
+    load = executor.run_inference(classifier.load_and_warmup, warmup_batch_sizes, settings.WARMUP_ITERATIONS)
+    load_task = None
+    if settings.MODEL_BACKGROUND_LOAD:
+        load_task = asyncio.create_task(load)
+        load_task.add_done_callback(_log_load_failure)
+    else:
+        await load
+    
+    # Optional job worker sharing this process's model
+    job_worker_stop = asyncio.Event()
+    job_worker_task = None
+    if settings.JOB_WORKER_IN_PROCESS:
+        worker = JobWorker(get_job_queue(), settings.JOB_BATCH_SIZE, settings.JOB_POLL_TIMEOUT)
+        job_worker_task = asyncio.create_task(worker.run_in_process(job_worker_stop))
+    
+    # Follow model versions activated through the registry
+    watch_task = asyncio.create_task(model_manager.watch()) if model_registry.enabled else None
+    
+    # Write buffered analysis results to the prediction log in bulk
+    prediction_log_task = asyncio.create_task(prediction_log.run()) if prediction_log.enabled else None
+    
+    yield
+    
+    if load_task is not None and not load_task.done():
+        load_task.cancel()
+    if watch_task is not None:
+        watch_task.cancel()
+    if job_worker_task is not None:
+        job_worker_stop.set()
+        await job_worker_task
+    if prediction_log_task is not None:
+        # Cancelling runs the final flush, after the job worker's last results
+        prediction_log_task.cancel()
+        try:
+            await prediction_log_task
+        except asyncio.CancelledError:
+            pass
+    await batcher.stop()
+    executor.shutdown()
 
 app = FastAPI(
     title="Crop Disease Detection API",
     description="AI-powered crop disease detection using Vision Transformer",
     version="1.0.0",
     docs_url="/api/docs",
-    redoc_url="/api/redoc"
+    redoc_url="/api/redoc",
+    lifespan=lifespan
 )
 
-# CORS middleware
+# Oversized bodies are refused while arriving, before multipart parsing spools them
+app.add_middleware(RequestBodyLimitMiddleware)
+
+# CORS middleware (added last, so it wraps the 413s above too)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.ALLOWED_ORIGINS,
@@ -25,6 +102,11 @@ app.add_middleware(
 
 # Include routers
 app.include_router(analysis_router, prefix="/api/v1", tags=["analysis"])
+app.include_router(jobs_router, prefix="/api/v1", tags=["jobs"])
+app.include_router(similarity_router, prefix="/api/v1", tags=["similarity"])
+app.include_router(stats_router, prefix="/api/v1", tags=["stats"])
+app.include_router(stream_router, prefix="/api/v1", tags=["stream"])
+app.include_router(admin_router, prefix="/api/v1", tags=["admin"])
 
 # Health check endpoint
 @app.get("/")
@@ -35,6 +117,27 @@ async def root():
 async def health_check():
     return {"status": "healthy", "service": "crop-disease-detector"}
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe: 503 until the model is loaded and warmed up"""
+    if classifier.load_error is not None:
+        return JSONResponse(status_code=503, content={"status": "failed", "ready": False, "error": classifier.load_error})
+    if not classifier.is_ready:
+        return JSONResponse(status_code=503, content={"status": "starting", "ready": False})
+    # Lets a load balancer steer new requests away while the inference queue is full
+    if batcher.is_saturated:
+        return JSONResponse(
+            status_code=503,
+            content={"status": "overloaded", "ready": False, "waiting": batcher.waiting},
+            headers={"Retry-After": str(batcher.retry_after())}
+        )
+    return {"status": "ready", "ready": True, "model_loaded": classifier.backend is not None, "waiting": batcher.waiting}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics for this worker process"""
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     uvicorn.run(
         "app.main:app",
@@ -0,0 +1,21 @@
+# app/models/backends/__init__.py
+from typing import Dict, Type
+
+from app.models.backends.base import InferenceBackend
+from app.models.backends.eager import EagerBackend
+from app.models.backends.onnx_runtime import OnnxRuntimeBackend
+from app.models.backends.torchscript import TorchScriptBackend
+
+BACKENDS: Dict[str, Type[InferenceBackend]] = {
+    EagerBackend.name: EagerBackend,
+    TorchScriptBackend.name: TorchScriptBackend,
+    OnnxRuntimeBackend.name: OnnxRuntimeBackend,
+}
+
+
+def get_backend(name: str) -> Type[InferenceBackend]:
+    """Look up an inference backend class by its settings name"""
+    try:
+        return BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown inference backend '{name}'. Choose one of: {', '.join(BACKENDS)}")
@@ -0,0 +1,65 @@
+# app/models/backends/base.py
+from abc import ABC, abstractmethod
+from typing import List, Optional, Tuple
+
+import torch
+
+
+class InferenceBackend(ABC):
+    """A loaded ViT graph that maps a (N, C, H, W) pixel batch to class logits"""
+
+    name: str = ""
+    supported_precisions: Tuple[str, ...] = ("fp32",)
+
+    def __init__(self, device: torch.device, precision: str = "fp32"):
+        if precision not in self.supported_precisions:
+            raise ValueError(
+                f"The {self.name} backend does not support {precision} precision "
+                f"(supported: {', '.join(self.supported_precisions)})"
+            )
+        self.device = device
+        self.precision = precision
+
+    @abstractmethod
+    def load(self, model_path: str):
+        """Load the model artifacts from ``model_path``"""
+
+    def memory_bytes(self) -> int:
+        """Approximate bytes held by the loaded weights"""
+        return 0
+
+    @abstractmethod
+    def predict_batch(self, pixel_values: torch.Tensor) -> torch.Tensor:
+        """Run one forward pass and return (N, num_labels) logits"""
+
+    def predict_batch_with_exits(self, pixel_values: torch.Tensor) -> Tuple[torch.Tensor, Optional[List[int]]]:
+        """Logits plus the encoder layer each image exited after, or None without early exit"""
+        return self.predict_batch(pixel_values), None
+
+    def predict_batch_with_embeddings(
+        self, pixel_values: torch.Tensor, full_depth: bool = False
+    ) -> Tuple[torch.Tensor, Optional[List[int]], Optional[torch.Tensor]]:
+        """Logits, exit layers and the (N, hidden) final pooled embeddings, or None.
+
+        ``full_depth`` runs every encoder layer, without early exit, so every
+        image gets an embedding.
+        """
+        logits, exit_layers = self.predict_batch_with_exits(pixel_values)
+        return logits, exit_layers, None
+
+    def profile_modules(self) -> List[Tuple[str, torch.nn.Module]]:
+        """``(name, module)`` pairs whose forward a profiling trace labels, e.g. the encoder layers"""
+        return []
+
+    @property
+    def variant(self) -> str:
+        """Suffix distinguishing outputs of this configuration from plain fp32 (used in cache keys)"""
+        return "" if self.precision == "fp32" else self.precision
+
+    def warmup(self, batch_sizes: List[int], iterations: int, image_size: Tuple[int, int]):
+        """Run dummy batches to trigger one-time allocation and kernel selection"""
+        height, width = image_size
+        for batch_size in batch_sizes:
+            dummy = torch.zeros((batch_size, 3, height, width), device=self.device)
+            for _ in range(iterations):
+                self.predict_batch(dummy)
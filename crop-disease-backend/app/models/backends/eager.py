@@ -0,0 +1,143 @@
+# app/models/backends/eager.py
+import logging
+import os
+from typing import List, Optional, Tuple
+
+import torch
+import torch.nn as nn
+from transformers import ViTForImageClassification
+
+from app.models.backends.base import InferenceBackend
+from app.models.early_exit import EarlyExitModel, ExitHeads
+from app.models.encoder import encoder_layers, pool
+from app.models.mmap_weights import load_mmap_model
+from app.models.token_merging import TokenMerger, parse_schedule
+from app.utils.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class EagerBackend(InferenceBackend):
+    """Plain PyTorch eager execution of ``ViTForImageClassification``.
+
+    Supports reduced precision: ``int8-dynamic`` quantizes the Linear layers
+    (which dominate vit-tiny CPU time) with dynamic int8 activations, and
+    ``bf16`` casts the weights to bfloat16, halving their resident memory.
+    """
+
+    name = "eager"
+    supported_precisions = ("fp32", "int8-dynamic", "bf16")
+
+    def __init__(self, device: torch.device, precision: str = "fp32"):
+        super().__init__(device, precision)
+        self.model = None
+        self.early_exit: Optional[EarlyExitModel] = None
+        self.merger: Optional[TokenMerger] = None
+
+    def load(self, model_path: str):
+        if self._can_mmap():
+            # Weights stay in the page cache, shared by every worker process
+            self.model = load_mmap_model(model_path)
+            self._load_options(model_path)
+            return
+
+        model = ViTForImageClassification.from_pretrained(model_path)
+        model.eval()
+
+        if self.precision == "int8-dynamic":
+            # Dynamic quantization only has CPU kernels
+            model = torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+            self.device = torch.device("cpu")
+        elif self.precision == "bf16":
+            model = model.to(torch.bfloat16)
+
+        self.model = model.to(self.device)
+        self._load_options(model_path)
+
+    def _load_options(self, model_path: str):
+        if settings.TOKEN_MERGING_ENABLED:
+            self.enable_token_merging(parse_schedule(settings.TOKEN_MERGING_SCHEDULE, len(encoder_layers(self.model))))
+        if settings.EARLY_EXIT_ENABLED:
+            self._load_exit_heads(model_path)
+
+    def enable_token_merging(self, schedule: List[int]):
+        """Merge ``schedule[i]`` tokens after the attention of layer ``i`` (all zeros turns merging off)"""
+        self.merger = TokenMerger(self.model, schedule) if any(schedule) else None
+        if self.early_exit is not None:
+            self.early_exit.merger = self.merger
+        if self.merger is not None:
+            logger.info(f"Token merging with schedule {schedule}")
+
+    def _load_exit_heads(self, model_path: str):
+        path = os.path.join(model_path, settings.EARLY_EXIT_HEADS_FILE)
+        if not os.path.exists(path):
+            logger.warning(f"Early exit enabled but no heads at {path}; run fit_exit_heads.py")
+            return
+        heads = ExitHeads.load(path).to(self.device)
+        self.early_exit = EarlyExitModel(self.model, heads, settings.EARLY_EXIT_THRESHOLD, self.merger)
+        logger.info(f"Early exit after layers {heads.layers} at confidence {settings.EARLY_EXIT_THRESHOLD}")
+
+    @property
+    def variant(self) -> str:
+        parts = [super().variant]
+        if self.merger is not None:
+            parts.append("tome" + "-".join(str(count) for count in self.merger.schedule))
+        if self.early_exit is not None:
+            parts.append(f"exit{self.early_exit.threshold}")
+        return "+".join(filter(None, parts))
+
+    def profile_modules(self) -> List[Tuple[str, torch.nn.Module]]:
+        if self.model is None:
+            return []
+        vit = self.model.vit
+        return [
+            ("vit.embeddings", vit.embeddings),
+            *((f"vit.layer.{i}", layer) for i, layer in enumerate(encoder_layers(self.model))),
+            ("vit.layernorm", vit.layernorm),
+            ("classifier", self.model.classifier),
+        ]
+
+    def _can_mmap(self) -> bool:
+        # Reduced precision rewrites the weights, which would copy every page anyway
+        return settings.MODEL_MMAP_WEIGHTS and self.precision == "fp32" and self.device.type == "cpu"
+
+    def memory_bytes(self) -> int:
+        if self.model is None:
+            return 0
+        total = 0
+        for value in self.model.state_dict().values():
+            # Dynamically quantized Linear layers store (weight, bias) tuples
+            tensors = value if isinstance(value, (tuple, list)) else (value,)
+            total += sum(t.numel() * t.element_size() for t in tensors if isinstance(t, torch.Tensor))
+        return total
+
+    def predict_batch_with_exits(self, pixel_values: torch.Tensor) -> Tuple[torch.Tensor, Optional[List[int]]]:
+        if self.early_exit is None:
+            return self.predict_batch(pixel_values), None
+        with torch.inference_mode():
+            logits, exit_layers, _ = self.early_exit(pixel_values.to(self.device))
+            return logits, exit_layers
+
+    def predict_batch_with_embeddings(
+        self, pixel_values: torch.Tensor, full_depth: bool = False
+    ) -> Tuple[torch.Tensor, Optional[List[int]], Optional[torch.Tensor]]:
+        with torch.inference_mode():
+            pixel_values = pixel_values.to(self.device)
+            if self.early_exit is not None and not full_depth:
+                return self.early_exit(pixel_values)
+            if self.merger is not None:
+                pooled = pool(self.model, self.merger.encode(pixel_values))
+            else:
+                if self.precision == "bf16":
+                    pixel_values = pixel_values.to(torch.bfloat16)
+                # The same computation as the model's own forward, keeping the classifier input
+                pooled = self.model.vit(pixel_values).last_hidden_state[:, 0]
+            return self.model.classifier(pooled).float(), None, pooled.float()
+
+    def predict_batch(self, pixel_values: torch.Tensor) -> torch.Tensor:
+        with torch.inference_mode():
+            if self.merger is not None:
+                return self.merger(pixel_values.to(self.device))
+            if self.precision == "bf16":
+                return self.model(pixel_values.to(torch.bfloat16)).logits.float()
+            return self.model(pixel_values.to(self.device)).logits
@@ -0,0 +1,46 @@
+# app/models/backends/onnx_runtime.py
+import os
+
+import torch
+
+from app.models.backends.base import InferenceBackend
+from app.utils.config import settings
+
+
+class OnnxRuntimeBackend(InferenceBackend):
+    """ONNX Runtime CPU session over the graph produced by ``export_model.py``"""
+
+    name = "onnx"
+
+    def __init__(self, device: torch.device, precision: str = "fp32"):
+        super().__init__(device, precision)
+        self.session = None
+        self.input_name = None
+        self.artifact_bytes = 0
+
+    def load(self, model_path: str):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError("The onnx backend requires the onnxruntime package") from e
+
+        path = os.path.join(model_path, settings.ONNX_FILE)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"ONNX artifact not found at {path}; run export_model.py first")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if settings.TORCH_NUM_THREADS > 0:
+            options.intra_op_num_threads = settings.TORCH_NUM_THREADS
+        if settings.TORCH_INTEROP_THREADS > 0:
+            options.inter_op_num_threads = settings.TORCH_INTEROP_THREADS
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        self.artifact_bytes = os.path.getsize(path)
+
+    def memory_bytes(self) -> int:
+        return self.artifact_bytes
+
+    def predict_batch(self, pixel_values: torch.Tensor) -> torch.Tensor:
+        outputs = self.session.run(None, {self.input_name: pixel_values.cpu().numpy()})
+        return torch.from_numpy(outputs[0])
@@ -0,0 +1,34 @@
+# app/models/backends/torchscript.py
+import os
+
+import torch
+
+from app.models.backends.base import InferenceBackend
+from app.utils.config import settings
+
+
+class TorchScriptBackend(InferenceBackend):
+    """Traced and frozen TorchScript graph produced by ``export_model.py``"""
+
+    name = "torchscript"
+
+    def __init__(self, device: torch.device, precision: str = "fp32"):
+        super().__init__(device, precision)
+        self.module = None
+        self.artifact_bytes = 0
+
+    def load(self, model_path: str):
+        path = os.path.join(model_path, settings.TORCHSCRIPT_FILE)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"TorchScript artifact not found at {path}; run export_model.py first")
+        self.module = torch.jit.load(path, map_location=self.device)
+        self.module.eval()
+        self.artifact_bytes = os.path.getsize(path)
+
+    def memory_bytes(self) -> int:
+        # Frozen graphs hold weights as constants, so use the artifact size
+        return self.artifact_bytes
+
+    def predict_batch(self, pixel_values: torch.Tensor) -> torch.Tensor:
+        with torch.inference_mode():
+            return self.module(pixel_values)
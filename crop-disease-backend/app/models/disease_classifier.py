@@ -1,100 +1,384 @@
 # app/models/disease_classifier.py
 import torch
 import torch.nn as nn
-from transformers import ViTForImageClassification, ViTImageProcessor
 from PIL import Image
 import numpy as np
 import logging
-from typing import Tuple, Dict, Any
+from typing import Tuple, Dict, Any, Iterator, List, Optional
+from contextlib import contextmanager
+import gc
 import os
+import json
+import threading
+import time
 
+from app.models.backends import InferenceBackend, get_backend
+from app.models.precision import PrecisionGateError, evaluate_precision
+from app.models.preprocessing import TensorPreprocessor
+from app.models.registry import model_registry
+from app.utils import profiling
 from app.utils.config import settings
+from app.utils.metrics import (
+    BATCH_SIZE, EXIT_LAYER, MOCK_PREDICTIONS, PREDICTIONS, STAGE_SECONDS, CallbackMetric, registry
+)
 
 logger = logging.getLogger(__name__)
 
+# (class name, confidence in percent, class index, encoder layer it exited after or None,
+#  pooled float32 embedding or None, version of the model that made it or None for mocks)
+Prediction = Tuple[str, float, int, Optional[int], Optional[np.ndarray], Optional[str]]
+
+class LoadedModel:
+    """One loaded model version and a count of the batches running on it"""
+    
+    def __init__(self, backend: InferenceBackend, preprocessor: TensorPreprocessor,
+                 model_config: Dict[str, Any], model_version: str, base_version: str, path: str):
+        self.backend = backend
+        self.preprocessor = preprocessor
+        self.model_config = model_config
+        self.model_version = model_version
+        self.base_version = base_version
+        self.path = path
+        self.loaded_at = time.time()
+        self.leases = 0
+        self.retired = False
+
 class CropDiseaseClassifier:
+    """Serves the active model version, which ``swap_model`` replaces without downtime.
+    
+    Each batch leases the model that is active when it starts and uses it
+    throughout, so a swap never mixes versions within a batch and in-flight
+    batches finish on the old version. A replaced version is freed when its
+    last lease is returned.
+    """
+    
     def __init__(self):
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        self.model = None
-        self.processor = None
         self.class_names = settings.DISEASE_CLASSES
         self.is_loaded = False
-        self.load_model()
+        self.is_ready = False
+        self.load_error: Optional[str] = None
+        self._model: Optional[LoadedModel] = None
+        self._draining: List[LoadedModel] = []
+        self._default_preprocessor = TensorPreprocessor()
+        self._lease_lock = threading.Lock()
+        self._swap_lock = threading.Lock()
+    
+    @property
+    def backend(self) -> Optional[InferenceBackend]:
+        model = self._model
+        return model.backend if model is not None else None
+    
+    @property
+    def preprocessor(self) -> TensorPreprocessor:
+        model = self._model
+        return model.preprocessor if model is not None else self._default_preprocessor
+    
+    @property
+    def model_config(self) -> Dict[str, Any]:
+        """Architecture settings from ``config.json`` (hidden size, heads, patch size, ...)"""
+        model = self._model
+        return model.model_config if model is not None else {}
+    
+    @property
+    def model_version(self) -> str:
+        """Version of the active model; precision and speedups are part of it"""
+        model = self._model
+        return model.model_version if model is not None else self._base_model_version(settings.MODEL_PATH)
+    
+    @property
+    def model_path(self) -> Optional[str]:
+        model = self._model
+        return model.path if model is not None else None
+    
+    @property
+    def draining(self) -> List[Dict[str, Any]]:
+        """Replaced versions still finishing in-flight batches"""
+        with self._lease_lock:
+            return [{"model_version": model.model_version, "leases": model.leases} for model in self._draining]
+    
+    def load_and_warmup(self, batch_sizes: List[int], iterations: int):
+        """Load the model and run warmup batches; marks the classifier ready when done"""
+        started = time.perf_counter()
+        try:
+            # A pre-fork master (serve.py) may already have loaded shared weights
+            if not self.is_loaded:
+                self.load_model()
+            self.warmup(batch_sizes, iterations)
+        except Exception as e:
+            # Kept for /ready: with a background load nobody else sees the exception
+            self.load_error = f"{type(e).__name__}: {str(e)}"
+            raise
+        self.load_error = None
+        self.is_ready = True
+        logger.info(f"Classifier ready in {time.perf_counter() - started:.2f}s")
+    
+    def warmup(self, batch_sizes: List[int], iterations: int):
+        """Run dummy batches so the first real request doesn't pay one-time allocation costs"""
+        if self.backend is None or iterations <= 0:
+            return
+        
+        image_size = (self.preprocessor.height, self.preprocessor.width)
+        self.backend.warmup(batch_sizes, iterations, image_size)
+        logger.info(f"Warmed up batch sizes {batch_sizes} x {iterations} iterations")
     
     def load_model(self):
-        """Load the ViT model from local path"""
+        """Load the ViT model from local path (the registry's active version, if any)"""
         try:
-            model_path = settings.MODEL_PATH
+            model_path = model_registry.resolve(settings.MODEL_PATH)
+            self.configure_threads()
             
-            if os.path.exists(model_path):
-                logger.info(f"Loading model from local path: {model_path}")
-                
-                # Load model and processor
-                self.model = ViTForImageClassification.from_pretrained(model_path)
-                self.processor = ViTImageProcessor.from_pretrained(model_path)
-                
-                # Move model to appropriate device
-                self.model.to(self.device)
-                self.model.eval()
-                
-                logger.info(f"Model loaded successfully with {len(self.class_names)} classes")
-                logger.info(f"Model classes: {self.class_names}")
-                
-            else:
-                logger.warning(f"Model not found at {model_path}")
-                self.model = None
-                self.processor = None
+            if not os.path.exists(model_path):
+                raise FileNotFoundError(f"Model not found at {model_path}")
             
+            logger.info(f"Loading model from local path: {model_path}")
+            self._model = self._load(model_path)
+            logger.info(f"Model classes: {self.class_names}")
             self.is_loaded = True
             
-        except Exception as e:
-            logger.error(f"Error loading model: {str(e)}")
+        except PrecisionGateError:
             self.is_loaded = False
+            raise
+        except Exception as e:
+            if not settings.MODEL_MOCK_FALLBACK:
+                logger.error(f"Error loading model: {str(e)}")
+                self.is_loaded = False
+                raise
+            logger.warning(f"Error loading model, serving mock predictions: {str(e)}")
+            self._model = None
+            self.is_loaded = True
+    
+    @staticmethod
+    def configure_threads():
+        """Apply the torch thread counts from settings (tuned by the serving profile)"""
+        if settings.TORCH_NUM_THREADS > 0:
+            torch.set_num_threads(settings.TORCH_NUM_THREADS)
+        interop = settings.TORCH_INTEROP_THREADS
+        if interop > 0 and torch.get_num_interop_threads() != interop:
+            try:
+                torch.set_num_interop_threads(interop)
+            except RuntimeError as e:
+                # Only allowed before the process first runs inter-op parallel work
+                logger.warning(f"Could not set {interop} interop threads: {str(e)}")
+        logger.info(
+            f"Torch using {torch.get_num_threads()} intra-op and {torch.get_num_interop_threads()} interop threads"
+        )
+    
+    def _load(self, model_path: str) -> LoadedModel:
+        """Load the configured inference backend and the rescale/normalize constants"""
+        backend = get_backend(settings.INFERENCE_BACKEND)(self.device, settings.INFERENCE_PRECISION)
+        backend.load(model_path)
+        preprocessor = TensorPreprocessor.from_pretrained(model_path)
+        
+        if backend.precision != "fp32":
+            self.check_precision_gate(backend, model_path, preprocessor)
+        # Precision and early exit change outputs, so they are part of the version
+        base_version = self._base_model_version(model_path)
+        model_version = "+".join(filter(None, [base_version, backend.variant]))
+        
+        logger.info(
+            f"Model {model_version} loaded successfully with {backend.name} backend ({backend.precision}) "
+            f"and {len(self.class_names)} classes"
+        )
+        return LoadedModel(
+            backend, preprocessor, self._read_model_config(model_path), model_version, base_version, model_path
+        )
+    
+    def swap_model(self, model_path: str, batch_sizes: List[int], iterations: int) -> LoadedModel:
+        """Load and warm up another model version, then make it active in one step.
+        
+        Runs next to serving: requests keep using the current version until
+        the switch, and batches already running finish on it.
+        """
+        with self._swap_lock:
+            started = time.perf_counter()
+            model = self._load(model_path)
+            if iterations > 0:
+                image_size = (model.preprocessor.height, model.preprocessor.width)
+                model.backend.warmup(batch_sizes, iterations, image_size)
+            
+            with self._lease_lock:
+                old, self._model = self._model, model
+                self.is_loaded = True
+                drained = False
+                if old is not None:
+                    old.retired = True
+                    drained = old.leases == 0
+                    if not drained:
+                        self._draining.append(old)
+            
+            logger.info(
+                f"Swapped model {old.model_version if old is not None else None} -> {model.model_version} "
+                f"after {time.perf_counter() - started:.2f}s loading and warming up"
+            )
+            if drained:
+                self._free(old)
+            return model
+    
+    @contextmanager
+    def lease(self) -> Iterator[Optional[LoadedModel]]:
+        """The active model, kept loaded until the block exits even if it is swapped out"""
+        with self._lease_lock:
+            model = self._model
+            if model is not None:
+                model.leases += 1
+        try:
+            yield model
+        finally:
+            if model is not None:
+                with self._lease_lock:
+                    model.leases -= 1
+                    drained = model.retired and model.leases == 0
+                    if drained and model in self._draining:
+                        self._draining.remove(model)
+                if drained:
+                    self._free(model)
+    
+    @staticmethod
+    def _free(model: LoadedModel):
+        """Drop a replaced version's weights now that nothing runs on it"""
+        model.backend = None
+        gc.collect()
+        logger.info(f"Freed model {model.model_version} after draining")
+    
+    @property
+    def embedding_version(self) -> str:
+        """Version whose embeddings are comparable: the base model, whatever the precision or speedups"""
+        model = self._model
+        return model.base_version if model is not None else self._base_model_version(settings.MODEL_PATH)
+    
+    @staticmethod
+    def _base_model_version(model_path: str) -> str:
+        # MODEL_VERSION names MODEL_PATH; registry versions are named by their directory
+        if settings.MODEL_VERSION and os.path.normpath(model_path) == os.path.normpath(settings.MODEL_PATH):
+            return settings.MODEL_VERSION
+        return os.path.basename(os.path.normpath(model_path))
+    
+    @staticmethod
+    def _read_model_config(model_path: str) -> Dict[str, Any]:
+        """Architecture settings from ``config.json`` (hidden size, heads, patch size, ...)"""
+        config_path = os.path.join(model_path, "config.json")
+        if not os.path.exists(config_path):
+            return {}
+        with open(config_path, "r") as f:
+            return json.load(f)
+    
+    def check_precision_gate(self, backend: InferenceBackend, model_path: str, preprocessor: TensorPreprocessor):
+        """Refuse a reduced-precision backend whose top-1 agreement with fp32 is too low"""
+        if not settings.PRECISION_EVAL_DIR:
+            logger.warning(
+                f"Serving {backend.precision} without an accuracy check; "
+                f"set PRECISION_EVAL_DIR to gate it against fp32"
+            )
+            return
+        
+        reference = get_backend("eager")(backend.device, "fp32")
+        reference.load(model_path)
+        report = evaluate_precision(
+            reference, backend, preprocessor, self.class_names,
+            settings.PRECISION_EVAL_DIR, limit=settings.PRECISION_EVAL_LIMIT
+        )
+        del reference
+        logger.info(f"Precision evaluation: {report}")
+        
+        if report["top1_agreement"] < settings.PRECISION_MIN_AGREEMENT:
+            raise PrecisionGateError(
+                f"{backend.precision} top-1 agreement {report['top1_agreement']:.4f} is below "
+                f"PRECISION_MIN_AGREEMENT {settings.PRECISION_MIN_AGREEMENT}"
+            )
     
     def preprocess_image(self, image: Image.Image) -> torch.Tensor:
         """Preprocess image for ViT model"""
+        return self.preprocess_batch([image])
+    
+    def preprocess_batch(self, images: List[Image.Image], model: Optional[LoadedModel] = None) -> torch.Tensor:
+        """Preprocess a list of images into a single (N, C, H, W) tensor"""
+        preprocessor = model.preprocessor if model is not None else self.preprocessor
         try:
-            if self.processor:
-                inputs = self.processor(images=image, return_tensors="pt")
-                return inputs.pixel_values.to(self.device)
-            else:
-                # Fallback preprocessing
-                image = image.resize((224, 224))
-                image_array = np.array(image) / 255.0
-                image_tensor = torch.tensor(image_array).permute(2, 0, 1).unsqueeze(0).float()
-                return image_tensor.to(self.device)
+            return preprocessor(images).to(self.device)
         except Exception as e:
             logger.error(f"Error preprocessing image: {str(e)}")
             raise
     
-    def predict(self, image: Image.Image) -> Tuple[str, float, int]:
+    def predict(self, image: Image.Image) -> Prediction:
         """Make prediction on image using the actual model"""
+        return self.predict_batch([image])[0]
+    
+    def predict_batch(self, images: List[Image.Image], full_depth: bool = False) -> List[Prediction]:
+        """Make predictions for a batch of images with a single forward pass.
+
+        ``full_depth`` skips early exit, so every prediction gets an embedding
+        (when the backend has them); images that exit early have none.
+        """
         try:
-            if not self.is_loaded or self.model is None:
-                logger.warning("Model not loaded, using mock prediction")
-                return self._mock_prediction()
-            
-            # Preprocess image
-            inputs = self.preprocess_image(image)
-            
-            # Make prediction
-            with torch.no_grad():
-                outputs = self.model(inputs)
-                predictions = torch.nn.functional.softmax(outputs.logits, dim=-1)
-                confidence, predicted_idx = torch.max(predictions, 1)
+            with self.lease() as model:
+                if not self.is_loaded or model is None:
+                    logger.warning("Model not loaded, using mock prediction")
+                    return [self._mock_prediction() for _ in images]
                 
-                confidence_value = confidence.item() * 100
-                predicted_class = self.class_names[predicted_idx.item()]
+                # Preprocess images into one batch tensor
+                with STAGE_SECONDS.time("preprocess"), profiling.span("preprocess"):
+                    inputs = self.preprocess_batch(images, model)
                 
+                # Make predictions
+                predictions, exit_layers, embeddings = self._forward(inputs, model, full_depth)
+            confidences, predicted_idx = torch.max(predictions, 1)
+            if exit_layers is None:
+                exit_layers = [None] * len(images)
+            # Copies, so a cached row doesn't keep the whole batch alive
+            if embeddings is None or not settings.SIMILARITY_ENABLED:
+                embeddings = [None] * len(images)
+            else:
+                # NaN rows: exited early, no final-layer embedding
+                embeddings = [None if np.isnan(row[0]) else row.copy() for row in embeddings.numpy()]
+            
+            results = []
+            for confidence, idx, exit_layer, embedding in zip(
+                confidences.tolist(), predicted_idx.tolist(), exit_layers, embeddings
+            ):
+                confidence_value = confidence * 100
+                predicted_class = self.class_names[idx]
                 logger.info(f"Prediction: {predicted_class} ({confidence_value:.2f}%)")
-                
-            return predicted_class, confidence_value, predicted_idx.item()
+                PREDICTIONS.inc(predicted_class)
+                if exit_layer is not None:
+                    EXIT_LAYER.observe(exit_layer)
+                results.append((predicted_class, confidence_value, idx, exit_layer, embedding, model.model_version))
+            
+            return results
             
         except Exception as e:
             logger.error(f"Error during prediction: {str(e)}")
-            return self._mock_prediction()
+            return [self._mock_prediction() for _ in images]
     
-    def _mock_prediction(self) -> Tuple[str, float, int]:
+    def predict_proba(self, pixel_values: torch.Tensor) -> Tuple[torch.Tensor, Optional[str]]:
+        """Class probabilities (N, num_classes) for an already preprocessed batch, and the model version (None for mocks)"""
+        with self.lease() as model:
+            if not self.is_loaded or model is None:
+                # One-hot mock predictions, so callers can aggregate them like real ones
+                probabilities = torch.zeros((len(pixel_values), len(self.class_names)))
+                for row in probabilities:
+                    _, confidence, class_idx, _, _, _ = self._mock_prediction()
+                    row[class_idx] = confidence / 100
+                return probabilities, None
+            
+            return self._forward(pixel_values, model)[0], model.model_version
+    
+    def _forward(
+        self, pixel_values: torch.Tensor, model: LoadedModel, full_depth: bool = False
+    ) -> Tuple[torch.Tensor, Optional[List[int]], Optional[torch.Tensor]]:
+        # Layer labels only while this request is profiled
+        labels = model.backend.profile_modules() if profiling.current_trace() is not None else []
+        with STAGE_SECONDS.time("forward"), profiling.span("forward"), profiling.label_modules(labels):
+            logits, exit_layers, embeddings = model.backend.predict_batch_with_embeddings(
+                pixel_values.to(self.device), full_depth
+            )
+            probabilities = torch.nn.functional.softmax(logits.float(), dim=-1).cpu()
+            if embeddings is not None:
+                embeddings = embeddings.cpu()
+        BATCH_SIZE.observe(len(pixel_values))
+        return probabilities, exit_layers, embeddings
+    
+    def _mock_prediction(self) -> Prediction:
         """Mock prediction when model is not available"""
         import random
         
@@ -108,11 +392,12 @@ class CropDiseaseClassifier:
             "Potato___Healthy"
         ]
         
+        MOCK_PREDICTIONS.inc()
         disease_name = random.choice(common_diseases)
         confidence = random.uniform(75.0, 95.0)
         class_idx = self.class_names.index(disease_name)
         
-        return disease_name, confidence, class_idx
+        return disease_name, confidence, class_idx, None, None, None
     
     def format_disease_name(self, disease_name: str) -> str:
         """Convert underscore format to readable format"""
@@ -175,4 +460,15 @@ class CropDiseaseClassifier:
         }
 
 # Global classifier instance
-classifier = CropDiseaseClassifier()
\ No newline at end of file
+classifier = CropDiseaseClassifier()
+
+registry.register(CallbackMetric(
+    "crop_disease_model_memory_bytes",
+    "Approximate bytes held by the loaded model weights",
+    lambda: classifier.backend.memory_bytes() if classifier.backend is not None else 0,
+))
+registry.register(CallbackMetric(
+    "crop_disease_models_draining",
+    "Replaced model versions still finishing in-flight batches",
+    lambda: len(classifier.draining),
+))
\ No newline at end of file
@@ -0,0 +1,133 @@
+# app/models/early_exit.py
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import torch
+import torch.nn as nn
+
+from app.models.encoder import embed, encoder_layers, pool, run_layer
+from app.models.token_merging import TokenMerger
+
+
+class ExitHeads(nn.Module):
+    """Small classifiers on the CLS token after intermediate encoder layers.
+
+    Each head is a LayerNorm plus a Linear layer, shaped like the model's own
+    final head so it can be initialized from it and fitted offline
+    (``fit_exit_heads.py``). Layer numbers are 1-based: a head at layer 4
+    reads the output of the fourth encoder block.
+    """
+
+    def __init__(self, layers: Sequence[int], hidden_size: int, num_classes: int, eps: float = 1e-12):
+        super().__init__()
+        self.layers = sorted(layers)
+        self.num_classes = num_classes
+        self.heads = nn.ModuleDict({
+            str(layer): nn.Sequential(nn.LayerNorm(hidden_size, eps=eps), nn.Linear(hidden_size, num_classes))
+            for layer in self.layers
+        })
+
+    @classmethod
+    def from_model(cls, model: nn.Module, layers: Sequence[int]) -> "ExitHeads":
+        """Heads initialized as copies of the model's final layer norm and classifier"""
+        norm, classifier = model.vit.layernorm, model.classifier
+        heads = cls(layers, classifier.in_features, classifier.out_features, eps=norm.eps)
+        for head in heads.heads.values():
+            head[0].load_state_dict(norm.state_dict())
+            head[1].load_state_dict(classifier.state_dict())
+        return heads.float()
+
+    def pool(self, layer: int, cls_token: torch.Tensor) -> torch.Tensor:
+        """The head's layer norm on the CLS token: the embedding its classifier reads"""
+        return self.heads[str(layer)][0](cls_token.float())
+
+    def classify(self, layer: int, pooled: torch.Tensor) -> torch.Tensor:
+        return self.heads[str(layer)][1](pooled)
+
+    def forward(self, layer: int, cls_token: torch.Tensor) -> torch.Tensor:
+        return self.classify(layer, self.pool(layer, cls_token))
+
+    def save(self, path: str, report: Optional[Dict[str, Any]] = None):
+        first = self.heads[str(self.layers[0])]
+        torch.save({
+            "layers": self.layers,
+            "hidden_size": first[1].in_features,
+            "num_classes": self.num_classes,
+            "eps": first[0].eps,
+            "state_dict": self.state_dict(),
+            "report": report or {},
+        }, path)
+
+    @classmethod
+    def load(cls, path: str) -> "ExitHeads":
+        checkpoint = torch.load(path, map_location="cpu", weights_only=True)
+        heads = cls(checkpoint["layers"], checkpoint["hidden_size"], checkpoint["num_classes"], checkpoint["eps"])
+        heads.load_state_dict(checkpoint["state_dict"])
+        return heads.eval()
+
+
+class EarlyExitModel:
+    """Runs the encoder layer by layer and lets confident images stop early.
+
+    After every layer with a head, images whose head confidence reaches
+    ``threshold`` take that head's logits and are dropped from the batch, so
+    the remaining layers only process the harder images. Images that never
+    get confident enough go through all layers and the model's own head.
+    With a ``merger`` the blocks also merge tokens as they go.
+
+    Only images that run every layer get an embedding, the final pooled CLS
+    token: an exit head's normalized intermediate CLS token lives in a
+    different space, so the rows of images that exited are NaN.
+    """
+
+    def __init__(self, model: nn.Module, heads: ExitHeads, threshold: float, merger: Optional[TokenMerger] = None):
+        self.model = model
+        self.layers = encoder_layers(model)
+        self.heads = heads
+        self.threshold = threshold
+        self.merger = merger
+        # A head on the last layer would only duplicate the real classifier
+        self.exit_layers = {layer for layer in heads.layers if layer < len(self.layers)}
+
+    def __call__(self, pixel_values: torch.Tensor) -> Tuple[torch.Tensor, List[int], torch.Tensor]:
+        """Logits, the (1-based) layer each image exited after, and final pooled embeddings (NaN if exited)"""
+        hidden_states = embed(self.model, pixel_values)
+        batch_size, _, hidden_size = hidden_states.shape
+        device = hidden_states.device
+        logits = torch.empty((batch_size, self.heads.num_classes), device=device)
+        embeddings = torch.full((batch_size, hidden_size), float("nan"), device=device)
+        exits = [len(self.layers)] * batch_size
+        # Original batch positions of the images still running
+        active = torch.arange(batch_size, device=device)
+        size = None
+
+        for number, layer in enumerate(self.layers, start=1):
+            if self.merger is not None:
+                hidden_states, size = self.merger.run_layer(number - 1, layer, hidden_states, size)
+            else:
+                hidden_states = run_layer(layer, hidden_states)
+            if number not in self.exit_layers:
+                continue
+
+            pooled = self.heads.pool(number, hidden_states[:, 0])
+            head_logits = self.heads.classify(number, pooled)
+            done = torch.softmax(head_logits, dim=-1).amax(dim=-1) >= self.threshold
+            if not done.any():
+                continue
+
+            finished = active[done]
+            logits[finished] = head_logits[done]
+            for index in finished.tolist():
+                exits[index] = number
+
+            keep = ~done
+            if not keep.any():
+                return logits, exits, embeddings
+            hidden_states = hidden_states[keep]
+            active = active[keep]
+            if size is not None:
+                size = size[keep]
+
+        pooled = pool(self.model, hidden_states)
+        logits[active] = self.model.classifier(pooled).float()
+        embeddings[active] = pooled.float()
+        return logits, exits, embeddings
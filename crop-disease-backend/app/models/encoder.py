@@ -0,0 +1,56 @@
+# app/models/encoder.py
+from typing import Tuple
+
+import torch
+import torch.nn as nn
+
+
+def encoder_layers(model: nn.Module) -> nn.ModuleList:
+    """The transformer blocks of a ``ViTForImageClassification``, across transformers versions"""
+    vit = model.vit
+    layers = getattr(vit, "layers", None)
+    if layers is None:
+        layers = vit.encoder.layer
+    return layers
+
+
+def run_layer(layer: nn.Module, hidden_states: torch.Tensor) -> torch.Tensor:
+    """Apply one transformer block; older transformers versions return a tuple"""
+    output = layer(hidden_states)
+    return output[0] if isinstance(output, tuple) else output
+
+
+def embed(model: nn.Module, pixel_values: torch.Tensor) -> torch.Tensor:
+    """Patch + position embeddings with the CLS token prepended, in the model's dtype"""
+    dtype = model.vit.embeddings.patch_embeddings.projection.weight.dtype
+    return model.vit.embeddings(pixel_values.to(dtype))
+
+
+def pool(model: nn.Module, hidden_states: torch.Tensor) -> torch.Tensor:
+    """The final layer norm on the CLS token: the embedding the classifier head reads"""
+    # Layer norm is per token, so normalizing only the CLS token gives the same result
+    return model.vit.layernorm(hidden_states[:, 0])
+
+
+def classify(model: nn.Module, hidden_states: torch.Tensor) -> torch.Tensor:
+    """Final layer norm and classifier head on the CLS token, as float32 logits"""
+    return model.classifier(pool(model, hidden_states)).float()
+
+
+def attention_projections(layer: nn.Module) -> Tuple[nn.Module, nn.Module, nn.Module, nn.Module, int]:
+    """Query, key, value and output projections of a block, plus its head count"""
+    attention = layer.attention
+    if hasattr(attention, "q_proj"):
+        return attention.q_proj, attention.k_proj, attention.v_proj, attention.o_proj, attention.num_attention_heads
+    self_attention = attention.attention
+    return (
+        self_attention.query, self_attention.key, self_attention.value,
+        attention.output.dense, self_attention.num_attention_heads,
+    )
+
+
+def feed_forward(layer: nn.Module, hidden_states: torch.Tensor) -> torch.Tensor:
+    """The block's MLP, without its residual connection"""
+    if hasattr(layer, "mlp"):
+        return layer.mlp(hidden_states)
+    return layer.output.dense(layer.intermediate(hidden_states))
@@ -0,0 +1,103 @@
+# app/models/mmap_weights.py
+import json
+import logging
+import mmap
+import os
+import struct
+from typing import Dict, Optional
+
+import torch
+from safetensors.torch import save_file
+from transformers import ViTConfig, ViTForImageClassification
+
+logger = logging.getLogger(__name__)
+
+SAFETENSORS_FILE = "model.safetensors"
+MMAP_FILE = "model.mmap.safetensors"
+
+_DTYPES = {
+    "F64": torch.float64,
+    "F32": torch.float32,
+    "F16": torch.float16,
+    "BF16": torch.bfloat16,
+    "I64": torch.int64,
+    "I32": torch.int32,
+    "I16": torch.int16,
+    "I8": torch.int8,
+    "U8": torch.uint8,
+    "BOOL": torch.bool,
+}
+
+
+def mmap_safetensors(path: str) -> Dict[str, torch.Tensor]:
+    """Tensors of a safetensors file as views into a private memory map of it.
+
+    Nothing is copied: pages come from the OS page cache, so every process
+    mapping the same file shares one physical copy of the weights until it
+    writes to them (which inference never does).
+    """
+    with open(path, "rb") as f:
+        # ACCESS_COPY keeps the tensors writable for torch without ever
+        # writing back to the file
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+
+    (header_size,) = struct.unpack("<Q", buffer[:8])
+    header = json.loads(buffer[8:8 + header_size])
+    data_start = 8 + header_size
+
+    tensors = {}
+    for name, info in header.items():
+        if name == "__metadata__":
+            continue
+        dtype = _DTYPES[info["dtype"]]
+        begin, end = info["data_offsets"]
+        count = (end - begin) // torch.empty((), dtype=dtype).element_size()
+        if count == 0:
+            tensors[name] = torch.empty(info["shape"], dtype=dtype)
+            continue
+        # Each tensor keeps a reference to the map, so it outlives this function
+        tensor = torch.frombuffer(buffer, dtype=dtype, count=count, offset=data_start + begin)
+        tensors[name] = tensor.view(info["shape"])
+    return tensors
+
+
+def _assign_weights(config: ViTConfig, state: Dict[str, torch.Tensor]) -> Optional[ViTForImageClassification]:
+    """Classifier built on the meta device with its parameters pointing at ``state``, or None on a key mismatch"""
+    with torch.device("meta"):
+        model = ViTForImageClassification(config)
+    missing, _ = model.load_state_dict(state, strict=False, assign=True)
+    if missing:
+        return None
+    model.eval()
+    return model
+
+
+def load_mmap_model(model_path: str) -> ViTForImageClassification:
+    """Load the classifier with memory-mapped weights.
+
+    Checkpoints saved by other transformers versions may use different
+    parameter names. In that case the model is loaded normally once and its
+    weights are written to ``MMAP_FILE`` under the current names, which
+    later loads (and the other workers) map directly.
+    """
+    config = ViTConfig.from_pretrained(model_path)
+    for filename in (MMAP_FILE, SAFETENSORS_FILE):
+        path = os.path.join(model_path, filename)
+        if os.path.exists(path):
+            model = _assign_weights(config, mmap_safetensors(path))
+            if model is not None:
+                logger.info(f"Memory-mapped weights from {path}")
+                return model
+
+    logger.info(f"Writing {MMAP_FILE} with this version's parameter names")
+    model = ViTForImageClassification.from_pretrained(model_path)
+    path = os.path.join(model_path, MMAP_FILE)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    save_file({name: tensor.contiguous() for name, tensor in model.state_dict().items()}, temp_path)
+    # Atomic, so concurrently starting workers never map a half-written file
+    os.replace(temp_path, path)
+
+    model = _assign_weights(config, mmap_safetensors(path))
+    if model is None:
+        raise ValueError(f"{path} does not match the model's parameters")
+    return model
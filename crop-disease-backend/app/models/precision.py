@@ -0,0 +1,103 @@
+# app/models/precision.py
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import torch
+
+from app.models.backends import InferenceBackend
+from app.models.preprocessing import TensorPreprocessor
+from app.services.image_processing import ImageProcessor
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+
+class PrecisionGateError(RuntimeError):
+    """Raised when a reduced-precision model disagrees too often with fp32"""
+
+
+def load_labelled_images(image_dir: str, limit: Optional[int] = None) -> List[Tuple[str, str]]:
+    """List ``(path, label)`` pairs from a folder with one sub-folder per class name"""
+    samples = []
+    for label in sorted(os.listdir(image_dir)):
+        class_dir = os.path.join(image_dir, label)
+        if not os.path.isdir(class_dir):
+            continue
+        for filename in sorted(os.listdir(class_dir)):
+            if filename.lower().endswith(IMAGE_EXTENSIONS):
+                samples.append((os.path.join(class_dir, filename), label))
+    if limit:
+        samples = samples[:limit]
+    return samples
+
+
+def evaluate_precision(
+    reference: InferenceBackend,
+    candidate: InferenceBackend,
+    preprocessor: TensorPreprocessor,
+    class_names: List[str],
+    image_dir: str,
+    batch_size: int = 32,
+    limit: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Compare a candidate backend (reduced precision, token merging) against a reference on a labelled folder.
+
+    Reports top-1 agreement with the reference, the largest drift (in percentage
+    points) of the confidence assigned to the reference top-1 class, accuracy of both models
+    against the folder labels, and mean batch latency.
+    """
+    samples = load_labelled_images(image_dir, limit)
+    if not samples:
+        raise ValueError(f"No labelled images found in {image_dir}")
+
+    agree = 0
+    correct = {"reference": 0, "candidate": 0}
+    labelled = 0
+    max_drift = 0.0
+    timings = {"reference": 0.0, "candidate": 0.0}
+
+    for start in range(0, len(samples), batch_size):
+        chunk = samples[start:start + batch_size]
+        images = []
+        for path, _ in chunk:
+            with open(path, "rb") as f:
+                images.append(ImageProcessor.process_image(f.read()))
+        pixel_values = preprocessor(images)
+
+        started = time.perf_counter()
+        reference_probs = torch.softmax(reference.predict_batch(pixel_values).float(), dim=-1)
+        timings["reference"] += time.perf_counter() - started
+
+        started = time.perf_counter()
+        candidate_probs = torch.softmax(candidate.predict_batch(pixel_values).float(), dim=-1)
+        timings["candidate"] += time.perf_counter() - started
+
+        reference_top1 = reference_probs.argmax(dim=-1)
+        candidate_top1 = candidate_probs.argmax(dim=-1)
+        agree += (reference_top1 == candidate_top1).sum().item()
+
+        index = reference_top1.unsqueeze(1)
+        drift = (candidate_probs.gather(1, index) - reference_probs.gather(1, index)).abs().max().item()
+        max_drift = max(max_drift, drift * 100)
+
+        for (_, label), ref_idx, cand_idx in zip(chunk, reference_top1.tolist(), candidate_top1.tolist()):
+            if label in class_names:
+                labelled += 1
+                correct["reference"] += class_names[ref_idx] == label
+                correct["candidate"] += class_names[cand_idx] == label
+
+    batches = (len(samples) + batch_size - 1) // batch_size
+    return {
+        "precision": candidate.precision,
+        "backend": candidate.name,
+        "images": len(samples),
+        "top1_agreement": round(agree / len(samples), 4),
+        "max_confidence_drift": round(max_drift, 3),
+        "reference_accuracy": round(correct["reference"] / labelled, 4) if labelled else None,
+        "candidate_accuracy": round(correct["candidate"] / labelled, 4) if labelled else None,
+        "reference_batch_ms": round(timings["reference"] / batches * 1000, 2),
+        "candidate_batch_ms": round(timings["candidate"] / batches * 1000, 2),
+    }
@@ -0,0 +1,89 @@
+# app/models/preprocessing.py
+import json
+import logging
+import os
+from typing import List, Sequence, Tuple
+
+import numpy as np
+import torch
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+
+class TensorPreprocessor:
+    """Single-pass rescale + normalize of fitted RGB images into a batch tensor.
+
+    Replaces the generic ``ViTImageProcessor`` path: images arriving from
+    ``ImageProcessor.process_image`` are already fit-resized, so the only work
+    left is ``pixel * rescale_factor`` followed by ``(x - mean) / std``. Both are
+    folded into one per-channel multiply-add written straight into a
+    preallocated ``(N, C, H, W)`` float32 tensor.
+    """
+
+    def __init__(
+        self,
+        image_size: Sequence[int] = (224, 224),
+        rescale_factor: float = 1 / 255,
+        image_mean: Sequence[float] = (0.0, 0.0, 0.0),
+        image_std: Sequence[float] = (1.0, 1.0, 1.0),
+    ):
+        self.height, self.width = image_size
+        mean = np.asarray(image_mean, dtype=np.float32)
+        std = np.asarray(image_std, dtype=np.float32)
+        # (x * r - mean) / std == x * (r / std) - mean / std
+        self._scale = (np.float32(rescale_factor) / std).reshape(-1, 1, 1)
+        self._offset = (-mean / std).reshape(-1, 1, 1)
+
+    @classmethod
+    def from_pretrained(cls, model_path: str) -> "TensorPreprocessor":
+        """Build from the model's ``preprocessor_config.json``, falling back to plain 0-1 scaling"""
+        config_path = os.path.join(model_path, "preprocessor_config.json")
+        if not os.path.exists(config_path):
+            logger.warning(f"No preprocessor config at {config_path}, using 0-1 scaling")
+            return cls()
+
+        with open(config_path, "r") as f:
+            config = json.load(f)
+
+        size = config.get("size", {"height": 224, "width": 224})
+        kwargs = {"image_size": (size["height"], size["width"])}
+        if config.get("do_rescale", True):
+            kwargs["rescale_factor"] = config.get("rescale_factor", 1 / 255)
+        else:
+            kwargs["rescale_factor"] = 1.0
+        if config.get("do_normalize", True):
+            kwargs["image_mean"] = config.get("image_mean", [0.5, 0.5, 0.5])
+            kwargs["image_std"] = config.get("image_std", [0.5, 0.5, 0.5])
+        return cls(**kwargs)
+
+    def fit(self, image: Image.Image) -> Image.Image:
+        """Bring an image to the model's input size if it is not there already"""
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        if image.size != (self.width, self.height):
+            image = ImageOps.fit(image, (self.width, self.height), Image.Resampling.LANCZOS)
+        return image
+
+    def __call__(self, images: List[Image.Image]) -> torch.Tensor:
+        batch = torch.empty((len(images), 3, self.height, self.width), dtype=torch.float32)
+        out = batch.numpy()
+        for i, image in enumerate(images):
+            pixels = np.asarray(self.fit(image)).transpose(2, 0, 1)
+            np.multiply(pixels, self._scale, out=out[i])
+            out[i] += self._offset
+        return batch
+
+    def crops(self, image: Image.Image, origins: Sequence[Tuple[int, int]]) -> torch.Tensor:
+        """Batch of model-sized windows cut from one RGB image at the given ``(x, y)`` origins.
+
+        Windows are sliced straight out of the decoded pixel array, so tiles
+        never go through PIL crops or per-tile copies before normalization.
+        """
+        pixels = np.asarray(image.convert("RGB") if image.mode != "RGB" else image).transpose(2, 0, 1)
+        batch = torch.empty((len(origins), 3, self.height, self.width), dtype=torch.float32)
+        out = batch.numpy()
+        for i, (x, y) in enumerate(origins):
+            np.multiply(pixels[:, y:y + self.height, x:x + self.width], self._scale, out=out[i])
+            out[i] += self._offset
+        return batch
@@ -0,0 +1,89 @@
+# app/models/registry.py
+import logging
+import os
+import re
+import time
+from typing import Any, Dict, List, Optional
+
+from app.utils.config import settings
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_FILE = "ACTIVE"
+
+# Version names double as directory names and model versions in cache keys
+VERSION_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]*$")
+
+
+class ModelRegistry:
+    """Versioned model directories under one root, plus a pointer to the active one.
+
+    Each version is a sub-directory holding a ``save_pretrained`` model
+    (``config.json`` and weights). The ``ACTIVE`` file names the version
+    every worker process should serve; it is replaced atomically, and
+    workers watching it swap to the new version on their own.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.root)
+
+    def path(self, version: str) -> str:
+        """Directory of a registered version; ``KeyError`` if there is none"""
+        if not VERSION_PATTERN.match(version):
+            raise KeyError(version)
+        path = os.path.join(self.root, version)
+        if not os.path.isfile(os.path.join(path, "config.json")):
+            raise KeyError(version)
+        return path
+
+    def versions(self) -> List[Dict[str, Any]]:
+        """Registered versions, newest first"""
+        if not self.enabled or not os.path.isdir(self.root):
+            return []
+        versions = []
+        for name in os.listdir(self.root):
+            try:
+                path = self.path(name)
+            except KeyError:
+                continue
+            versions.append({"version": name, "path": path, "created_at": os.path.getmtime(path)})
+        return sorted(versions, key=lambda v: v["created_at"], reverse=True)
+
+    def active_version(self) -> Optional[str]:
+        """Version named by the ``ACTIVE`` pointer, if any"""
+        if not self.enabled:
+            return None
+        try:
+            with open(os.path.join(self.root, ACTIVE_FILE), "r") as f:
+                version = f.read().strip()
+        except FileNotFoundError:
+            return None
+        return version or None
+
+    def set_active(self, version: str):
+        """Point every worker at ``version``"""
+        self.path(version)
+        tmp_path = os.path.join(self.root, f".{ACTIVE_FILE}.{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            f.write(version + "\n")
+        os.replace(tmp_path, os.path.join(self.root, ACTIVE_FILE))
+        logger.info(f"Model registry: {version} is now active")
+
+    def resolve(self, default_path: str) -> str:
+        """Directory to serve: the active version, or ``default_path`` without one"""
+        version = self.active_version()
+        if version is None:
+            return default_path
+        try:
+            return self.path(version)
+        except KeyError:
+            logger.error(f"Active model version {version} is not in {self.root}; serving {default_path}")
+            return default_path
+
+
+# Global model registry instance
+model_registry = ModelRegistry(settings.MODEL_REGISTRY_DIR)
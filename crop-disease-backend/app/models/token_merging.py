@@ -0,0 +1,121 @@
+# app/models/token_merging.py
+from typing import List, Optional, Tuple
+
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+
+from app.models.encoder import attention_projections, classify, embed, encoder_layers, feed_forward
+
+
+def parse_schedule(value: str, num_layers: int) -> List[int]:
+    """Tokens to merge per layer from ``"8"`` (every layer) or one comma-separated value per layer"""
+    counts = [int(count) for count in str(value).split(",") if count.strip()]
+    if len(counts) == 1:
+        counts = counts * num_layers
+    if len(counts) != num_layers or any(count < 0 for count in counts):
+        raise ValueError(
+            f"Token merging schedule needs one value or {num_layers} non-negative values, got '{value}'"
+        )
+    return counts
+
+
+class TokenMerger:
+    """ToMe-style token merging inside the ViT encoder.
+
+    After the attention of layer ``i``, the ``schedule[i]`` most similar token
+    pairs (cosine similarity of the attention keys, bipartite matching
+    between alternating tokens) are averaged into one token, so every later
+    layer runs on a shorter sequence. Merged tokens remember how many patches
+    they stand for and get proportionally more attention. The CLS token is
+    never merged and stays first. Every image in a batch loses the same
+    number of tokens, so batches stay rectangular.
+    """
+
+    def __init__(self, model: nn.Module, schedule: List[int]):
+        self.model = model
+        self.layers = encoder_layers(model)
+        self.schedule = schedule
+
+    def run_layer(
+        self,
+        index: int,
+        layer: nn.Module,
+        hidden_states: torch.Tensor,
+        size: Optional[torch.Tensor],
+    ) -> Tuple[torch.Tensor, Optional[torch.Tensor]]:
+        """One encoder block with merging between attention and MLP; ``size`` is (N, T, 1) or None"""
+        residual = hidden_states
+        attention_output, keys = self._attention(layer, layer.layernorm_before(hidden_states), size)
+        hidden_states = attention_output + residual
+
+        if self.schedule[index] > 0:
+            hidden_states, size = self._merge(hidden_states, size, keys, self.schedule[index])
+
+        return feed_forward(layer, layer.layernorm_after(hidden_states)) + hidden_states, size
+
+    def encode(self, pixel_values: torch.Tensor) -> torch.Tensor:
+        """Final hidden states of the merged token sequence (CLS first)"""
+        hidden_states = embed(self.model, pixel_values)
+        size = None
+        for index, layer in enumerate(self.layers):
+            hidden_states, size = self.run_layer(index, layer, hidden_states, size)
+        return hidden_states
+
+    def __call__(self, pixel_values: torch.Tensor) -> torch.Tensor:
+        return classify(self.model, self.encode(pixel_values))
+
+    @staticmethod
+    def _attention(layer: nn.Module, hidden_states: torch.Tensor, size: Optional[torch.Tensor]):
+        query, key, value, output, heads = attention_projections(layer)
+        batch_size, tokens, _ = hidden_states.shape
+
+        def split_heads(projection: nn.Module) -> torch.Tensor:
+            return projection(hidden_states).view(batch_size, tokens, heads, -1).transpose(1, 2)
+
+        q, k, v = split_heads(query), split_heads(key), split_heads(value)
+        # Proportional attention: a token standing for s patches counts s times
+        bias = None if size is None else size.log()[:, None, None, :, 0].to(q.dtype)
+        attended = F.scaled_dot_product_attention(q, k, v, attn_mask=bias)
+        attended = attended.transpose(1, 2).reshape(batch_size, tokens, -1)
+        return output(attended), k.mean(dim=1)
+
+    @staticmethod
+    def _merge(
+        hidden_states: torch.Tensor,
+        size: Optional[torch.Tensor],
+        metric: torch.Tensor,
+        r: int,
+    ) -> Tuple[torch.Tensor, torch.Tensor]:
+        batch_size, tokens, channels = hidden_states.shape
+        # Even positions (including CLS) may merge into odd ones; keep CLS out
+        r = min(r, (tokens + 1) // 2 - 1)
+        if size is None:
+            size = torch.ones((batch_size, tokens, 1), device=hidden_states.device)
+        if r <= 0:
+            return hidden_states, size
+
+        metric = metric.float()
+        metric = metric / metric.norm(dim=-1, keepdim=True)
+        scores = metric[:, ::2] @ metric[:, 1::2].transpose(-1, -2)
+        scores[:, 0, :] = -float("inf")
+
+        best_score, best_match = scores.max(dim=-1)
+        order = best_score.argsort(dim=-1, descending=True)[..., None]
+        merged_idx = order[:, :r]
+        # Sorting keeps the unmerged tokens (and CLS first) in their original order
+        kept_idx = order[:, r:].sort(dim=1)[0]
+        target_idx = best_match[..., None].gather(1, merged_idx)
+
+        def merge(x: torch.Tensor) -> torch.Tensor:
+            width = x.shape[-1]
+            source, target = x[:, ::2], x[:, 1::2]
+            kept = source.gather(1, kept_idx.expand(-1, -1, width))
+            moved = source.gather(1, merged_idx.expand(-1, -1, width))
+            target = target.scatter_reduce(1, target_idx.expand(-1, -1, width), moved, reduce="sum")
+            return torch.cat([kept, target], dim=1)
+
+        # Size-weighted average: merge the weighted sums and sizes, then divide
+        merged = merge(hidden_states.float() * size)
+        size = merge(size)
+        return (merged / size).to(hidden_states.dtype), size
@@ -0,0 +1,67 @@
+# app/routes/admin.py
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse, JSONResponse
+import asyncio
+import logging
+
+from app.models.disease_classifier import classifier
+from app.models.registry import model_registry
+from app.services.model_manager import SwapInProgress, model_manager
+from app.utils.auth import require_admin
+from app.utils.profiling import trace_store
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+@router.get("/admin/models")
+async def list_models():
+    """Registered model versions, the one this worker serves and any swap in progress"""
+    return {
+        "registry_dir": model_registry.root,
+        "active_version": model_registry.active_version(),
+        "serving": {"model_version": classifier.model_version, "path": classifier.model_path},
+        "swap": model_manager.status,
+        "draining": classifier.draining,
+        "versions": model_registry.versions(),
+    }
+
+@router.post("/admin/models/{version}/activate", status_code=202)
+async def activate_model(version: str):
+    """
+    Load, warm up and switch to a registered model version without downtime.
+
+    Returns once loading has started; requests keep being served by the
+    current version until the switch. The registry pointer moves only after
+    the version has loaded and warmed up here; other worker processes then
+    follow it within MODEL_REGISTRY_POLL_SECONDS.
+    """
+    if not model_registry.enabled:
+        raise HTTPException(status_code=400, detail="MODEL_REGISTRY_DIR is not configured")
+
+    try:
+        return model_manager.activate(version)
+
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Model version {version} is not registered")
+    except SwapInProgress as e:
+        return JSONResponse(status_code=409, content={"detail": str(e), "swap": model_manager.status})
+    except Exception as e:
+        logger.error(f"Error activating model version {version}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Activation failed: {str(e)}")
+
+@router.get("/admin/profiles")
+async def list_profiles():
+    """Recent per-request profiling traces in this node's ring, newest first"""
+    return {"max_traces": trace_store.max_traces, "traces": await asyncio.to_thread(trace_store.list)}
+
+@router.get("/admin/profiles/{trace_id}")
+async def download_profile(trace_id: str):
+    """
+    Download one trace as Chrome trace JSON (open in chrome://tracing or ui.perfetto.dev)
+    """
+    try:
+        path = trace_store.path(trace_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Profile trace {trace_id} not found")
+    return FileResponse(path, media_type="application/json", filename=f"profile-{trace_id}.json")
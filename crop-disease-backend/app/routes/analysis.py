@@ -1,71 +1,268 @@
 # app/routes/analysis.py
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, UploadFile, File, HTTPException, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+import asyncio
+import binascii
 import logging
+import time
+from typing import Awaitable, Callable, List, Optional, TypeVar
 from PIL import Image
 
-from app.schemas.analysis import AnalysisResponse, ErrorResponse
+from app.schemas.analysis import (
+    AnalysisRequest, AnalysisResponse, BatchAnalysisItem, ErrorResponse, TiledAnalysisResponse
+)
 from app.models.disease_classifier import classifier
+from app.services.analysis_service import analyze_image_bytes
+from app.services.batching import DeadlineExceeded, Overloaded, batcher
+from app.services.cache import prediction_cache
+from app.services.tiling import analyze_tiled
 from app.services.image_processing import ImageProcessor
+from app.services.upload import read_image_stream, read_image_upload, validate_image_bytes
+from app.utils.config import settings
+from app.utils.metrics import IN_FLIGHT, REJECTED_UPLOADS
+from app.utils.profiling import RequestTrace, start_trace, trace_store
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+def _ensure_model_ready():
+    """Reject analysis requests while the model is still loading or warming up"""
+    if classifier.load_error is not None:
+        raise HTTPException(status_code=503, detail=f"Model failed to load: {classifier.load_error}")
+    if not classifier.is_ready:
+        raise HTTPException(
+            status_code=503,
+            detail="Model is warming up. Please retry shortly.",
+            headers={"Retry-After": "5"}
+        )
+
+def _request_deadline(request: Request) -> Optional[float]:
+    """Absolute ``time.perf_counter()`` deadline from the deadline header or the server default"""
+    budget_ms = settings.REQUEST_DEADLINE_MS
+    value = request.headers.get(settings.REQUEST_DEADLINE_HEADER)
+    if value is not None:
+        try:
+            budget_ms = float(value)
+        except ValueError:
+            budget_ms = -1.0
+        if not budget_ms > 0:
+            raise HTTPException(
+                status_code=400,
+                detail=f"{settings.REQUEST_DEADLINE_HEADER} must be a positive number of milliseconds"
+            )
+    return time.perf_counter() + budget_ms / 1000 if budget_ms > 0 else None
+
+async def _until_disconnect(request: Request, work: Awaitable[T]) -> T:
+    """Await ``work``, cancelling it if the client disconnects first"""
+    task = asyncio.ensure_future(work)
+    
+    async def wait_for_disconnect():
+        # The body has been read, so the next message is the disconnect
+        while (await request.receive())["type"] != "http.disconnect":
+            pass
+    
+    watcher = asyncio.ensure_future(wait_for_disconnect())
+    try:
+        await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        watcher.cancel()
+    if not task.done():
+        task.cancel()
+        logger.info("Client disconnected; cancelled its analysis")
+        raise HTTPException(status_code=499, detail="Client closed the request")
+    return task.result()
+
+def _shed_response(error: Exception) -> HTTPException:
+    """503 with Retry-After for a full queue, 504 for a missed deadline"""
+    if isinstance(error, Overloaded):
+        return HTTPException(
+            status_code=503,
+            detail="Inference queue is full. Please retry shortly.",
+            headers={"Retry-After": str(error.retry_after)}
+        )
+    return HTTPException(status_code=504, detail=str(error))
+
+async def _save_trace(trace: RequestTrace):
+    try:
+        await asyncio.to_thread(trace_store.save, trace)
+    except Exception as e:
+        logger.error(f"Saving profile trace {trace.id} failed: {str(e)}")
+
+async def _admitted_analysis(
+    request: Request, response: Response, contents: bytes, deadline: Optional[float],
+    analyze: Callable[[bytes, Optional[float]], Awaitable[T]] = analyze_image_bytes
+) -> T:
+    """Analyze under admission control: shed when overloaded or late, cancel on disconnect.
+    
+    A profiled request also saves its trace and names it in ``X-Profile-Id``.
+    """
+    trace = start_trace(request.headers, request.url.path)
+    try:
+        if trace is None:
+            return await _until_disconnect(request, analyze(contents, deadline))
+        with trace.activate(), trace.span("analysis"):
+            result = await _until_disconnect(request, analyze(contents, deadline))
+        response.headers["X-Profile-Id"] = trace.id
+        return result
+    except (Overloaded, DeadlineExceeded) as e:
+        raise _shed_response(e)
+    finally:
+        if trace is not None:
+            await _save_trace(trace)
+
 @router.post("/analyze", response_model=AnalysisResponse)
 async def analyze_crop_disease(
+    request: Request,
+    response: Response,
     file: UploadFile = File(...)
 ):
     """
     Analyze crop image for disease detection using the actual model
     """
     try:
-        # Validate file type
-        if not file.content_type.startswith('image/'):
-            raise HTTPException(status_code=400, detail="File must be an image")
-        
-        # Read file content
-        contents = await file.read()
+        _ensure_model_ready()
+        deadline = _request_deadline(request)
+        with IN_FLIGHT.track():
+            contents = await read_image_upload(file)
+            
+            return await _admitted_analysis(request, response, contents, deadline)
         
-        # Validate image size
-        if len(contents) > 10 * 1024 * 1024:  # 10MB
-            raise HTTPException(status_code=400, detail="Image size too large. Maximum 10MB allowed.")
-        
-        # Process image
-        processed_image = ImageProcessor.process_image(contents)
-        
-        # Make prediction using the actual model
-        disease_name, confidence, class_idx = classifier.predict(processed_image)
-        
-        # Filter out low confidence predictions for "Invalid" class
-        if disease_name == "Invalid" and confidence > 70:
-            # Try to find the next best prediction
-            disease_name = "Unknown Disease"
-            confidence = confidence * 0.7  # Reduce confidence for uncertain predictions
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in analysis: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
+
+@router.post("/analyze/raw", response_model=AnalysisResponse)
+async def analyze_crop_disease_raw(request: Request, response: Response):
+    """
+    Analyze an image sent as the raw request body (application/octet-stream).
+    
+    Skips multipart encoding and parsing: the body is read straight from
+    the ASGI stream with the same size, type and pixel-count checks as
+    uploads.
+    """
+    try:
+        _ensure_model_ready()
+        deadline = _request_deadline(request)
+        with IN_FLIGHT.track():
+            content_length = request.headers.get("content-length")
+            contents = await read_image_stream(
+                request.stream(),
+                declared_size=int(content_length) if content_length and content_length.isdigit() else None
+            )
+            
+            return await _admitted_analysis(request, response, contents, deadline)
         
-        # Get additional information
-        description = classifier.get_disease_description(disease_name)
-        severity = classifier.get_severity(confidence, disease_name)
-        treatments = classifier.get_treatment_recommendations(disease_name)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in analysis: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
+
+@router.post("/analyze/base64", response_model=AnalysisResponse)
+async def analyze_crop_disease_base64(request: Request, response: Response, body: AnalysisRequest):
+    """
+    Analyze a base64-encoded image (optionally a data URL) sent as JSON
+    """
+    try:
+        _ensure_model_ready()
+        deadline = _request_deadline(request)
+        with IN_FLIGHT.track():
+            # Base64 is 4/3 of the decoded size; reject before decoding
+            if len(body.image_data) * 3 // 4 > settings.MAX_FILE_SIZE + 3:
+                REJECTED_UPLOADS.inc("too_large")
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"Image size too large. Maximum {settings.MAX_FILE_SIZE // (1024 * 1024)}MB allowed."
+                )
+            try:
+                contents = ImageProcessor.decode_base64(body.image_data)
+            except (binascii.Error, ValueError):
+                REJECTED_UPLOADS.inc("bad_base64")
+                raise HTTPException(status_code=400, detail="Invalid base64 image data")
+            validate_image_bytes(contents)
+            
+            return await _admitted_analysis(request, response, contents, deadline)
         
-        # Prepare response
-        response = AnalysisResponse(
-            disease_name=disease_name,
-            confidence=round(confidence, 2),
-            description=description,
-            remedies=treatments["remedies"],
-            fungicides=treatments["fungicides"],
-            is_healthy="Healthy" in disease_name,
-            severity=severity
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in analysis: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
+
+@router.post("/analyze/batch")
+async def analyze_crop_disease_batch(
+    files: List[UploadFile] = File(...)
+):
+    """
+    Analyze many crop images in one upload.
+    
+    Streams one JSON line per image (application/x-ndjson) in completion
+    order; each line carries the image index so clients can match results.
+    """
+    _ensure_model_ready()
+    if len(files) > settings.BATCH_UPLOAD_MAX_FILES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many files. Maximum {settings.BATCH_UPLOAD_MAX_FILES} images per batch."
         )
-        
-        logger.info(f"Analysis completed: {disease_name} ({confidence:.2f}%) - Severity: {severity}")
-        
-        return response
+    
+    # Bound how many uploads are read and decoded at once
+    semaphore = asyncio.Semaphore(settings.BATCH_UPLOAD_CONCURRENCY)
+    
+    async def analyze_item(index: int, file: UploadFile) -> BatchAnalysisItem:
+        async with semaphore:
+            try:
+                contents = await read_image_upload(file)
+                result = await analyze_image_bytes(contents)
+                return BatchAnalysisItem(index=index, filename=file.filename, result=result)
+            except HTTPException as e:
+                return BatchAnalysisItem(index=index, filename=file.filename, error=str(e.detail))
+            except Exception as e:
+                logger.error(f"Error in batch analysis of {file.filename}: {str(e)}")
+                return BatchAnalysisItem(index=index, filename=file.filename, error=f"Analysis failed: {str(e)}")
+    
+    async def stream_results():
+        with IN_FLIGHT.track():
+            tasks = [asyncio.create_task(analyze_item(index, file)) for index, file in enumerate(files)]
+            try:
+                for completed in asyncio.as_completed(tasks):
+                    item = await completed
+                    yield item.model_dump_json() + "\n"
+            finally:
+                for task in tasks:
+                    task.cancel()
+    
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+@router.post("/analyze/tiled", response_model=TiledAnalysisResponse)
+async def analyze_crop_disease_tiled(
+    request: Request,
+    response: Response,
+    file: UploadFile = File(...)
+):
+    """
+    Analyze a high-resolution field or drone image tile by tile.
+    
+    The image is split into overlapping model-sized windows so small lesions
+    are not lost to downscaling; returns an overall diagnosis plus the
+    per-tile class/confidence grid.
+    """
+    try:
+        _ensure_model_ready()
+        deadline = _request_deadline(request)
+        with IN_FLIGHT.track():
+            contents = await read_image_upload(file, max_size=settings.TILE_MAX_FILE_SIZE)
+            
+            return await _admitted_analysis(request, response, contents, deadline, analyze_tiled)
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error in analysis: {str(e)}")
+        logger.error(f"Error in tiled analysis: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
 
 @router.get("/diseases")
@@ -85,13 +282,36 @@ async def model_health():
         return {
             "status": "healthy",
             "model_loaded": classifier.is_loaded,
+            "ready": classifier.is_ready,
             "device": str(classifier.device),
+            "model_version": classifier.model_version,
             "supported_diseases": len(classifier.class_names),
             "disease_classes": classifier.class_names
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Health check failed: {str(e)}")
 
+@router.get("/batching/stats")
+async def get_batching_stats():
+    """Batch-size distribution and queueing delay of the inference micro-batcher"""
+    return {
+        "enabled": batcher.enabled,
+        "max_batch_size": batcher.max_batch_size,
+        "max_wait_ms": batcher.max_wait * 1000,
+        "max_queue": batcher.max_queue,
+        "queue_depth": batcher.queue_depth,
+        "waiting": batcher.waiting,
+        **batcher.stats.snapshot()
+    }
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """Hit/miss/eviction counters of the prediction cache"""
+    return {
+        "model_version": classifier.model_version,
+        **prediction_cache.snapshot()
+    }
+
 @router.get("/crops")
 async def get_supported_crops():
     """Get list of supported crops"""
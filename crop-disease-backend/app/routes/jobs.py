@@ -0,0 +1,53 @@
+# app/routes/jobs.py
+from fastapi import APIRouter, UploadFile, File, HTTPException
+import asyncio
+import logging
+
+from app.schemas.analysis import JobStatusResponse, JobSubmitResponse
+from app.services.jobs import get_job_queue
+from app.services.upload import read_image_upload
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+@router.post("/jobs", response_model=JobSubmitResponse, status_code=202)
+async def submit_analysis_job(
+    file: UploadFile = File(...)
+):
+    """
+    Queue a crop image for asynchronous analysis and return a job id to poll
+    """
+    contents = await read_image_upload(file)
+    
+    try:
+        # SQLite and Redis calls block: keep them off the event loop
+        job_queue = await asyncio.to_thread(get_job_queue)
+        job_id = await asyncio.to_thread(job_queue.submit, contents, file.filename)
+    except Exception as e:
+        logger.error(f"Error queueing job: {str(e)}")
+        raise HTTPException(status_code=503, detail=f"Job queue unavailable: {str(e)}")
+    
+    return JobSubmitResponse(job_id=job_id, status="pending", status_url=f"/api/v1/jobs/{job_id}")
+
+@router.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_analysis_job(job_id: str):
+    """Poll an analysis job; the result is kept until the job expires"""
+    try:
+        job_queue = await asyncio.to_thread(get_job_queue)
+        job = await asyncio.to_thread(job_queue.get, job_id)
+    except Exception as e:
+        logger.error(f"Error reading job {job_id}: {str(e)}")
+        raise HTTPException(status_code=503, detail=f"Job queue unavailable: {str(e)}")
+    
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    
+    return JobStatusResponse(
+        job_id=job["id"],
+        status=job["status"],
+        filename=job["filename"],
+        result=job["result"],
+        error=job["error"],
+        created_at=job["created_at"],
+        updated_at=job["updated_at"]
+    )
@@ -0,0 +1,120 @@
+# app/routes/similarity.py
+from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException, Query, Request
+import asyncio
+import logging
+from typing import Optional
+
+from app.models.disease_classifier import Prediction, classifier
+from app.routes.analysis import _ensure_model_ready, _request_deadline, _shed_response, _until_disconnect
+from app.schemas.analysis import SimilarCase, SimilarCasesResponse
+from app.services.analysis_service import build_analysis_response, predict_full_depth, predict_image_bytes
+from app.services.batching import DeadlineExceeded, Overloaded
+from app.services.similarity import similarity_index
+from app.services.upload import read_image_upload
+from app.utils.auth import require_admin
+from app.utils.classes import crop_of
+from app.utils.config import settings
+from app.utils.metrics import IN_FLIGHT
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+async def _predict_with_embedding(request: Request, file: UploadFile) -> Prediction:
+    """Classify an upload, keeping the embedding from the same forward pass"""
+    if not settings.SIMILARITY_ENABLED:
+        raise HTTPException(status_code=404, detail="Similar-case search is disabled")
+    _ensure_model_ready()
+    deadline = _request_deadline(request)
+    contents = await read_image_upload(file)
+    try:
+        prediction = await _until_disconnect(request, predict_image_bytes(contents, deadline))
+        # Exited early: the index only holds final-layer embeddings
+        if prediction[4] is None and prediction[3] is not None:
+            prediction = await _until_disconnect(request, predict_full_depth(contents, deadline))
+    except (Overloaded, DeadlineExceeded) as e:
+        raise _shed_response(e)
+    if prediction[4] is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Similar-case search needs a loaded model on the eager backend"
+        )
+    # An embedding from a version swapped out meanwhile isn't comparable with the index
+    if prediction[5] != classifier.model_version:
+        raise HTTPException(
+            status_code=503,
+            detail="The model was replaced during the request. Please retry.",
+            headers={"Retry-After": "1"}
+        )
+    return prediction
+
+def _check_index_version():
+    """Embeddings of a different model are not comparable"""
+    if similarity_index.model_version not in (None, classifier.embedding_version):
+        raise HTTPException(
+            status_code=409,
+            detail=f"Similarity index was built with model {similarity_index.model_version}, "
+                   f"serving {classifier.embedding_version}"
+        )
+
+@router.post("/similar", response_model=SimilarCasesResponse)
+async def find_similar_cases(
+    request: Request,
+    file: UploadFile = File(...),
+    crop: Optional[str] = Query(None, description="only cases of this crop; 'auto' uses the predicted crop"),
+    k: int = Query(5, ge=1)
+):
+    """
+    Diagnose a crop image and return the most similar confirmed past cases
+    """
+    try:
+        with IN_FLIGHT.track():
+            disease_name, confidence, _, exit_layer, embedding, model_version = await _predict_with_embedding(request, file)
+            if crop == "auto":
+                crop = crop_of(disease_name)
+            
+            await asyncio.to_thread(similarity_index.refresh)
+            _check_index_version()
+            matches = await asyncio.to_thread(
+                similarity_index.search, embedding, min(k, settings.SIMILARITY_MAX_K), crop
+            )
+            
+            return SimilarCasesResponse(
+                diagnosis=build_analysis_response(disease_name, confidence, exit_layer, model_version),
+                crop=crop,
+                index_size=similarity_index.size,
+                matches=[SimilarCase(**case, score=round(score, 4)) for case, score in matches]
+            )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in similar-case search: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Similar-case search failed: {str(e)}")
+
+@router.post("/similar/cases", response_model=SimilarCase, status_code=201, dependencies=[Depends(require_admin)])
+async def add_confirmed_case(
+    request: Request,
+    file: UploadFile = File(...),
+    disease_name: str = Form(..., description="confirmed class name, e.g. Corn___Common_Rust"),
+    note: Optional[str] = Form(None)
+):
+    """
+    Add an image with a confirmed diagnosis to the similar-case index (needs ``X-Admin-Token``)
+    """
+    if disease_name not in settings.DISEASE_CLASSES:
+        raise HTTPException(status_code=400, detail=f"Unknown disease class: {disease_name}")
+    
+    try:
+        _, _, _, _, embedding, _ = await _predict_with_embedding(request, file)
+        case = await asyncio.to_thread(
+            similarity_index.append, embedding, disease_name, classifier.embedding_version, note=note
+        )
+        return SimilarCase(**case)
+        
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error adding confirmed case: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Adding case failed: {str(e)}")
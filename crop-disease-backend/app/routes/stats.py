@@ -0,0 +1,32 @@
+# app/routes/stats.py
+from fastapi import APIRouter, HTTPException, Query
+import asyncio
+import logging
+
+from app.services.prediction_log import prediction_log
+from app.utils.config import settings
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+@router.get("/stats")
+async def get_prediction_stats(
+    days: int = Query(30, ge=1, le=settings.PREDICTION_LOG_MAX_DAYS, description="UTC days to cover, today included")
+):
+    """
+    Prediction counts per class, crop and day, with per-class confidence histograms.
+
+    Read from aggregates the prediction log keeps up to date as it flushes;
+    results from the last PREDICTION_LOG_FLUSH_SECONDS are still ``buffered``.
+    """
+    if not prediction_log.enabled:
+        raise HTTPException(status_code=404, detail="The prediction log is disabled")
+    
+    try:
+        return await asyncio.to_thread(prediction_log.stats, days)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error reading prediction stats: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Stats failed: {str(e)}")
@@ -0,0 +1,63 @@
+# app/routes/stream.py
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+import asyncio
+import logging
+
+from app.models.disease_classifier import classifier
+from app.services.streaming import BACKPRESSURE_POLICIES, FrameStream
+from app.utils.config import settings
+from app.utils.metrics import STREAM_CONNECTIONS
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+@router.websocket("/stream")
+async def stream_frames(websocket: WebSocket, policy: str = settings.STREAM_BACKPRESSURE):
+    """
+    Classify a continuous stream of video frames over one WebSocket.
+    
+    Send each frame as a binary message holding an encoded image. Every
+    frame gets exactly one JSON answer, in the order frames were sent, with
+    its 0-based ``frame`` number and a ``status``: ``classified``,
+    ``skipped`` (near-duplicate of ``reference_frame``, whose result it
+    carries), ``dropped`` (buffer overflow under ``policy=drop_oldest``) or
+    ``error``. A text message takes up a frame number and is answered as
+    an ``error``. ``policy=block`` stops reading while the buffer is full.
+    """
+    if policy not in BACKPRESSURE_POLICIES:
+        await websocket.close(code=1008, reason=f"policy must be one of {', '.join(BACKPRESSURE_POLICIES)}")
+        return
+    if not classifier.is_ready:
+        await websocket.close(code=1013, reason="Model is warming up. Please retry shortly.")
+        return
+    
+    await websocket.accept()
+    stream = FrameStream(
+        websocket.send_json, policy,
+        max_pending=settings.STREAM_MAX_PENDING,
+        batch_size=settings.STREAM_BATCH_SIZE,
+        skip_distance=settings.STREAM_SKIP_DISTANCE
+    )
+    worker = asyncio.create_task(stream.run())
+    
+    try:
+        with STREAM_CONNECTIONS.track():
+            while not worker.done():
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                if message.get("bytes") is None:
+                    await stream.reject("Frames must be sent as binary messages")
+                    continue
+                await stream.put(message["bytes"])
+    except WebSocketDisconnect:
+        pass
+    finally:
+        worker.cancel()
+        try:
+            await worker
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"Frame stream failed: {str(e)}")
+        logger.info(f"Frame stream closed after {stream.frames_received} frames")
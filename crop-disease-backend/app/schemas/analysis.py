@@ -1,6 +1,6 @@
 # app/schemas/analysis.py
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Optional
 from enum import Enum
 
 class DiseaseClass(str, Enum):
@@ -20,7 +20,7 @@ class DiseaseClass(str, Enum):
     WHEAT_YELLOW_RUST = "Wheat Yellow Rust"
 
 class AnalysisRequest(BaseModel):
-    image_data: str  # base64 encoded image
+    image_data: str  # base64 encoded image, optionally as a data URL
 
 class TreatmentInfo(BaseModel):
     remedies: List[str]
@@ -34,6 +34,65 @@ class AnalysisResponse(BaseModel):
     fungicides: List[str]
     is_healthy: bool
     severity: str
+    exit_layer: Optional[int] = None  # encoder layer the prediction exited after, with early exit
+    model_version: Optional[str] = None  # None for mock predictions without a loaded model
+
+class BatchAnalysisItem(BaseModel):
+    index: int
+    filename: Optional[str] = None
+    result: Optional[AnalysisResponse] = None
+    error: Optional[str] = None
+
+class TileResult(BaseModel):
+    row: int
+    col: int
+    x: int  # tile origin and size in original image pixels
+    y: int
+    size: int
+    disease_name: str
+    confidence: float
+
+class TiledAnalysisResponse(BaseModel):
+    diagnosis: AnalysisResponse
+    image_width: int
+    image_height: int
+    scale: float  # applied before tiling when the image needed too many tiles
+    tile_size: int
+    stride: int
+    rows: int
+    cols: int
+    affected_fraction: float
+    class_counts: Dict[str, int]
+    tiles: List[TileResult]
+
+class SimilarCase(BaseModel):
+    id: str
+    disease_name: str
+    crop: str
+    model_version: str
+    created_at: float
+    note: Optional[str] = None
+    score: Optional[float] = None  # cosine similarity to the query image
+
+class SimilarCasesResponse(BaseModel):
+    diagnosis: AnalysisResponse
+    crop: Optional[str] = None
+    index_size: int
+    matches: List[SimilarCase]
+
+class JobSubmitResponse(BaseModel):
+    job_id: str
+    status: str
+    status_url: str
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    status: str
+    filename: Optional[str] = None
+    result: Optional[AnalysisResponse] = None
+    error: Optional[str] = None
+    created_at: float
+    updated_at: float
 
 class ErrorResponse(BaseModel):
     error: str
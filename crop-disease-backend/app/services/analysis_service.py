@@ -0,0 +1,133 @@
+# app/services/analysis_service.py
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from app.models.disease_classifier import Prediction, classifier
+from app.schemas.analysis import AnalysisResponse
+from app.services.batching import batcher
+from app.services.cache import PredictionCache, prediction_cache
+from app.services.executor import executor
+from app.services.image_processing import ImageProcessor
+from app.services.prediction_log import prediction_log
+from app.utils import profiling
+from app.utils.metrics import REJECTED_UPLOADS, STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+def build_analysis_response(
+    disease_name: str, confidence: float, exit_layer: Optional[int] = None, model_version: Optional[str] = None,
+    request_started: Optional[float] = None
+) -> AnalysisResponse:
+    """Turn a raw model prediction into the API response and queue it for the prediction log"""
+    # Filter out low confidence predictions for "Invalid" class
+    if disease_name == "Invalid" and confidence > 70:
+        # Try to find the next best prediction
+        disease_name = "Unknown Disease"
+        confidence = confidence * 0.7  # Reduce confidence for uncertain predictions
+
+    started = time.perf_counter()
+
+    # Get additional information
+    description = classifier.get_disease_description(disease_name)
+    severity = classifier.get_severity(confidence, disease_name)
+    treatments = classifier.get_treatment_recommendations(disease_name)
+
+    response = AnalysisResponse(
+        disease_name=disease_name,
+        confidence=round(confidence, 2),
+        description=description,
+        remedies=treatments["remedies"],
+        fungicides=treatments["fungicides"],
+        is_healthy="Healthy" in disease_name,
+        severity=severity,
+        exit_layer=exit_layer,
+        model_version=model_version
+    )
+    STAGE_SECONDS.observe(time.perf_counter() - started, "response_build")
+
+    # Mock predictions are random and would only skew the stats
+    if model_version is not None:
+        latency = time.perf_counter() - request_started if request_started is not None else None
+        prediction_log.record(response.disease_name, response.confidence, severity, latency, model_version)
+
+    logger.info(f"Analysis completed: {disease_name} ({confidence:.2f}%) - Severity: {severity}")
+
+    return response
+
+
+async def predict_image_bytes(contents: bytes, deadline: Optional[float] = None) -> Prediction:
+    """Decode and classify an uploaded image, answering repeats from the cache.
+
+    ``deadline`` (a ``time.perf_counter()`` value) drops the request if it
+    passes before the forward pass starts; see ``MicroBatcher.submit``.
+    A profiled request (see ``app.utils.profiling``) runs every stage
+    itself: no cache hit, no shared batch.
+    """
+    trace = profiling.current_trace()
+    
+    # Re-submitted photos are answered from the cache without decoding
+    with STAGE_SECONDS.time("cache_lookup"), profiling.span("cache_lookup"):
+        digest = PredictionCache.digest(contents)
+        prediction = None
+        if trace is None:
+            prediction = prediction_cache.get(PredictionCache.make_key(digest, classifier.model_version))
+
+    if prediction is None:
+        # Don't spend a decode on a request that can't be admitted
+        batcher.check_admission(deadline)
+        
+        # Decode and resize off the event loop
+        try:
+            with STAGE_SECONDS.time("decode"), profiling.span("decode"):
+                if trace is None:
+                    processed_image = await executor.run_preprocess(ImageProcessor.process_image, contents)
+                else:
+                    # A thread of this process, so the decode's own stages are traced
+                    processed_image = await asyncio.to_thread(ImageProcessor.process_image, contents)
+        except Exception:
+            REJECTED_UPLOADS.inc("decode_error")
+            raise
+
+        if trace is None:
+            # Make prediction using the actual model, batched with concurrent requests
+            prediction = await batcher.submit(processed_image, deadline)
+        else:
+            with profiling.span("inference"):
+                predictions = await executor.run_inference(
+                    trace.profile_call, classifier.predict_batch, [processed_image]
+                )
+            prediction = predictions[0]
+            trace.metadata.update(bytes=len(contents), model_version=prediction[5])
+
+        # Keyed by the version that made it, which a hot swap may have changed
+        # meanwhile; mock predictions have none, are random and must not be replayed
+        model_version = prediction[5]
+        if model_version is not None:
+            prediction_cache.put(PredictionCache.make_key(digest, model_version), prediction)
+
+    return prediction
+
+
+async def predict_full_depth(contents: bytes, deadline: Optional[float] = None) -> Prediction:
+    """Decode and classify through every encoder layer, for a final-layer embedding.
+
+    Early exit would leave confident images without one; this runs alone,
+    outside the micro-batcher and the cache, but still under its admission
+    control.
+    """
+    with batcher.admitted(deadline):
+        processed_image = await executor.run_preprocess(ImageProcessor.process_image, contents)
+        batcher.check_deadline(deadline)
+        predictions = await executor.run_inference(classifier.predict_batch, [processed_image], True)
+    return predictions[0]
+
+
+async def analyze_image_bytes(contents: bytes, deadline: Optional[float] = None) -> AnalysisResponse:
+    """Decode, classify and describe an uploaded image"""
+    started = time.perf_counter()
+    disease_name, confidence, class_idx, exit_layer, _, model_version = await predict_image_bytes(contents, deadline)
+
+    return build_analysis_response(disease_name, confidence, exit_layer, model_version, started)
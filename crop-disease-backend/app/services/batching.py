@@ -0,0 +1,298 @@
+# app/services/batching.py
+import asyncio
+import logging
+import math
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from PIL import Image
+
+from app.models.disease_classifier import Prediction, classifier
+from app.services.executor import executor
+from app.utils.config import settings
+from app.utils.metrics import SHED_REQUESTS, STAGE_SECONDS, CallbackMetric, registry
+
+logger = logging.getLogger(__name__)
+
+
+class Overloaded(RuntimeError):
+    """Raised when the inference queue is full; ``retry_after`` is a drain-time estimate in seconds"""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Inference queue is full")
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(RuntimeError):
+    """Raised when a request's deadline passes before its forward pass starts"""
+
+    def __init__(self):
+        super().__init__("Request deadline passed before inference started")
+
+
+class _PendingPrediction:
+    """A single image waiting in the batch queue"""
+    __slots__ = ("image", "future", "enqueued_at", "started")
+
+    def __init__(self, image: Image.Image, future: asyncio.Future):
+        self.image = image
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+        self.started = False
+
+
+class BatchStats:
+    """Batch-size distribution and queueing delay of the micro-batcher"""
+
+    def __init__(self, window: int = 1024):
+        self.batch_sizes: Counter = Counter()
+        self.batches = 0
+        self.requests = 0
+        self.queue_delay_total = 0.0
+        self.queue_delay_max = 0.0
+        self.forward_time_total = 0.0
+        self.shed: Counter = Counter()
+        self._recent_delays: deque = deque(maxlen=window)
+
+    def record_batch(self, batch_size: int, queue_delays: List[float], forward_time: float):
+        self.batch_sizes[batch_size] += 1
+        self.batches += 1
+        self.requests += batch_size
+        self.forward_time_total += forward_time
+        for delay in queue_delays:
+            self.queue_delay_total += delay
+            self.queue_delay_max = max(self.queue_delay_max, delay)
+            self._recent_delays.append(delay)
+
+    def snapshot(self) -> Dict[str, Any]:
+        recent = sorted(self._recent_delays)
+
+        def percentile(q: float) -> float:
+            if not recent:
+                return 0.0
+            return recent[min(len(recent) - 1, int(q * len(recent)))] * 1000
+
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "mean_batch_size": round(self.requests / self.batches, 3) if self.batches else 0.0,
+            "batch_size_distribution": {str(size): count for size, count in sorted(self.batch_sizes.items())},
+            "queue_delay_ms": {
+                "mean": round(self.queue_delay_total / self.requests * 1000, 3) if self.requests else 0.0,
+                "p50": round(percentile(0.50), 3),
+                "p95": round(percentile(0.95), 3),
+                "p99": round(percentile(0.99), 3),
+                "max": round(self.queue_delay_max * 1000, 3),
+            },
+            "mean_forward_ms": round(self.forward_time_total / self.batches * 1000, 3) if self.batches else 0.0,
+            "shed": dict(self.shed),
+        }
+
+
+class MicroBatcher:
+    """Collects concurrent prediction requests into batched forward passes.
+
+    The first request in a batch waits at most ``max_wait_ms`` for company;
+    the batch is dispatched as soon as it reaches ``max_batch_size``.
+
+    Admission control: at most ``max_queue`` predictions may be admitted and
+    unfinished at once, and further ones fail fast with ``Overloaded``
+    instead of queueing behind work that would miss its clients' timeouts.
+    A request whose deadline passes, or whose caller is cancelled, before
+    its batch starts is dropped without running the model.
+    """
+
+    def __init__(self, max_batch_size: int, max_wait_ms: float, enabled: bool = True, max_queue: int = 0):
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.enabled = enabled
+        self.max_queue = max(0, max_queue)
+        self.waiting = 0
+        self.stats = BatchStats()
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        # Taken off the queue by the worker: being collected or in the forward pass
+        self._batch: List[_PendingPrediction] = []
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    @property
+    def is_saturated(self) -> bool:
+        return bool(self.max_queue) and self.waiting >= self.max_queue
+
+    def retry_after(self) -> int:
+        """Seconds until the admitted work should have drained, from recent forward times"""
+        forward = self.stats.forward_time_total / self.stats.batches if self.stats.batches else 0.0
+        return max(1, math.ceil(forward * self.waiting / self.max_batch_size))
+
+    def shed(self, reason: str):
+        """Count a prediction dropped before its forward pass"""
+        self.stats.shed[reason] += 1
+        SHED_REQUESTS.inc(reason)
+
+    def start(self):
+        """Start the batching worker on the running event loop"""
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the worker and fail every request it hasn't answered, queued or mid-batch"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        unanswered = self._batch
+        self._batch = []
+        if self._queue is not None:
+            while not self._queue.empty():
+                unanswered.append(self._queue.get_nowait())
+            self._queue = None
+        for pending in unanswered:
+            if not pending.future.done():
+                pending.future.set_exception(RuntimeError("Inference service is shutting down"))
+
+    async def submit(self, image: Image.Image, deadline: Optional[float] = None) -> Prediction:
+        """Queue an image and wait for its own prediction from a shared batch.
+
+        ``deadline`` is a ``time.perf_counter()`` value; raises ``Overloaded``
+        when the queue is full and ``DeadlineExceeded`` when the deadline
+        passes before the forward pass starts.
+        """
+        self.check_admission(deadline)
+
+        self.waiting += 1
+        try:
+            if not self.enabled:
+                results = await executor.run_inference(classifier.predict_batch, [image])
+                return results[0]
+
+            self.start()
+            loop = asyncio.get_running_loop()
+            pending = _PendingPrediction(image, loop.create_future())
+            self._queue.put_nowait(pending)
+            timer = None
+            if deadline is not None:
+                timer = loop.call_later(deadline - time.perf_counter(), self._expire, pending)
+            try:
+                return await pending.future
+            except asyncio.CancelledError:
+                # The future is cancelled with us, so the worker skips it
+                if not pending.started:
+                    self.shed("cancelled")
+                raise
+            finally:
+                if timer is not None:
+                    timer.cancel()
+        finally:
+            self.waiting -= 1
+
+    def check_admission(self, deadline: Optional[float] = None):
+        """Raise ``Overloaded`` or ``DeadlineExceeded`` for work that shouldn't be started"""
+        if self.is_saturated:
+            self.shed("queue_full")
+            raise Overloaded(self.retry_after())
+        self.check_deadline(deadline)
+
+    def check_deadline(self, deadline: Optional[float]):
+        """Raise ``DeadlineExceeded`` once ``deadline`` has passed"""
+        if deadline is not None and deadline <= time.perf_counter():
+            self.shed("deadline")
+            raise DeadlineExceeded()
+
+    @contextmanager
+    def admitted(self, deadline: Optional[float] = None) -> Iterator[None]:
+        """Admission and a place in ``waiting`` for inference run outside the batch queue.
+
+        For requests that call the inference pool themselves (tiled images,
+        full-depth passes); check ``check_deadline`` before each forward pass.
+        """
+        self.check_admission(deadline)
+        self.waiting += 1
+        try:
+            yield
+        finally:
+            self.waiting -= 1
+
+    def _expire(self, pending: _PendingPrediction):
+        if not pending.started and not pending.future.done():
+            self.shed("deadline")
+            pending.future.set_exception(DeadlineExceeded())
+
+    async def _collect(self) -> List[_PendingPrediction]:
+        """Wait for the first request, then fill the batch until it is full or the wait expires"""
+        first = await self._queue.get()
+        batch = [first]
+        self._batch = batch
+        deadline = first.enqueued_at + self.max_wait
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            # Skip requests that were cancelled or expired while queued
+            batch = [pending for pending in batch if not pending.future.done()]
+            self._batch = batch
+            if not batch:
+                continue
+            for pending in batch:
+                pending.started = True
+
+            started = time.perf_counter()
+            queue_delays = [started - pending.enqueued_at for pending in batch]
+            try:
+                results = await executor.run_inference(
+                    classifier.predict_batch, [pending.image for pending in batch]
+                )
+            except Exception as e:
+                logger.error(f"Batched prediction failed: {str(e)}")
+                for pending in batch:
+                    if not pending.future.done():
+                        pending.future.set_exception(e)
+                continue
+
+            self.stats.record_batch(len(batch), queue_delays, time.perf_counter() - started)
+            for delay in queue_delays:
+                STAGE_SECONDS.observe(delay, "queue_wait")
+            for pending, result in zip(batch, results):
+                if not pending.future.done():
+                    pending.future.set_result(result)
+            self._batch = []
+
+
+# Global batcher instance
+batcher = MicroBatcher(
+    max_batch_size=settings.BATCH_MAX_SIZE,
+    max_wait_ms=settings.BATCH_MAX_WAIT_MS,
+    enabled=settings.BATCHING_ENABLED,
+    max_queue=settings.INFERENCE_MAX_QUEUE,
+)
+
+registry.register(CallbackMetric(
+    "crop_disease_batch_queue_depth",
+    "Images waiting for the next batched forward pass",
+    lambda: batcher.queue_depth,
+))
+registry.register(CallbackMetric(
+    "crop_disease_inference_waiting",
+    "Predictions admitted and not yet finished, bounded by INFERENCE_MAX_QUEUE",
+    lambda: batcher.waiting,
+))
@@ -0,0 +1,134 @@
+# app/services/cache.py
+import hashlib
+import logging
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from app.models.disease_classifier import Prediction
+from app.utils.config import settings
+from app.utils.metrics import CallbackMetric, registry
+
+logger = logging.getLogger(__name__)
+
+
+class PredictionCache:
+    """Content-addressed LRU cache of model predictions with a TTL.
+
+    Keys are the SHA-256 of the uploaded bytes plus the model version, so a
+    hit skips both image decoding and the forward pass, and a model change
+    never serves stale results. Entries are evicted least-recently-used when
+    either the entry or the byte budget is exceeded.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl_seconds: float, enabled: bool = True):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl_seconds
+        self.enabled = enabled and max_entries > 0 and max_bytes > 0
+        self._entries: "OrderedDict[str, Tuple[Prediction, float, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def digest(image_data: bytes) -> str:
+        return hashlib.sha256(image_data).hexdigest()
+
+    @staticmethod
+    def make_key(digest: str, model_version: str) -> str:
+        return f"{model_version}:{digest}"
+
+    @staticmethod
+    def _entry_size(key: str, prediction: Prediction) -> int:
+        return sys.getsizeof(key) + sum(sys.getsizeof(value) for value in prediction) + 64
+
+    def get(self, key: str) -> Optional[Prediction]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            prediction, expires_at, size = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.current_bytes -= size
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return prediction
+
+    def put(self, key: str, prediction: Prediction):
+        if not self.enabled:
+            return
+        size = self._entry_size(key, prediction)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= previous[2]
+            self._entries[key] = (prediction, time.monotonic() + self.ttl, size)
+            self.current_bytes += size
+            while self._entries and (
+                len(self._entries) > self.max_entries or self.current_bytes > self.max_bytes
+            ):
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+# Global prediction cache
+prediction_cache = PredictionCache(
+    max_entries=settings.CACHE_MAX_ENTRIES,
+    max_bytes=settings.CACHE_MAX_BYTES,
+    ttl_seconds=settings.CACHE_TTL_SECONDS,
+    enabled=settings.CACHE_ENABLED,
+)
+
+registry.register(CallbackMetric(
+    "crop_disease_cache_events_total",
+    "Prediction cache lookups and removals by outcome",
+    lambda: {
+        ("hit",): prediction_cache.hits,
+        ("miss",): prediction_cache.misses,
+        ("eviction",): prediction_cache.evictions,
+        ("expiration",): prediction_cache.expirations,
+    },
+    type_name="counter",
+    labels=("event",),
+))
+registry.register(CallbackMetric(
+    "crop_disease_cache_bytes",
+    "Estimated bytes held by the prediction cache",
+    lambda: prediction_cache.current_bytes,
+))
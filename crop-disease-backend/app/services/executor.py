@@ -0,0 +1,114 @@
+# app/services/executor.py
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Optional
+
+from app.utils.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _init_preprocess_worker():
+    """Initializer for decode/preprocess workers"""
+    # Image decoding is single-threaded PIL work; keep any torch use in the
+    # worker from spawning its own thread pool and oversubscribing the cores.
+    try:
+        import torch
+        torch.set_num_threads(1)
+    except ImportError:
+        pass
+
+
+def _init_inference_worker(num_threads: int):
+    """Initializer for inference workers"""
+    import torch
+    if num_threads > 0:
+        torch.set_num_threads(num_threads)
+    logger.info(f"Inference worker started with {torch.get_num_threads()} torch threads")
+
+
+class InferenceExecutor:
+    """Runs CPU-bound decode/preprocess and model inference off the event loop.
+
+    Decode/preprocess goes to a thread or process pool (``EXECUTOR_KIND``).
+    Inference always runs on a small thread pool in this process: torch
+    releases the GIL during the forward pass, and keeping the model in-process
+    avoids shipping tensors and weights between processes.
+    """
+
+    def __init__(self, kind: str, preprocess_workers: int, inference_workers: int, torch_threads: int):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unsupported executor kind: {kind}")
+        self.kind = kind
+        self.preprocess_workers = max(1, preprocess_workers)
+        self.inference_workers = max(1, inference_workers)
+        self.torch_threads = torch_threads
+        self._preprocess_pool: Optional[Executor] = None
+        self._inference_pool: Optional[Executor] = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._inference_pool is not None
+
+    def start(self):
+        """Create the worker pools"""
+        if self.is_running:
+            return
+
+        if self.kind == "process":
+            self._preprocess_pool = ProcessPoolExecutor(
+                max_workers=self.preprocess_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_preprocess_worker,
+            )
+        else:
+            self._preprocess_pool = ThreadPoolExecutor(
+                max_workers=self.preprocess_workers,
+                thread_name_prefix="preprocess",
+            )
+        self._inference_pool = ThreadPoolExecutor(
+            max_workers=self.inference_workers,
+            thread_name_prefix="inference",
+            initializer=_init_inference_worker,
+            initargs=(self.torch_threads,),
+        )
+        logger.info(
+            f"Executor started: {self.preprocess_workers} {self.kind} preprocess workers, "
+            f"{self.inference_workers} inference workers"
+        )
+
+    def shutdown(self, wait: bool = True):
+        """Stop the pools, dropping work that has not started yet"""
+        for pool in (self._preprocess_pool, self._inference_pool):
+            if pool is not None:
+                pool.shutdown(wait=wait, cancel_futures=True)
+        self._preprocess_pool = None
+        self._inference_pool = None
+        logger.info("Executor shut down")
+
+    async def run_preprocess(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run a decode/preprocess function in the preprocess pool.
+
+        With the process pool, ``fn`` and its arguments must be picklable.
+        """
+        self.start()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._preprocess_pool, partial(fn, *args))
+
+    async def run_inference(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run a model call in the inference pool"""
+        self.start()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._inference_pool, partial(fn, *args))
+
+
+# Global executor instance
+executor = InferenceExecutor(
+    kind=settings.EXECUTOR_KIND,
+    preprocess_workers=settings.PREPROCESS_WORKERS,
+    inference_workers=settings.INFERENCE_WORKERS,
+    torch_threads=settings.TORCH_NUM_THREADS,
+)
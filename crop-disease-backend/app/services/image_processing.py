@@ -2,12 +2,19 @@
 from PIL import Image, ImageOps
 import io
 import base64
+import binascii
 import numpy as np
 import logging
-from typing import Tuple
+from typing import Tuple, Union
+
+from app.utils.config import settings
+from app.utils.profiling import span
 
 logger = logging.getLogger(__name__)
 
+# PIL warns above this pixel count and refuses to decode at twice the value
+Image.MAX_IMAGE_PIXELS = settings.MAX_IMAGE_PIXELS
+
 class ImageProcessor:
     @staticmethod
     def validate_image(file_content: bytes, max_size: int = 10 * 1024 * 1024) -> bool:
@@ -26,14 +33,25 @@ class ImageProcessor:
         """Process image for model input"""
         try:
             # Open image
-            image = Image.open(io.BytesIO(image_data))
+            with span("image_open"):
+                image = Image.open(io.BytesIO(image_data))
+            
+            # Let the JPEG decoder downscale by 1/2, 1/4 or 1/8 while decoding
+            # multi-megapixel photos, keeping at least 2x the target size for
+            # the final resize
+            with span("image_decode"):
+                if image.format == 'JPEG':
+                    image.draft('RGB', (target_size[0] * 2, target_size[1] * 2))
+                image.load()
             
             # Convert to RGB if necessary
             if image.mode != 'RGB':
-                image = image.convert('RGB')
+                with span("image_convert"):
+                    image = image.convert('RGB')
             
             # Resize image
-            image = ImageOps.fit(image, target_size, Image.Resampling.LANCZOS)
+            with span("image_resize"):
+                image = ImageOps.fit(image, target_size, Image.Resampling.LANCZOS)
             
             return image
             
@@ -41,15 +59,38 @@ class ImageProcessor:
             logger.error(f"Error processing image: {str(e)}")
             raise
     
+    @staticmethod
+    def dhash(image_data: bytes, hash_size: int = 8) -> int:
+        """Difference hash: one bit per horizontally adjacent pixel pair of a tiny grayscale thumbnail"""
+        image = Image.open(io.BytesIO(image_data))
+        # JPEG frames decode at 1/8 scale in draft mode, so hashing skips most of the decode
+        if image.format == 'JPEG':
+            image.draft('L', (hash_size * 8, hash_size * 8))
+        thumbnail = np.asarray(
+            image.convert('L').resize((hash_size + 1, hash_size), Image.Resampling.BILINEAR), dtype=np.int16
+        )
+        bits = (thumbnail[:, 1:] > thumbnail[:, :-1]).ravel()
+        return int.from_bytes(np.packbits(bits).tobytes(), "big")
+    
+    @staticmethod
+    def decode_base64(data: Union[str, bytes]) -> bytes:
+        """Decode base64 image data, with or without a ``data:image/...;base64,`` prefix"""
+        if isinstance(data, str):
+            # Base64 is ASCII: one flat copy, then only zero-copy views
+            data = data.encode("ascii")
+        view = memoryview(data)
+        # Data URL prefixes are short; only look for the comma near the start,
+        # and skip past it with a zero-copy slice
+        comma = data.find(b",", 0, 256)
+        if comma != -1:
+            view = view[comma + 1:]
+        return binascii.a2b_base64(view)
+    
     @staticmethod
     def base64_to_image(base64_string: str) -> Image.Image:
         """Convert base64 string to PIL Image"""
         try:
-            # Remove data URL prefix if present
-            if ',' in base64_string:
-                base64_string = base64_string.split(',')[1]
-            
-            image_data = base64.b64decode(base64_string)
+            image_data = ImageProcessor.decode_base64(base64_string)
             return Image.open(io.BytesIO(image_data))
             
         except Exception as e:
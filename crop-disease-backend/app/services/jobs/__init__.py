@@ -0,0 +1,26 @@
+# app/services/jobs/__init__.py
+from typing import Optional
+
+from app.services.jobs.base import COMPLETED, FAILED, PENDING, PROCESSING, JobQueue
+from app.utils.config import settings
+
+_job_queue: Optional[JobQueue] = None
+
+
+def create_job_queue(backend: str) -> JobQueue:
+    """Build the job queue selected by ``JOB_QUEUE_BACKEND``"""
+    if backend == "sqlite":
+        from app.services.jobs.sqlite_queue import SQLiteJobQueue
+        return SQLiteJobQueue(settings.JOB_SQLITE_PATH, settings.JOB_RESULT_TTL_SECONDS)
+    if backend == "redis":
+        from app.services.jobs.redis_queue import RedisJobQueue
+        return RedisJobQueue(settings.JOB_REDIS_URL, settings.JOB_RESULT_TTL_SECONDS)
+    raise ValueError(f"Unknown job queue backend '{backend}'. Choose 'sqlite' or 'redis'.")
+
+
+def get_job_queue() -> JobQueue:
+    """The process-wide job queue, created on first use"""
+    global _job_queue
+    if _job_queue is None:
+        _job_queue = create_job_queue(settings.JOB_QUEUE_BACKEND)
+    return _job_queue
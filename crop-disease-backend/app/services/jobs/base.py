@@ -0,0 +1,53 @@
+# app/services/jobs/base.py
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+
+# Job lifecycle: pending -> processing -> completed | failed
+PENDING = "pending"
+PROCESSING = "processing"
+COMPLETED = "completed"
+FAILED = "failed"
+
+
+class JobQueue(ABC):
+    """Durable queue of analysis jobs shared by the API and the workers.
+
+    The API submits uploaded images and polls for results; workers claim
+    pending jobs in batches and store each result, which then expires after
+    the configured TTL.
+    """
+
+    @abstractmethod
+    def submit(self, image_data: bytes, filename: Optional[str] = None) -> str:
+        """Queue an image and return the new job id"""
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return the job's status, result and error, or None if unknown or expired"""
+
+    @abstractmethod
+    def fetch_batch(self, max_jobs: int, timeout: float) -> List[Tuple[str, bytes]]:
+        """Claim up to ``max_jobs`` pending jobs, waiting up to ``timeout`` seconds for the first"""
+
+    @abstractmethod
+    def complete(self, job_id: str, result: Dict[str, Any]):
+        """Store a job's result"""
+
+    @abstractmethod
+    def fail(self, job_id: str, error: str):
+        """Mark a job as failed"""
+
+    def purge_expired(self) -> int:
+        """Delete expired jobs; returns how many were removed"""
+        return 0
+
+    def requeue_stale(self, visibility_timeout: float, max_attempts: int) -> int:
+        """Put jobs claimed more than ``visibility_timeout`` seconds ago back in the queue.
+
+        Their worker is assumed to have died; jobs already claimed
+        ``max_attempts`` times are failed instead. Returns how many were re-queued.
+        """
+        return 0
+
+    def close(self):
+        pass
@@ -0,0 +1,149 @@
+# app/services/jobs/redis_queue.py
+import json
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services.jobs.base import COMPLETED, FAILED, PENDING, PROCESSING, JobQueue
+
+# Pops up to ARGV[1] ids off the consuming end of KEYS[1] (pending) and marks
+# each claimed in KEYS[2] (processing) within the same script, so no crash can
+# leave an id in neither. Returns id, image, id, image, ...
+_CLAIM_SCRIPT = """
+local claimed = {}
+while #claimed < 2 * tonumber(ARGV[1]) do
+    local job_id = redis.call('RPOP', KEYS[1])
+    if not job_id then
+        break
+    end
+    local key = ARGV[3] .. job_id
+    local image = redis.call('HGET', key, 'image')
+    -- Without an image the job expired before a worker got to it
+    if image then
+        redis.call('HSET', key, 'status', ARGV[4], 'updated_at', ARGV[2])
+        redis.call('HINCRBY', key, 'attempts', 1)
+        redis.call('ZADD', KEYS[2], ARGV[2], job_id)
+        table.insert(claimed, job_id)
+        table.insert(claimed, image)
+    end
+end
+return claimed
+"""
+
+
+class RedisJobQueue(JobQueue):
+    """Job queue on Redis, shared by API and worker processes across hosts.
+
+    Each job is a hash ``<prefix>:job:<id>`` with its own expiry; pending ids
+    go through the list ``<prefix>:pending``. Workers wait for an id to
+    arrive, then claim a batch with one Lua script that pops the ids and adds
+    them to the sorted set ``<prefix>:processing``, scored by claim time,
+    where they sit until they finish. Needs Redis 6.2 or later (BLMOVE).
+    """
+
+    def __init__(self, url: str, ttl_seconds: int, prefix: str = "crop-disease"):
+        try:
+            import redis
+        except ImportError as e:
+            raise ImportError("The redis job queue requires the redis package") from e
+
+        self.client = redis.Redis.from_url(url)
+        self.ttl = int(ttl_seconds)
+        self.prefix = prefix
+        self.pending_key = f"{prefix}:pending"
+        self.processing_key = f"{prefix}:processing"
+        self._claim = self.client.register_script(_CLAIM_SCRIPT)
+
+    def _job_key(self, job_id: str) -> str:
+        return f"{self.prefix}:job:{job_id}"
+
+    def submit(self, image_data: bytes, filename: Optional[str] = None) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        key = self._job_key(job_id)
+        pipe = self.client.pipeline()
+        pipe.hset(key, mapping={
+            "status": PENDING,
+            "filename": filename or "",
+            "image": image_data,
+            "created_at": now,
+            "updated_at": now,
+        })
+        pipe.expire(key, self.ttl)
+        pipe.lpush(self.pending_key, job_id)
+        pipe.execute()
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        fields = self.client.hmget(
+            self._job_key(job_id), "status", "filename", "result", "error", "created_at", "updated_at"
+        )
+        status, filename, result, error, created_at, updated_at = fields
+        if status is None:
+            return None
+        return {
+            "id": job_id,
+            "status": status.decode(),
+            "filename": filename.decode() if filename else None,
+            "result": json.loads(result) if result else None,
+            "error": error.decode() if error else None,
+            "created_at": float(created_at),
+            "updated_at": float(updated_at),
+        }
+
+    def fetch_batch(self, max_jobs: int, timeout: float) -> List[Tuple[str, bytes]]:
+        deadline = time.monotonic() + timeout
+        while True:
+            claimed = self._claim(
+                keys=[self.pending_key, self.processing_key],
+                args=[max(1, max_jobs), time.time(), self._job_key(""), PROCESSING],
+            )
+            if claimed:
+                return [(claimed[i].decode(), claimed[i + 1]) for i in range(0, len(claimed), 2)]
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return []
+            # Wait for an id without taking it: moving the tail onto itself leaves it in place
+            if self.client.blmove(self.pending_key, self.pending_key, remaining, src="RIGHT", dest="RIGHT") is None:
+                return []
+
+    def _finish(self, job_id: str, mapping: Dict[str, Any]):
+        key = self._job_key(job_id)
+        pipe = self.client.pipeline()
+        pipe.hset(key, mapping={**mapping, "updated_at": time.time()})
+        pipe.hdel(key, "image")
+        pipe.expire(key, self.ttl)
+        pipe.zrem(self.processing_key, job_id)
+        pipe.execute()
+
+    def complete(self, job_id: str, result: Dict[str, Any]):
+        self._finish(job_id, {"status": COMPLETED, "result": json.dumps(result)})
+
+    def fail(self, job_id: str, error: str):
+        self._finish(job_id, {"status": FAILED, "error": error})
+
+    def requeue_stale(self, visibility_timeout: float, max_attempts: int) -> int:
+        requeued = 0
+        for raw_id in self.client.zrangebyscore(self.processing_key, 0, time.time() - visibility_timeout):
+            # Only the process that removes the id re-queues it
+            if not self.client.zrem(self.processing_key, raw_id):
+                continue
+            job_id = raw_id.decode()
+            key = self._job_key(job_id)
+            status, attempts = self.client.hmget(key, "status", "attempts")
+            if status is None or status.decode() != PROCESSING:
+                # Expired, or finished just now
+                continue
+            if int(attempts or 0) >= max_attempts:
+                self.fail(job_id, f"Analysis did not finish after {max_attempts} attempts")
+                continue
+            pipe = self.client.pipeline()
+            pipe.hset(key, mapping={"status": PENDING, "updated_at": time.time()})
+            # Back at the consuming end: it has waited longest
+            pipe.rpush(self.pending_key, job_id)
+            pipe.execute()
+            requeued += 1
+        return requeued
+
+    def close(self):
+        self.client.close()
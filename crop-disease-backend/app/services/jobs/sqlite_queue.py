@@ -0,0 +1,148 @@
+# app/services/jobs/sqlite_queue.py
+import json
+import sqlite3
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services.jobs.base import COMPLETED, FAILED, PENDING, PROCESSING, JobQueue
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    filename TEXT,
+    image BLOB,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS jobs_pending ON jobs (status, created_at);
+CREATE INDEX IF NOT EXISTS jobs_expiry ON jobs (expires_at);
+"""
+
+
+class SQLiteJobQueue(JobQueue):
+    """Job queue in a local SQLite file; needs no external services.
+
+    Works for a worker running inside the API process as well as for
+    separate worker processes on the same host: every call opens its own
+    connection, and claiming a batch happens inside one write transaction.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float, poll_interval: float = 0.1):
+        self.path = path
+        self.ttl = ttl_seconds
+        self.poll_interval = poll_interval
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            # Queues created before claims were counted
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "attempts" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def submit(self, image_data: bytes, filename: Optional[str] = None) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, status, filename, image, created_at, updated_at, expires_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, PENDING, filename, sqlite3.Binary(image_data), now, now, now + self.ttl),
+            )
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id, status, filename, result, error, created_at, updated_at FROM jobs "
+                "WHERE id = ? AND expires_at > ?",
+                (job_id, time.time()),
+            ).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def _claim(self, max_jobs: int) -> List[Tuple[str, bytes]]:
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                "SELECT id, image FROM jobs WHERE status = ? ORDER BY created_at LIMIT ?",
+                (PENDING, max_jobs),
+            ).fetchall()
+            if rows:
+                conn.executemany(
+                    "UPDATE jobs SET status = ?, updated_at = ?, attempts = attempts + 1 WHERE id = ?",
+                    [(PROCESSING, time.time(), row["id"]) for row in rows],
+                )
+            conn.execute("COMMIT")
+            return [(row["id"], bytes(row["image"])) for row in rows]
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def fetch_batch(self, max_jobs: int, timeout: float) -> List[Tuple[str, bytes]]:
+        deadline = time.monotonic() + timeout
+        while True:
+            jobs = self._claim(max_jobs)
+            if jobs or time.monotonic() >= deadline:
+                return jobs
+            time.sleep(self.poll_interval)
+
+    def _finish(self, job_id: str, status: str, result: Optional[str], error: Optional[str]):
+        now = time.time()
+        with self._connect() as conn:
+            # Drop the image once the job is done; results expire TTL after completion
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, image = NULL, "
+                "updated_at = ?, expires_at = ? WHERE id = ?",
+                (status, result, error, now, now + self.ttl, job_id),
+            )
+
+    def complete(self, job_id: str, result: Dict[str, Any]):
+        self._finish(job_id, COMPLETED, json.dumps(result), None)
+
+    def fail(self, job_id: str, error: str):
+        self._finish(job_id, FAILED, None, error)
+
+    def purge_expired(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("DELETE FROM jobs WHERE expires_at <= ?", (time.time(),)).rowcount
+
+    def requeue_stale(self, visibility_timeout: float, max_attempts: int) -> int:
+        now = time.time()
+        cutoff = now - visibility_timeout
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, image = NULL, updated_at = ?, expires_at = ? "
+                "WHERE status = ? AND updated_at < ? AND attempts >= ?",
+                (FAILED, f"Analysis did not finish after {max_attempts} attempts", now, now + self.ttl,
+                 PROCESSING, cutoff, max_attempts),
+            )
+            requeued = conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE status = ? AND updated_at < ?",
+                (PENDING, now, PROCESSING, cutoff),
+            ).rowcount
+            conn.execute("COMMIT")
+            return requeued
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
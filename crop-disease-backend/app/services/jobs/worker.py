@@ -0,0 +1,101 @@
+# app/services/jobs/worker.py
+import asyncio
+import logging
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from app.models.disease_classifier import classifier
+from app.services.analysis_service import build_analysis_response
+from app.services.executor import executor
+from app.services.image_processing import ImageProcessor
+from app.services.jobs.base import JobQueue
+from app.utils.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class JobWorker:
+    """Pulls queued jobs in batches and runs them through one forward pass"""
+
+    def __init__(self, queue: JobQueue, batch_size: int, poll_timeout: float, purge_interval: float = 60.0):
+        self.queue = queue
+        self.batch_size = max(1, batch_size)
+        self.poll_timeout = poll_timeout
+        self.purge_interval = purge_interval
+        self._last_purge = 0.0
+
+    def process_batch(self, jobs: List[Tuple[str, bytes]]) -> int:
+        """Decode, classify and store results for claimed jobs; returns how many completed"""
+        decoded = []
+        for job_id, image_data in jobs:
+            try:
+                decoded.append((job_id, ImageProcessor.process_image(image_data)))
+            except Exception as e:
+                self.queue.fail(job_id, f"Invalid image file: {str(e)}")
+
+        if not decoded:
+            return 0
+
+        try:
+            predictions = classifier.predict_batch([image for _, image in decoded])
+        except Exception as e:
+            logger.error(f"Job batch failed: {str(e)}")
+            for job_id, _ in decoded:
+                self.queue.fail(job_id, f"Analysis failed: {str(e)}")
+            return 0
+
+        for (job_id, _), (disease_name, confidence, class_idx, exit_layer, _, model_version) in zip(decoded, predictions):
+            response = build_analysis_response(disease_name, confidence, exit_layer, model_version)
+            self.queue.complete(job_id, response.model_dump())
+        return len(decoded)
+
+    def fetch(self, timeout: Optional[float] = None) -> List[Tuple[str, bytes]]:
+        """Purge expired jobs and re-queue lost ones now and then, and claim the next batch"""
+        now = time.monotonic()
+        if now - self._last_purge >= self.purge_interval:
+            self._last_purge = now
+            purged = self.queue.purge_expired()
+            if purged:
+                logger.info(f"Purged {purged} expired jobs")
+            requeued = self.queue.requeue_stale(settings.JOB_VISIBILITY_TIMEOUT, settings.JOB_MAX_ATTEMPTS)
+            if requeued:
+                logger.warning(f"Re-queued {requeued} jobs whose worker stopped responding")
+
+        return self.queue.fetch_batch(self.batch_size, self.poll_timeout if timeout is None else timeout)
+
+    def run_once(self, timeout: Optional[float] = None) -> int:
+        """Claim one batch (waiting up to the poll timeout) and process it"""
+        jobs = self.fetch(timeout)
+        if not jobs:
+            return 0
+        return self.process_batch(jobs)
+
+    def run_forever(self, stop_event: threading.Event):
+        """Worker loop for a standalone worker process"""
+        logger.info(f"Job worker started (batch size {self.batch_size})")
+        while not stop_event.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Job worker error: {str(e)}")
+                stop_event.wait(self.poll_timeout)
+        logger.info("Job worker stopped")
+
+    async def run_in_process(self, stop_event: asyncio.Event):
+        """Worker loop inside the API process.
+
+        Batches run on the shared inference pool, so they take turns with the
+        request micro-batcher instead of competing with it for cores.
+        """
+        loop = asyncio.get_running_loop()
+        logger.info(f"In-process job worker started (batch size {self.batch_size})")
+        while not stop_event.is_set():
+            try:
+                jobs = await loop.run_in_executor(None, self.fetch)
+                if jobs:
+                    await executor.run_inference(self.process_batch, jobs)
+            except Exception as e:
+                logger.error(f"Job worker error: {str(e)}")
+                await asyncio.sleep(self.poll_timeout)
+        logger.info("In-process job worker stopped")
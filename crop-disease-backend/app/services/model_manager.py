@@ -0,0 +1,101 @@
+# app/services/model_manager.py
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from app.models.disease_classifier import classifier
+from app.models.registry import ModelRegistry, model_registry
+from app.utils.config import settings
+from app.utils.metrics import MODEL_SWAPS
+
+logger = logging.getLogger(__name__)
+
+
+class SwapInProgress(Exception):
+    """Another version is still loading"""
+
+
+class ModelManager:
+    """Hot swaps the served model to registry versions, one swap at a time.
+
+    ``activate`` swaps this process in the background and, once the new
+    version has loaded and warmed up here, points the registry at it;
+    ``watch`` polls the registry's ``ACTIVE`` pointer so the other worker
+    processes follow within ``poll_seconds``. A version that fails to load
+    never becomes active.
+    """
+
+    def __init__(self, registry: ModelRegistry, poll_seconds: float):
+        self.registry = registry
+        self.poll_seconds = poll_seconds
+        self.status: Dict[str, Any] = {"state": "idle"}
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def is_swapping(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def activate(self, version: str) -> Dict[str, Any]:
+        """Make ``version`` active for every worker; ``KeyError`` if it isn't registered"""
+        path = self.registry.path(version)
+        if self.is_swapping:
+            raise SwapInProgress(f"Still swapping to {self.status['version']}")
+        self._start(version, path, publish=True)
+        return self.status
+
+    def _start(self, version: str, path: str, publish: bool = False):
+        self.status = {"state": "loading", "version": version, "started_at": time.time()}
+        self._task = asyncio.create_task(self._swap(version, path, publish))
+
+    async def _swap(self, version: str, path: str, publish: bool):
+        warmup_batch_sizes = settings.WARMUP_BATCH_SIZES or sorted({1, settings.BATCH_MAX_SIZE})
+        started = time.perf_counter()
+        try:
+            # A thread of its own, not the inference pool, so serving continues meanwhile
+            model = await asyncio.to_thread(
+                classifier.swap_model, path, warmup_batch_sizes, settings.WARMUP_ITERATIONS
+            )
+        except Exception as e:
+            logger.error(f"Swapping to model version {version} failed: {str(e)}")
+            MODEL_SWAPS.inc("failed")
+            self.status = {**self.status, "state": "failed", "error": str(e)}
+            return
+        if publish:
+            try:
+                await asyncio.to_thread(self.registry.set_active, version)
+            except Exception as e:
+                # Serving it here, but the others (and this one's watcher) stay on the registry's version
+                logger.error(f"Could not point the registry at model version {version}: {str(e)}")
+        MODEL_SWAPS.inc("succeeded")
+        self.status = {
+            "state": "active",
+            "version": version,
+            "model_version": model.model_version,
+            "swap_seconds": round(time.perf_counter() - started, 2),
+        }
+
+    async def watch(self):
+        """Follow the registry's ``ACTIVE`` pointer until cancelled"""
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            if self.is_swapping or not classifier.is_ready:
+                continue
+            version = self.registry.active_version()
+            if version is None:
+                continue
+            try:
+                path = self.registry.path(version)
+            except KeyError:
+                continue
+            # Don't retry a version that failed to load here until the pointer changes
+            if path == classifier.model_path or (
+                self.status["state"] == "failed" and self.status["version"] == version
+            ):
+                continue
+            logger.info(f"Registry points at model version {version}; swapping")
+            self._start(version, path)
+
+
+# Global model manager instance
+model_manager = ModelManager(model_registry, settings.MODEL_REGISTRY_POLL_SECONDS)
@@ -0,0 +1,336 @@
+# app/services/prediction_log.py
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+
+from app.utils.classes import crop_of
+from app.utils.config import settings
+from app.utils.metrics import CallbackMetric, registry
+
+logger = logging.getLogger(__name__)
+
+# Confidence histogram: ten buckets of ten percentage points
+HISTOGRAM_BUCKETS = 10
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS predictions (
+    id INTEGER PRIMARY KEY,
+    created_at REAL NOT NULL,
+    disease_name TEXT NOT NULL,
+    crop TEXT NOT NULL,
+    confidence REAL NOT NULL,
+    severity TEXT,
+    latency_ms REAL,
+    model_version TEXT
+);
+CREATE INDEX IF NOT EXISTS predictions_created ON predictions (created_at);
+CREATE TABLE IF NOT EXISTS prediction_daily (
+    day TEXT NOT NULL,
+    disease_name TEXT NOT NULL,
+    crop TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    confidence_sum REAL NOT NULL,
+    PRIMARY KEY (day, disease_name)
+);
+CREATE TABLE IF NOT EXISTS prediction_confidence (
+    day TEXT NOT NULL,
+    disease_name TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (day, disease_name, bucket)
+);
+"""
+
+# (day, disease_name) -> [crop, count, confidence_sum]; (day, disease_name, bucket) -> count
+Daily = Dict[Tuple[str, str], List[Any]]
+Histogram = Dict[Tuple[str, str, int], int]
+
+
+def day_of(timestamp: float) -> str:
+    """UTC calendar day, ``YYYY-MM-DD``"""
+    return time.strftime("%Y-%m-%d", time.gmtime(timestamp))
+
+
+def aggregate(records: Iterable[Dict[str, Any]]) -> Tuple[Daily, Histogram]:
+    """Per-day, per-class counts and confidence histogram of a batch of records"""
+    daily: Daily = {}
+    histogram: Histogram = {}
+    for record in records:
+        day = day_of(record["created_at"])
+        entry = daily.setdefault((day, record["disease_name"]), [record["crop"], 0, 0.0])
+        entry[1] += 1
+        entry[2] += record["confidence"]
+        bucket = min(int(record["confidence"] // (100 / HISTOGRAM_BUCKETS)), HISTOGRAM_BUCKETS - 1)
+        key = (day, record["disease_name"], bucket)
+        histogram[key] = histogram.get(key, 0) + 1
+    return daily, histogram
+
+
+def render_stats(daily: Daily, histogram: Histogram) -> Dict[str, Any]:
+    """Per-class, per-crop and per-day counts plus per-class confidence histograms"""
+    per_class: Dict[str, Dict[str, Any]] = {}
+    per_crop: Dict[str, int] = {}
+    per_day: Dict[str, Dict[str, int]] = {}
+    for (day, disease_name), (crop, count, confidence_sum) in daily.items():
+        entry = per_class.setdefault(disease_name, {"crop": crop, "count": 0, "confidence_sum": 0.0})
+        entry["count"] += count
+        entry["confidence_sum"] += confidence_sum
+        per_crop[crop] = per_crop.get(crop, 0) + count
+        per_day.setdefault(day, {})[disease_name] = count
+
+    histograms: Dict[str, List[int]] = {}
+    for (_, disease_name, bucket), count in histogram.items():
+        histograms.setdefault(disease_name, [0] * HISTOGRAM_BUCKETS)[bucket] += count
+
+    return {
+        "total": sum(entry["count"] for entry in per_class.values()),
+        "per_class": {
+            name: {
+                "crop": entry["crop"],
+                "count": entry["count"],
+                "mean_confidence": round(entry["confidence_sum"] / entry["count"], 2),
+            }
+            for name, entry in sorted(per_class.items())
+        },
+        "per_crop": dict(sorted(per_crop.items())),
+        "per_day": {day: dict(sorted(counts.items())) for day, counts in sorted(per_day.items())},
+        "confidence_histogram": {
+            "bucket_edges": [round(i * 100 / HISTOGRAM_BUCKETS, 1) for i in range(HISTOGRAM_BUCKETS + 1)],
+            "per_class": dict(sorted(histograms.items())),
+        },
+    }
+
+
+class SQLitePredictionSink:
+    """Prediction rows and their aggregates in one SQLite file, shared by every worker process.
+
+    Each flush inserts its rows and adds its per-day counts and histogram
+    buckets to the aggregate tables in the same transaction, so stats read
+    a few rows per day and class however long the history is.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def write(self, records: List[Dict[str, Any]]):
+        daily, histogram = aggregate(records)
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "INSERT INTO predictions (created_at, disease_name, crop, confidence, severity, latency_ms, model_version) "
+                "VALUES (:created_at, :disease_name, :crop, :confidence, :severity, :latency_ms, :model_version)",
+                records,
+            )
+            conn.executemany(
+                "INSERT INTO prediction_daily (day, disease_name, crop, count, confidence_sum) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (day, disease_name) DO UPDATE SET "
+                "count = count + excluded.count, confidence_sum = confidence_sum + excluded.confidence_sum",
+                [(day, name, crop, count, total) for (day, name), (crop, count, total) in daily.items()],
+            )
+            conn.executemany(
+                "INSERT INTO prediction_confidence (day, disease_name, bucket, count) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (day, disease_name, bucket) DO UPDATE SET count = count + excluded.count",
+                [(day, name, bucket, count) for (day, name, bucket), count in histogram.items()],
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def stats(self, since_day: str) -> Dict[str, Any]:
+        with self._connect() as conn:
+            daily = {
+                (day, name): [crop, count, total]
+                for day, name, crop, count, total in conn.execute(
+                    "SELECT day, disease_name, crop, count, confidence_sum FROM prediction_daily WHERE day >= ?",
+                    (since_day,),
+                )
+            }
+            histogram = {
+                (day, name, bucket): count
+                for day, name, bucket, count in conn.execute(
+                    "SELECT day, disease_name, bucket, count FROM prediction_confidence WHERE day >= ?",
+                    (since_day,),
+                )
+            }
+        return render_stats(daily, histogram)
+
+
+class JSONLPredictionSink:
+    """Prediction records appended as JSON lines, with aggregates kept in this process.
+
+    The aggregates start empty and cover only what this process flushed;
+    use the SQLite sink for stats across worker processes and restarts.
+    """
+
+    name = "jsonl"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._daily: Daily = {}
+        self._histogram: Histogram = {}
+        self._lock = threading.Lock()
+
+    def write(self, records: List[Dict[str, Any]]):
+        with open(self.path, "a") as f:
+            f.write("".join(json.dumps(record) + "\n" for record in records))
+        daily, histogram = aggregate(records)
+        with self._lock:
+            for key, (crop, count, total) in daily.items():
+                entry = self._daily.setdefault(key, [crop, 0, 0.0])
+                entry[1] += count
+                entry[2] += total
+            for key, count in histogram.items():
+                self._histogram[key] = self._histogram.get(key, 0) + count
+
+    def stats(self, since_day: str) -> Dict[str, Any]:
+        with self._lock:
+            daily = {key: list(value) for key, value in self._daily.items() if key[0] >= since_day}
+            histogram = {key: count for key, count in self._histogram.items() if key[0] >= since_day}
+        return render_stats(daily, histogram)
+
+
+def create_prediction_sink(backend: str):
+    """Build the sink selected by ``PREDICTION_LOG_BACKEND``"""
+    if backend == "sqlite":
+        return SQLitePredictionSink(settings.PREDICTION_LOG_SQLITE_PATH)
+    if backend == "jsonl":
+        return JSONLPredictionSink(settings.PREDICTION_LOG_JSONL_PATH)
+    raise ValueError(f"Unknown prediction log backend '{backend}'. Choose 'sqlite' or 'jsonl'.")
+
+
+class PredictionLog:
+    """Bounded in-memory buffer of analysis results, flushed to a sink in bulk.
+
+    ``record`` only appends to a ring buffer, so it never waits on I/O;
+    when the buffer is full the oldest unflushed record is dropped and
+    counted. A background task (or thread, outside the API) drains it every
+    ``flush_interval`` seconds.
+    """
+
+    def __init__(self, backend: str, capacity: int, flush_interval: float, enabled: bool = True):
+        self.backend = backend
+        self.enabled = enabled and capacity > 0
+        self.flush_interval = flush_interval
+        self._buffer: Deque[Dict[str, Any]] = deque(maxlen=max(1, capacity))
+        self._sink = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self.dropped = 0
+        self.flushed = 0
+
+    @property
+    def buffered(self) -> int:
+        return len(self._buffer)
+
+    @property
+    def sink(self):
+        """The sink, created on first use"""
+        if self._sink is None:
+            self._sink = create_prediction_sink(self.backend)
+        return self._sink
+
+    def record(self, disease_name: str, confidence: float, severity: str,
+               latency: Optional[float], model_version: Optional[str]):
+        """Queue one analysis result; ``latency`` in seconds when the caller measured it"""
+        if not self.enabled:
+            return
+        record = {
+            "created_at": time.time(),
+            "disease_name": disease_name,
+            "crop": crop_of(disease_name),
+            "confidence": confidence,
+            "severity": severity,
+            "latency_ms": round(latency * 1000, 3) if latency is not None else None,
+            "model_version": model_version,
+        }
+        with self._lock:
+            if len(self._buffer) == self._buffer.maxlen:
+                self.dropped += 1
+            self._buffer.append(record)
+
+    def flush(self) -> int:
+        """Write everything buffered so far to the sink; returns how many records"""
+        with self._flush_lock:
+            with self._lock:
+                records = list(self._buffer)
+                self._buffer.clear()
+            if not records:
+                return 0
+            try:
+                self.sink.write(records)
+            except Exception as e:
+                # Dropped rather than retried: a failing disk must not grow the heap
+                with self._lock:
+                    self.dropped += len(records)
+                logger.error(f"Writing {len(records)} prediction log records failed: {str(e)}")
+                return 0
+            self.flushed += len(records)
+            return len(records)
+
+    def stats(self, days: int) -> Dict[str, Any]:
+        """Aggregates over the last ``days`` UTC days, today included"""
+        since_day = day_of(time.time() - (max(1, days) - 1) * 86400)
+        return {
+            "backend": self.sink.name,
+            "since": since_day,
+            **self.sink.stats(since_day),
+            "buffered": self.buffered,
+            "dropped": self.dropped,
+        }
+
+    async def run(self):
+        """Flush periodically until cancelled, then once more"""
+        try:
+            while True:
+                await asyncio.sleep(self.flush_interval)
+                await asyncio.to_thread(self.flush)
+        finally:
+            await asyncio.to_thread(self.flush)
+
+    def run_forever(self, stop_event: threading.Event):
+        """Flush loop for processes without an event loop, such as the standalone job worker"""
+        while not stop_event.wait(self.flush_interval):
+            self.flush()
+        self.flush()
+
+
+# Global prediction log instance
+prediction_log = PredictionLog(
+    backend=settings.PREDICTION_LOG_BACKEND,
+    capacity=settings.PREDICTION_LOG_BUFFER,
+    flush_interval=settings.PREDICTION_LOG_FLUSH_SECONDS,
+    enabled=settings.PREDICTION_LOG_ENABLED,
+)
+
+registry.register(CallbackMetric(
+    "crop_disease_prediction_log_records_total",
+    "Prediction log records written to the sink or dropped",
+    lambda: {
+        ("flushed",): prediction_log.flushed,
+        ("dropped",): prediction_log.dropped,
+    },
+    type_name="counter",
+    labels=("outcome",),
+))
+registry.register(CallbackMetric(
+    "crop_disease_prediction_log_buffered",
+    "Analysis results waiting to be flushed to the prediction log",
+    lambda: prediction_log.buffered,
+))
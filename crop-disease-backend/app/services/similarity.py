@@ -0,0 +1,177 @@
+# app/services/similarity.py
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.utils.classes import crop_of
+from app.utils.config import settings
+from app.utils.metrics import CallbackMetric, registry
+
+logger = logging.getLogger(__name__)
+
+VECTORS_FILE = "vectors.f32"
+CASES_FILE = "cases.jsonl"
+META_FILE = "index.json"
+
+
+class SimilarityIndex:
+    """Append-only store of confirmed-case embeddings with cosine top-k search.
+
+    Vectors are L2-normalized float32 rows appended to ``vectors.f32`` and
+    searched through a read-only memory map, so the index lives in the page
+    cache (shared by every worker process) rather than on the heap. Case
+    metadata is one JSON line per vector in ``cases.jsonl``, naming the row
+    it belongs to. Appends from any process hold an exclusive file lock;
+    readers pick up appended rows on the next search by remapping the grown
+    file and parsing only the metadata lines they haven't seen.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.dim: Optional[int] = None
+        self.model_version: Optional[str] = None
+        self._vectors: Optional[np.ndarray] = None
+        # Per row: index into _crop_names, or -1 for a row without metadata
+        self._crops = np.empty(0, dtype=np.int16)
+        self._crop_names: Dict[str, int] = {}
+        self._cases: Dict[int, Dict[str, Any]] = {}
+        self._cases_offset = 0
+        self._lock = threading.Lock()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    @property
+    def size(self) -> int:
+        """Searchable cases currently mapped"""
+        return len(self._cases)
+
+    def refresh(self):
+        """Map vectors and read case metadata appended since the last refresh"""
+        with self._lock:
+            if self.dim is None:
+                if not os.path.exists(self._path(META_FILE)):
+                    return
+                with open(self._path(META_FILE), "r") as f:
+                    meta = json.load(f)
+                self.dim, self.model_version = meta["dim"], meta["model_version"]
+
+            # Metadata first: a case line is only written after its vector
+            new_cases = self._read_new_cases()
+            rows = os.path.getsize(self._path(VECTORS_FILE)) // (self.dim * 4)
+            if rows == 0 or (not new_cases and self._vectors is not None and rows == len(self._vectors)):
+                return
+
+            crops = np.full(rows, -1, dtype=np.int16)
+            crops[:len(self._crops)] = self._crops[:rows]
+            for case in new_cases:
+                code = self._crop_names.setdefault(case["crop"], len(self._crop_names))
+                crops[case["row"]] = code
+                self._cases[case["row"]] = case
+
+            self._vectors = np.memmap(self._path(VECTORS_FILE), dtype=np.float32, mode="r", shape=(rows, self.dim))
+            self._crops = crops
+            if new_cases:
+                logger.info(f"Similarity index: {len(new_cases)} new cases, {len(self._cases)} total")
+
+    def _read_new_cases(self) -> List[Dict[str, Any]]:
+        path = self._path(CASES_FILE)
+        if not os.path.exists(path):
+            return []
+        with open(path, "rb") as f:
+            f.seek(self._cases_offset)
+            data = f.read()
+        # Leave a partially written last line for the next refresh
+        complete = data[:data.rfind(b"\n") + 1]
+        self._cases_offset += len(complete)
+        return [json.loads(line) for line in complete.splitlines() if line.strip()]
+
+    def search(
+        self, embedding: np.ndarray, k: int, crop: Optional[str] = None
+    ) -> List[Tuple[Dict[str, Any], float]]:
+        """The ``k`` most cosine-similar cases, optionally only those of one crop"""
+        self.refresh()
+        with self._lock:
+            vectors, crops, cases = self._vectors, self._crops, self._cases
+            code = self._crop_names.get(crop) if crop is not None else None
+        if vectors is None or not cases or (crop is not None and code is None):
+            return []
+
+        query = np.asarray(embedding, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        # One matrix-vector product over the mapped rows; cosine because rows are normalized
+        scores = vectors @ query
+        candidates = crops >= 0 if code is None else crops == code
+        scores[~candidates] = -np.inf
+
+        k = min(k, int(candidates.sum()))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(cases[int(row)], float(scores[row])) for row in top]
+
+    def append(self, embedding: np.ndarray, disease_name: str, model_version: str, **metadata) -> Dict[str, Any]:
+        """Add a confirmed case; safe against concurrent appends from other processes"""
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        vector = vector / max(float(np.linalg.norm(vector)), 1e-12)
+        row_bytes = vector.size * 4
+        os.makedirs(self.directory, exist_ok=True)
+
+        with open(self._path(VECTORS_FILE), "ab") as vectors_file:
+            fcntl.flock(vectors_file, fcntl.LOCK_EX)
+            try:
+                self._check_meta(vector.size, model_version)
+                size = vectors_file.seek(0, os.SEEK_END)
+                row = size // row_bytes
+                if size % row_bytes:
+                    # Drop a torn row left by a crash mid-write
+                    vectors_file.truncate(row * row_bytes)
+                vectors_file.write(vector.tobytes())
+                vectors_file.flush()
+
+                case = {
+                    "id": uuid.uuid4().hex,
+                    "row": row,
+                    "disease_name": disease_name,
+                    "crop": crop_of(disease_name),
+                    "model_version": model_version,
+                    "created_at": time.time(),
+                    **metadata,
+                }
+                with open(self._path(CASES_FILE), "a") as cases_file:
+                    cases_file.write(json.dumps(case) + "\n")
+            finally:
+                fcntl.flock(vectors_file, fcntl.LOCK_UN)
+        return case
+
+    def _check_meta(self, dim: int, model_version: str):
+        path = self._path(META_FILE)
+        if not os.path.exists(path):
+            with open(path, "w") as f:
+                json.dump({"dim": dim, "model_version": model_version}, f)
+            return
+        with open(path, "r") as f:
+            meta = json.load(f)
+        if meta["dim"] != dim or meta["model_version"] != model_version:
+            raise ValueError(
+                f"Similarity index holds {meta['dim']}-d embeddings of model {meta['model_version']}, "
+                f"not {dim}-d embeddings of {model_version}"
+            )
+
+
+# Global similarity index instance
+similarity_index = SimilarityIndex(settings.SIMILARITY_INDEX_DIR)
+
+registry.register(CallbackMetric(
+    "crop_disease_similarity_index_cases",
+    "Confirmed cases searchable in this worker's similarity index",
+    lambda: similarity_index.size,
+))
@@ -0,0 +1,147 @@
+# app/services/streaming.py
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from app.services.analysis_service import build_analysis_response, predict_image_bytes
+from app.services.executor import executor
+from app.services.image_processing import ImageProcessor
+from app.services.upload import validate_image_bytes
+from app.utils.metrics import STREAM_FRAMES
+
+logger = logging.getLogger(__name__)
+
+BACKPRESSURE_POLICIES = ("drop_oldest", "block")
+
+
+def _error_message(error: BaseException) -> str:
+    return str(error.detail) if isinstance(error, HTTPException) else str(error)
+
+
+class FrameStream:
+    """Classifies the frames of one stream connection and answers each, in order.
+
+    Incoming frames wait in a buffer of ``max_pending``. When it is full,
+    ``drop_oldest`` discards the oldest waiting frame (answered as
+    ``dropped``) so results stay close to real time, and ``block`` stops
+    reading until there is room, pushing back on the sender through the
+    transport. Each frame's dHash is compared with the last classified
+    frame's: frames within ``skip_distance`` bits reuse its result instead
+    of being decoded and classified. The remaining frames of a batch are
+    submitted to the shared micro-batcher together.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[Dict[str, Any]], Awaitable[None]],
+        policy: str,
+        max_pending: int,
+        batch_size: int,
+        skip_distance: int,
+    ):
+        if policy not in BACKPRESSURE_POLICIES:
+            raise ValueError(f"Unknown back-pressure policy: {policy}")
+        self.send = send
+        self.policy = policy
+        self.batch_size = max(1, batch_size)
+        self.skip_distance = skip_distance
+        self.frames_received = 0
+        self._pending: asyncio.Queue = asyncio.Queue(maxsize=max(1, max_pending))
+        # Answers waiting for every earlier frame to be sent first
+        self._answers: Dict[int, Dict[str, Any]] = {}
+        self._next_answer = 0
+        self._send_lock = asyncio.Lock()
+        # (frame, dHash, result) of the last classified frame
+        self._reference: Optional[Tuple[int, int, Dict[str, Any]]] = None
+
+    async def put(self, data: bytes):
+        """Accept the next frame, applying the back-pressure policy when the buffer is full"""
+        frame = self.frames_received
+        self.frames_received += 1
+        if self.policy == "block":
+            await self._pending.put((frame, data))
+            return
+        while self._pending.full():
+            dropped, _ = self._pending.get_nowait()
+            await self._answer(dropped, {"status": "dropped"})
+        self._pending.put_nowait((frame, data))
+
+    async def reject(self, error: str):
+        """Take up the next frame number with an ``error`` answer, sent in order like any other"""
+        frame = self.frames_received
+        self.frames_received += 1
+        await self._answer(frame, {"status": "error", "error": error})
+
+    async def run(self):
+        """Process buffered frames until cancelled, up to ``batch_size`` at a time"""
+        while True:
+            frames = [await self._pending.get()]
+            while len(frames) < self.batch_size and not self._pending.empty():
+                frames.append(self._pending.get_nowait())
+            await self._process(frames)
+
+    async def _hash(self, data: bytes) -> int:
+        validate_image_bytes(data)
+        return await executor.run_preprocess(ImageProcessor.dhash, data)
+
+    async def _process(self, frames: List[Tuple[int, bytes]]):
+        hashes = await asyncio.gather(*(self._hash(data) for _, data in frames), return_exceptions=True)
+        frame_hashes = {frame: frame_hash for (frame, _), frame_hash in zip(frames, hashes)}
+
+        # Decide skips in frame order against the last frame chosen for classification
+        reference = self._reference[:2] if self._reference is not None else None
+        decisions = []
+        to_classify = {}
+        for (frame, data), frame_hash in zip(frames, hashes):
+            if isinstance(frame_hash, BaseException):
+                decisions.append((frame, "error", _error_message(frame_hash)))
+                continue
+            if reference is not None and self.skip_distance > 0:
+                distance = (frame_hash ^ reference[1]).bit_count()
+                if distance <= self.skip_distance:
+                    decisions.append((frame, "skipped", (reference[0], distance)))
+                    continue
+            decisions.append((frame, "classified", None))
+            to_classify[frame] = data
+            reference = (frame, frame_hash)
+
+        predictions = await asyncio.gather(
+            *(predict_image_bytes(data) for data in to_classify.values()), return_exceptions=True
+        )
+        results: Dict[int, Any] = {}
+        if self._reference is not None:
+            results[self._reference[0]] = self._reference[2]
+        for frame, prediction in zip(to_classify, predictions):
+            if isinstance(prediction, BaseException):
+                results[frame] = prediction
+                continue
+            disease_name, confidence, _, exit_layer, _, model_version = prediction
+            results[frame] = build_analysis_response(disease_name, confidence, exit_layer, model_version).model_dump()
+            self._reference = (frame, frame_hashes[frame], results[frame])
+
+        for frame, status, detail in decisions:
+            if status == "error":
+                await self._answer(frame, {"status": "error", "error": detail})
+                continue
+            source = frame if status == "classified" else detail[0]
+            result = results.get(source)
+            if isinstance(result, BaseException) or result is None:
+                error = _error_message(result) if result is not None else "Reference frame was not classified"
+                await self._answer(frame, {"status": "error", "error": error})
+            elif status == "classified":
+                await self._answer(frame, {"status": "classified", "result": result})
+            else:
+                await self._answer(frame, {
+                    "status": "skipped", "reference_frame": detail[0], "distance": detail[1], "result": result,
+                })
+
+    async def _answer(self, frame: int, message: Dict[str, Any]):
+        """Queue a frame's answer and send every answer that is now next in order"""
+        STREAM_FRAMES.inc(message["status"])
+        self._answers[frame] = {"frame": frame, **message}
+        async with self._send_lock:
+            while self._next_answer in self._answers:
+                await self.send(self._answers.pop(self._next_answer))
+                self._next_answer += 1
@@ -0,0 +1,266 @@
+# app/services/tiling.py
+import io
+import logging
+import math
+import os
+import time
+from collections import Counter as ClassCounter
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import torch
+from PIL import Image
+
+from app.models.disease_classifier import classifier
+from app.schemas.analysis import TiledAnalysisResponse, TileResult
+from app.services.analysis_service import build_analysis_response
+from app.services.batching import batcher
+from app.services.executor import executor
+from app.services.upload import image_dimensions
+from app.utils.config import settings
+from app.utils.metrics import REJECTED_UPLOADS, STAGE_SECONDS, TILES_PER_REQUEST
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class TilePlan:
+    """Where the tiles of one image go, in the coordinates of the rescaled image"""
+
+    image_width: int
+    image_height: int
+    scale: float
+    tile_size: int
+    stride: int
+    xs: List[int]
+    ys: List[int]
+
+    @property
+    def scaled_size(self) -> Tuple[int, int]:
+        return (
+            max(self.tile_size, round(self.image_width * self.scale)),
+            max(self.tile_size, round(self.image_height * self.scale)),
+        )
+
+    @property
+    def origins(self) -> List[Tuple[int, int]]:
+        return [(x, y) for y in self.ys for x in self.xs]
+
+
+def _positions(length: int, tile_size: int, stride: int) -> List[int]:
+    """Window offsets covering ``length``; the last window is flush with the edge"""
+    if length <= tile_size:
+        return [0]
+    count = math.ceil((length - tile_size) / stride) + 1
+    return sorted({min(i * stride, length - tile_size) for i in range(count)})
+
+
+def plan_tiles(
+    width: int,
+    height: int,
+    tile_size: int,
+    overlap: float,
+    max_tiles: int,
+) -> TilePlan:
+    """Lay overlapping windows over an image, downscaling it until at most ``max_tiles`` fit.
+
+    Images smaller than one tile are upscaled so their short side fills it.
+    """
+    stride = max(1, int(tile_size * (1 - overlap)))
+    scale = max(1.0, tile_size / min(width, height))
+
+    while True:
+        scaled_width = max(tile_size, round(width * scale))
+        scaled_height = max(tile_size, round(height * scale))
+        xs = _positions(scaled_width, tile_size, stride)
+        ys = _positions(scaled_height, tile_size, stride)
+        count = len(xs) * len(ys)
+        if count <= max_tiles or (len(xs) == 1 and len(ys) == 1):
+            return TilePlan(width, height, scale, tile_size, stride, xs, ys)
+        # Tile count grows with area, so shrink both sides by the square root
+        scale *= min(0.95, math.sqrt(max_tiles / count))
+
+
+def decode_for_tiling(image_data: bytes, plan_size: Tuple[int, int]) -> Image.Image:
+    """Decode an image straight to the planned size, using JPEG draft mode when shrinking"""
+    image = Image.open(io.BytesIO(image_data))
+    if image.format == "JPEG":
+        image.draft("RGB", plan_size)
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    if image.size != plan_size:
+        image = image.resize(plan_size, Image.Resampling.LANCZOS)
+    return image
+
+
+def activation_bytes_per_tile(model_config: Dict[str, Any], tile_size: int) -> int:
+    """Rough peak activation memory of one ViT forward pass for a single tile.
+
+    Counts the input, the widest per-layer hidden states (QKV, attention
+    output and MLP) and the attention scores, doubled for allocator slack.
+    """
+    patch_size = model_config.get("patch_size", 16)
+    hidden_size = model_config.get("hidden_size", 768)
+    heads = model_config.get("num_attention_heads", 12)
+    intermediate_size = model_config.get("intermediate_size", 4 * hidden_size)
+
+    tokens = (tile_size // patch_size) ** 2 + 1
+    elements = (
+        3 * tile_size * tile_size
+        + tokens * (5 * hidden_size + intermediate_size)
+        + 2 * heads * tokens * tokens
+    )
+    return elements * 4 * 2
+
+
+def _available_memory_bytes(device: torch.device) -> Optional[int]:
+    if device.type == "cuda":
+        free, _ = torch.cuda.mem_get_info(device)
+        return free
+    try:
+        with open("/proc/meminfo", "r") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def tile_batch_size(tile_size: int) -> int:
+    """Tiles per forward pass that fit the memory budget (and half of what is actually free)"""
+    budget = settings.TILE_MEMORY_BUDGET_MB * 1024 * 1024
+    available = _available_memory_bytes(classifier.device)
+    if available:
+        budget = min(budget, available // 2)
+    per_tile = activation_bytes_per_tile(classifier.model_config, tile_size)
+    return max(1, min(settings.TILE_MAX_BATCH, budget // per_tile))
+
+
+def classify_tiles(image: Image.Image, origins: List[Tuple[int, int]]) -> Tuple[torch.Tensor, Optional[str]]:
+    """Class probabilities for tiles cut from ``image`` and the model version, one forward pass per batch of tiles"""
+    with STAGE_SECONDS.time("preprocess"):
+        pixel_values = classifier.preprocessor.crops(image, origins)
+    return classifier.predict_proba(pixel_values)
+
+
+def _is_diseased(disease_name: str) -> bool:
+    return "Healthy" not in disease_name and disease_name != "Invalid"
+
+
+def aggregate_tiles(probabilities: torch.Tensor) -> Tuple[str, float, float]:
+    """Overall diagnosis from per-tile probabilities.
+
+    A lesion often covers only a few tiles, so averaging would let the
+    healthy canopy drown it out. Instead the disease seen on the most tiles
+    above ``TILE_MIN_CONFIDENCE`` wins, with their mean confidence; only
+    when no tile is confidently diseased does the mean probability decide.
+
+    Returns ``(disease_name, confidence, affected_fraction)``.
+    """
+    confidences, indices = probabilities.max(dim=1)
+    confidences = (confidences * 100).tolist()
+    names = [classifier.class_names[i] for i in indices.tolist()]
+
+    diseased = [
+        (name, confidence) for name, confidence in zip(names, confidences)
+        if _is_diseased(name) and confidence >= settings.TILE_MIN_CONFIDENCE
+    ]
+    if diseased:
+        counts = ClassCounter(name for name, _ in diseased)
+        disease_name = max(
+            counts,
+            key=lambda name: (counts[name], sum(c for n, c in diseased if n == name))
+        )
+        disease_confidences = [c for n, c in diseased if n == disease_name]
+        confidence = sum(disease_confidences) / len(disease_confidences)
+        return disease_name, confidence, len(diseased) / len(names)
+
+    mean = probabilities.mean(dim=0)
+    class_idx = int(mean.argmax())
+    return classifier.class_names[class_idx], float(mean[class_idx]) * 100, 0.0
+
+
+async def analyze_tiled(contents: bytes, deadline: Optional[float] = None) -> TiledAnalysisResponse:
+    """Classify every overlapping tile of a high-resolution image and aggregate the grid.
+
+    Admitted like a single prediction and counted in the batcher's
+    ``waiting`` until its last chunk; ``deadline`` (a ``time.perf_counter()``
+    value) is checked before the decode and before every chunk.
+    """
+    dimensions = image_dimensions(contents)
+    if dimensions is None:
+        REJECTED_UPLOADS.inc("decode_error")
+        raise ValueError("cannot read image dimensions")
+    width, height = dimensions
+
+    tile_size = classifier.preprocessor.width
+    plan = plan_tiles(width, height, tile_size, settings.TILE_OVERLAP, settings.TILE_MAX_TILES)
+    origins = plan.origins
+    TILES_PER_REQUEST.observe(len(origins))
+
+    # Tiles bypass the micro-batch queue, as one request already fills whole
+    # batches, but not its admission control
+    batch_size = tile_batch_size(tile_size)
+    chunks = []
+    versions = []
+    with batcher.admitted(deadline):
+        try:
+            with STAGE_SECONDS.time("decode"):
+                image = await executor.run_preprocess(decode_for_tiling, contents, plan.scaled_size)
+        except Exception:
+            REJECTED_UPLOADS.inc("decode_error")
+            raise
+
+        for start in range(0, len(origins), batch_size):
+            batcher.check_deadline(deadline)
+            chunk, chunk_version = await executor.run_inference(
+                classify_tiles, image, origins[start:start + batch_size]
+            )
+            chunks.append(chunk)
+            versions.append(chunk_version)
+    probabilities = torch.cat(chunks)
+    # Any mock chunk makes the whole diagnosis a mock; after a hot swap mid-request, the newest version
+    model_version = None if None in versions else versions[-1]
+
+    started = time.perf_counter()
+    disease_name, confidence, affected_fraction = aggregate_tiles(probabilities)
+    tile_confidences, tile_indices = probabilities.max(dim=1)
+
+    inverse = 1 / plan.scale
+    tiles = []
+    for i, ((x, y), tile_confidence, class_idx) in enumerate(
+        zip(origins, tile_confidences.tolist(), tile_indices.tolist())
+    ):
+        tiles.append(TileResult(
+            row=i // len(plan.xs),
+            col=i % len(plan.xs),
+            x=int(x * inverse),
+            y=int(y * inverse),
+            size=int(round(tile_size * inverse)),
+            disease_name=classifier.class_names[class_idx],
+            confidence=round(tile_confidence * 100, 2),
+        ))
+    STAGE_SECONDS.observe(time.perf_counter() - started, "tile_aggregate")
+
+    logger.info(
+        f"Tiled analysis: {len(origins)} tiles in batches of {batch_size} "
+        f"at scale {plan.scale:.3f}, {affected_fraction:.1%} affected"
+    )
+
+    return TiledAnalysisResponse(
+        diagnosis=build_analysis_response(disease_name, confidence, model_version=model_version),
+        image_width=width,
+        image_height=height,
+        scale=round(plan.scale, 4),
+        tile_size=tile_size,
+        stride=plan.stride,
+        rows=len(plan.ys),
+        cols=len(plan.xs),
+        affected_fraction=round(affected_fraction, 4),
+        class_counts=dict(ClassCounter(tile.disease_name for tile in tiles)),
+        tiles=tiles,
+    )
@@ -0,0 +1,229 @@
+# app/services/upload.py
+import io
+import logging
+from typing import AsyncIterator, List, Optional, Tuple
+
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+from PIL import Image
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.utils.config import settings
+from app.utils.metrics import REJECTED_UPLOADS, STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+try:
+    import magic
+except ImportError:  # libmagic missing; fall back to the signature table below
+    magic = None
+
+# Bytes inspected for the file signature
+_SNIFF_BYTES = 2048
+
+# Multipart boundaries, part headers and small form fields on top of the file itself
+_BODY_OVERHEAD = 64 * 1024
+
+# Leading bytes of the image formats we accept, used when libmagic is unavailable
+_SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"BM", "image/bmp"),
+    (b"II*\x00", "image/tiff"),
+    (b"MM\x00*", "image/tiff"),
+)
+
+
+def sniff_image_type(head: bytes) -> Optional[str]:
+    """MIME type from the first bytes of a file, ignoring what the client claims"""
+    if magic is not None:
+        try:
+            return magic.from_buffer(head[:_SNIFF_BYTES], mime=True)
+        except Exception as e:
+            logger.warning(f"libmagic failed, using signature table: {str(e)}")
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    for signature, mime_type in _SIGNATURES:
+        if head.startswith(signature):
+            return mime_type
+    return None
+
+
+def image_dimensions(data: bytes) -> Optional[Tuple[int, int]]:
+    """Width and height from the image header alone, or None if the header is incomplete"""
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            return image.size
+    except Image.DecompressionBombError:
+        raise
+    except Exception:
+        return None
+
+
+def _reject(status_code: int, reason: str, detail: str):
+    REJECTED_UPLOADS.inc(reason)
+    raise HTTPException(status_code=status_code, detail=detail)
+
+
+def _check_signature(head: bytes):
+    if sniff_image_type(head[:_SNIFF_BYTES]) not in settings.ALLOWED_IMAGE_TYPES:
+        _reject(415, "content_type", "File must be an image")
+
+
+def _check_header(data: bytes) -> bool:
+    """Reject images whose header declares too many pixels; False if no complete header yet"""
+    try:
+        dimensions = image_dimensions(data)
+    except Image.DecompressionBombError:
+        _reject(413, "too_many_pixels", "Image dimensions too large.")
+    if dimensions is None:
+        return False
+
+    width, height = dimensions
+    if width * height > settings.MAX_IMAGE_PIXELS:
+        _reject(
+            413, "too_many_pixels",
+            f"Image dimensions {width}x{height} too large. Maximum {settings.MAX_IMAGE_PIXELS} pixels allowed."
+        )
+    return True
+
+
+def _too_large_detail(max_size: int) -> str:
+    return f"Image size too large. Maximum {max_size // (1024 * 1024)}MB allowed."
+
+
+def _too_large(max_size: int):
+    _reject(413, "too_large", _too_large_detail(max_size))
+
+
+def validate_image_bytes(data: bytes, max_size: Optional[int] = None) -> bytes:
+    """Apply the upload checks (size, signature, header pixel count) to an image already in memory"""
+    max_size = max_size or settings.MAX_FILE_SIZE
+    if len(data) > max_size:
+        _too_large(max_size)
+    if not data:
+        _reject(400, "empty", "Uploaded file is empty")
+    _check_signature(data)
+    _check_header(data)
+    return data
+
+
+async def read_image_stream(
+    chunks: AsyncIterator[bytes],
+    declared_size: Optional[int] = None,
+    max_size: Optional[int] = None,
+) -> bytes:
+    """Read an image upload chunk by chunk, rejecting bad files as early as possible.
+
+    - a declared size over ``max_size`` (default ``MAX_FILE_SIZE``) is rejected before reading
+    - the first bytes are sniffed for a real image signature
+    - the header's pixel count is checked before the rest is read, when the
+      first bytes contain it, so decompression bombs never get decoded
+    - reading stops as soon as ``max_size`` is exceeded
+
+    For multipart uploads the body has already been received and spooled by
+    the form parser, bounded by ``RequestBodyLimitMiddleware``; only raw
+    bodies (``request.stream()``) are cut off here while still arriving.
+    Chunks are joined once at the end; a body that arrives as a single chunk
+    is returned as is, without copying.
+    """
+    max_size = max_size or settings.MAX_FILE_SIZE
+    if declared_size is not None and declared_size > max_size:
+        _too_large(max_size)
+
+    parts: List[bytes] = []
+    received = 0
+    sniffed = False
+    header_checked = False
+    with STAGE_SECONDS.time("upload_read"):
+        async for chunk in chunks:
+            if not chunk:
+                continue
+            parts.append(chunk)
+            received += len(chunk)
+            if received > max_size:
+                _too_large(max_size)
+            if not sniffed and received >= _SNIFF_BYTES:
+                head = b"".join(parts)
+                _check_signature(head)
+                sniffed = True
+                header_checked = _check_header(head)
+
+    if not received:
+        _reject(400, "empty", "Uploaded file is empty")
+
+    contents = b"".join(parts)
+    if not sniffed:
+        _check_signature(contents)
+    if not header_checked:
+        _check_header(contents)
+    return contents
+
+
+async def _iter_upload(file: UploadFile) -> AsyncIterator[bytes]:
+    while True:
+        chunk = await file.read(settings.UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        yield chunk
+
+
+async def read_image_upload(file: UploadFile, max_size: Optional[int] = None) -> bytes:
+    """Validate an uploaded image and return its contents"""
+    return await read_image_stream(_iter_upload(file), declared_size=file.size, max_size=max_size)
+
+
+def request_body_limit(path: str) -> int:
+    """Largest request body accepted for an endpoint: its file size limit plus encoding overhead"""
+    if path.endswith("/analyze/tiled"):
+        limit = settings.TILE_MAX_FILE_SIZE
+    elif path.endswith("/analyze/batch"):
+        limit = settings.MAX_FILE_SIZE * settings.BATCH_UPLOAD_MAX_FILES
+    elif path.endswith("/analyze/base64"):
+        limit = settings.MAX_FILE_SIZE * 4 // 3
+    else:
+        limit = settings.MAX_FILE_SIZE
+    return limit + _BODY_OVERHEAD
+
+
+class RequestBodyLimitMiddleware:
+    """Reject request bodies over ``request_body_limit`` while they are still arriving.
+
+    Multipart uploads are received, parsed and spooled by Starlette before
+    the endpoint runs, so the per-file checks in ``read_image_upload`` can
+    only look at a complete body. This middleware answers 413 up front when
+    Content-Length is too large, and stops reading once the bytes actually
+    received pass the limit (chunked bodies, lying headers).
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] not in ("POST", "PUT", "PATCH"):
+            await self.app(scope, receive, send)
+            return
+
+        max_size = request_body_limit(scope["path"])
+        for name, value in scope["headers"]:
+            if name == b"content-length" and value.isdigit() and int(value) > max_size:
+                REJECTED_UPLOADS.inc("too_large")
+                response = JSONResponse(status_code=413, content={"detail": _too_large_detail(max_size)})
+                await response(scope, receive, send)
+                return
+
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_size:
+                    # Raised into whatever is reading the body: the form parser or request.stream()
+                    _too_large(max_size)
+            return message
+
+        await self.app(scope, limited_receive, send)
@@ -0,0 +1,15 @@
+# app/utils/auth.py
+import hmac
+from typing import Optional
+
+from fastapi import Header, HTTPException
+
+from app.utils.config import settings
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Admin endpoints need ``X-Admin-Token``; without ADMIN_TOKEN they don't exist"""
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token, settings.ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
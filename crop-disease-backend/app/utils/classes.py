@@ -0,0 +1,6 @@
+# app/utils/classes.py
+
+
+def crop_of(disease_name: str) -> str:
+    """Crop part of a class name: ``Corn___Common_Rust`` -> ``Corn``"""
+    return disease_name.split("___")[0]
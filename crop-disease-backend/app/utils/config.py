@@ -1,8 +1,15 @@
 # app/utils/config.py
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import Any, Dict, List
+import json
+import logging
 import os
 
+logger = logging.getLogger(__name__)
+
+# Fields autotune.py measures and writes to the serving profile
+PROFILE_FIELDS = ("TORCH_NUM_THREADS", "TORCH_INTEROP_THREADS", "WORKERS", "BATCH_MAX_SIZE")
+
 class Settings(BaseSettings):
     # API Settings
     APP_NAME: str = "Crop Disease Detection API"
@@ -10,6 +17,7 @@ class Settings(BaseSettings):
     DEBUG: bool = True
     HOST: str = "0.0.0.0"
     PORT: int = 8000
+    WORKERS: int = 2  # worker processes forked by serve.py
     
     # CORS
     ALLOWED_ORIGINS: List[str] = [
@@ -22,9 +30,131 @@ class Settings(BaseSettings):
     # Model Settings
     MODEL_PATH: str = "app/models/weights/crop_leaf_diseases_vit"
     MODEL_NAME: str = "google/vit-base-patch16-224"
+    MODEL_VERSION: str = ""  # defaults to the model directory name
+    MODEL_MOCK_FALLBACK: bool = False  # local development only: serve random mock predictions when the model can't be loaded
+    INFERENCE_BACKEND: str = "eager"  # "eager", "torchscript" or "onnx"
+    TORCHSCRIPT_FILE: str = "model.torchscript.pt"
+    ONNX_FILE: str = "model.onnx"
+    MODEL_MMAP_WEIGHTS: bool = False  # map model.safetensors instead of copying it (eager fp32 on CPU)
+
+    # Versioned model registry: one sub-directory per version and an ACTIVE
+    # pointer; empty serves MODEL_PATH and disables hot swaps
+    MODEL_REGISTRY_DIR: str = ""
+    MODEL_REGISTRY_POLL_SECONDS: float = 5.0  # how often workers check the ACTIVE pointer
+    ADMIN_TOKEN: str = ""  # required in X-Admin-Token; empty disables the admin endpoints
+
+    # Per-request profiling: analysis requests sending ADMIN_TOKEN in
+    # PROFILING_HEADER, plus a random sample, get a torch profiler + stage trace
+    PROFILING_HEADER: str = "X-Profile-Token"
+    PROFILING_SAMPLE_RATE: float = 0.0  # fraction of analysis requests; 0 traces only on request
+    PROFILING_DIR: str = "profiles"
+    PROFILING_MAX_TRACES: int = 50  # the oldest trace is deleted beyond this
+
+    # Reduced precision: "fp32", "int8-dynamic" or "bf16" (eager backend)
+    INFERENCE_PRECISION: str = "fp32"
+    PRECISION_EVAL_DIR: str = ""  # labelled folder, one sub-folder per class
+    PRECISION_EVAL_LIMIT: int = 0  # 0 evaluates every image
+    PRECISION_MIN_AGREEMENT: float = 0.98
+
+    # Early exit through intermediate encoder layers (eager backend)
+    EARLY_EXIT_ENABLED: bool = False
+    EARLY_EXIT_THRESHOLD: float = 0.9  # softmax confidence needed to stop
+    EARLY_EXIT_HEADS_FILE: str = "exit_heads.pt"  # written by fit_exit_heads.py
+
+    # Token merging (eager backend): tokens merged per layer, one value for
+    # every layer or a comma-separated value per layer
+    TOKEN_MERGING_ENABLED: bool = False
+    TOKEN_MERGING_SCHEDULE: str = "8"
+
     IMAGE_SIZE: int = 224
     MAX_FILE_SIZE: int = 10 * 1024 * 1024  # 10MB
-    
+    MAX_IMAGE_PIXELS: int = 50_000_000  # 50MP, rejects decompression bombs
+    UPLOAD_CHUNK_SIZE: int = 64 * 1024
+    ALLOWED_IMAGE_TYPES: List[str] = [
+        "image/jpeg",
+        "image/png",
+        "image/webp",
+        "image/bmp",
+        "image/x-ms-bmp",
+        "image/gif",
+        "image/tiff"
+    ]
+
+    # Startup
+    MODEL_BACKGROUND_LOAD: bool = False
+    WARMUP_ITERATIONS: int = 2
+    WARMUP_BATCH_SIZES: List[int] = []  # defaults to 1 and BATCH_MAX_SIZE
+
+    # Dynamic micro-batching
+    BATCHING_ENABLED: bool = True
+    BATCH_MAX_SIZE: int = 8
+    BATCH_MAX_WAIT_MS: float = 5.0
+
+    # WebSocket frame streaming
+    STREAM_BACKPRESSURE: str = "drop_oldest"  # or "block" to stop reading until the model catches up
+    STREAM_MAX_PENDING: int = 8  # frames buffered per connection
+    STREAM_BATCH_SIZE: int = 8
+    STREAM_SKIP_DISTANCE: int = 5  # max differing dHash bits (of 64) to skip a frame; 0 disables skipping
+
+    # Admission control
+    INFERENCE_MAX_QUEUE: int = 128  # admitted but unfinished predictions; 0 = unbounded
+    REQUEST_DEADLINE_HEADER: str = "X-Request-Deadline-Ms"
+    REQUEST_DEADLINE_MS: float = 0.0  # default budget when the header is absent; 0 = none
+
+    # Multi-image batch uploads
+    BATCH_UPLOAD_MAX_FILES: int = 200
+    BATCH_UPLOAD_CONCURRENCY: int = 32
+
+    # Tiled analysis of high-resolution images
+    TILE_OVERLAP: float = 0.25  # fraction of a tile shared with its neighbour
+    TILE_MAX_TILES: int = 256  # larger images are downscaled to fit
+    TILE_MAX_BATCH: int = 64
+    TILE_MEMORY_BUDGET_MB: int = 512  # activation memory for one forward pass
+    TILE_MAX_FILE_SIZE: int = 50 * 1024 * 1024  # 50MB
+    TILE_MIN_CONFIDENCE: float = 50.0  # a tile counts as diseased above this
+
+    # Prediction cache
+    CACHE_ENABLED: bool = True
+    CACHE_MAX_ENTRIES: int = 10000
+    CACHE_MAX_BYTES: int = 16 * 1024 * 1024  # 16MB
+    CACHE_TTL_SECONDS: float = 3600.0
+
+    # Similar-case search
+    SIMILARITY_ENABLED: bool = True  # keep each prediction's embedding for search
+    SIMILARITY_INDEX_DIR: str = "similarity_index"
+    SIMILARITY_MAX_K: int = 50
+
+    # Prediction log: analysis results buffered in memory, flushed in bulk
+    PREDICTION_LOG_ENABLED: bool = True
+    PREDICTION_LOG_BACKEND: str = "sqlite"  # "sqlite" or "jsonl"
+    PREDICTION_LOG_SQLITE_PATH: str = "predictions.sqlite3"
+    PREDICTION_LOG_JSONL_PATH: str = "predictions.jsonl"
+    PREDICTION_LOG_BUFFER: int = 10000  # records held between flushes; the oldest are dropped beyond
+    PREDICTION_LOG_FLUSH_SECONDS: float = 2.0
+    PREDICTION_LOG_MAX_DAYS: int = 366  # widest /stats window
+
+    # Asynchronous jobs
+    JOB_QUEUE_BACKEND: str = "sqlite"  # "sqlite" or "redis"
+    JOB_SQLITE_PATH: str = "jobs.sqlite3"
+    JOB_REDIS_URL: str = "redis://localhost:6379/0"  # Redis 6.2 or later
+    JOB_RESULT_TTL_SECONDS: int = 3600
+    JOB_BATCH_SIZE: int = 16
+    JOB_POLL_TIMEOUT: float = 1.0
+    JOB_WORKER_IN_PROCESS: bool = True
+    JOB_VISIBILITY_TIMEOUT: float = 600.0  # a job processing longer is assumed lost with its worker and re-queued
+    JOB_MAX_ATTEMPTS: int = 3  # claims before a repeatedly lost job is failed
+
+    # Execution pools
+    EXECUTOR_KIND: str = "thread"  # "thread" or "process" for decode/preprocess
+    PREPROCESS_WORKERS: int = 2
+    INFERENCE_WORKERS: int = 1
+    TORCH_NUM_THREADS: int = 0  # 0 keeps torch's default
+    TORCH_INTEROP_THREADS: int = 0  # 0 keeps torch's default
+
+    # Hardware profile written by autotune.py; fills the fields it tuned
+    # unless they're set in the environment or .env
+    SERVING_PROFILE: str = "serving_profile.json"
+
     # Exact Disease Classes from your model (with underscores)
     DISEASE_CLASSES: List[str] = [
         "Corn___Common_Rust",
@@ -218,4 +348,35 @@ class Settings(BaseSettings):
     class Config:
         env_file = ".env"
 
+    def model_post_init(self, __context: Any):
+        self.apply_serving_profile()
+
+    def apply_serving_profile(self) -> Dict[str, Any]:
+        """Apply the tuned values from ``SERVING_PROFILE`` to fields not set explicitly"""
+        if not self.SERVING_PROFILE or not os.path.exists(self.SERVING_PROFILE):
+            return {}
+        try:
+            with open(self.SERVING_PROFILE, "r") as f:
+                profile = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring serving profile {self.SERVING_PROFILE}: {str(e)}")
+            return {}
+
+        # Tuned values only hold for the hardware they were measured on
+        if profile.get("cpu_count") != os.cpu_count():
+            logger.warning(
+                f"Ignoring serving profile {self.SERVING_PROFILE}: tuned for {profile.get('cpu_count')} cores, "
+                f"this machine has {os.cpu_count()}; rerun autotune.py"
+            )
+            return {}
+
+        explicit = set(self.model_fields_set)
+        applied = {}
+        for name, value in profile.get("settings", {}).items():
+            if name in PROFILE_FIELDS and name not in explicit:
+                setattr(self, name, value)
+                applied[name] = value
+        logger.info(f"Applied serving profile {self.SERVING_PROFILE}: {applied}")
+        return applied
+
 settings = Settings()
\ No newline at end of file
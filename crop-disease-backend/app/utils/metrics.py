@@ -0,0 +1,294 @@
+# app/utils/metrics.py
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+LabelValues = Tuple[str, ...]
+
+# Latency buckets in seconds, from sub-millisecond cache hits to slow uploads
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _ShardedMetric:
+    """Base for metrics updated without locks.
+
+    Every thread writes to its own shard, so the hot path is a thread-local
+    lookup plus a dict update; shards are only summed when ``/metrics`` is
+    scraped. The lock is taken once per thread, when its shard is created.
+    """
+
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._local = threading.local()
+        self._shards: List[dict] = []
+        self._lock = threading.Lock()
+
+    def _shard(self) -> dict:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = {}
+            with self._lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+        return shard
+
+    def _snapshots(self) -> List[dict]:
+        with self._lock:
+            shards = list(self._shards)
+        # dict.copy() is atomic under the GIL, so writers never block readers
+        return [shard.copy() for shard in shards]
+
+
+class Counter(_ShardedMetric):
+    type_name = "counter"
+
+    def inc(self, *label_values: str, amount: float = 1.0):
+        shard = self._shard()
+        shard[label_values] = shard.get(label_values, 0.0) + amount
+
+    def values(self) -> Dict[LabelValues, float]:
+        totals: Dict[LabelValues, float] = {}
+        for shard in self._snapshots():
+            for key, value in shard.items():
+                totals[key] = totals.get(key, 0.0) + value
+        return totals
+
+    def render(self) -> List[str]:
+        values = self.values()
+        if not values and not self.label_names:
+            values = {(): 0.0}
+        return [
+            f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+            for key, value in sorted(values.items())
+        ]
+
+
+class Gauge(Counter):
+    """A value that goes up and down, e.g. requests in flight"""
+
+    type_name = "gauge"
+
+    def dec(self, *label_values: str, amount: float = 1.0):
+        self.inc(*label_values, amount=-amount)
+
+    @contextmanager
+    def track(self, *label_values: str):
+        self.inc(*label_values)
+        try:
+            yield
+        finally:
+            self.dec(*label_values)
+
+
+class Histogram(_ShardedMetric):
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *label_values: str):
+        shard = self._shard()
+        entry = shard.get(label_values)
+        if entry is None:
+            # Per-bucket counts (the last slot is +Inf), then the running sum
+            entry = [0] * (len(self.buckets) + 1) + [0.0]
+            shard[label_values] = entry
+        entry[bisect_left(self.buckets, value)] += 1
+        entry[-1] += value
+
+    @contextmanager
+    def time(self, *label_values: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *label_values)
+
+    def render(self) -> List[str]:
+        totals: Dict[LabelValues, List[float]] = {}
+        for shard in self._snapshots():
+            for key, entry in shard.items():
+                entry = list(entry)
+                if key not in totals:
+                    totals[key] = entry
+                else:
+                    totals[key] = [a + b for a, b in zip(totals[key], entry)]
+
+        lines = []
+        for key, entry in sorted(totals.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), entry[:-1]):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(entry[-1])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class CallbackMetric:
+    """A metric whose value is read from elsewhere (e.g. cache counters) at scrape time"""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        callback: Callable[[], Union[float, Dict[LabelValues, float]]],
+        type_name: str = "gauge",
+        labels: Sequence[str] = (),
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.type_name = type_name
+        self.label_names = tuple(labels)
+
+    def render(self) -> List[str]:
+        value = self.callback()
+        if not isinstance(value, dict):
+            value = {(): value}
+        return [
+            f"{self.name}{_format_labels(self.label_names, key)} {_format_value(sample)}"
+            for key, sample in sorted(value.items())
+        ]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        for metric in self._metrics.values():
+            try:
+                samples = metric.render()
+            except Exception:
+                # A failing callback must never break the whole scrape
+                continue
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+def _resident_memory_bytes() -> float:
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+        # ru_maxrss is the peak, in kilobytes on Linux; best effort elsewhere
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+# Global registry and the metrics shared across modules
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.register(Histogram(
+    "crop_disease_stage_seconds",
+    "Time spent in each analysis stage (preprocess and forward are per batch)",
+    labels=("stage",),
+))
+BATCH_SIZE = registry.register(Histogram(
+    "crop_disease_batch_size",
+    "Images per model forward pass",
+    buckets=(1, 2, 4, 8, 16, 32, 64),
+))
+PREDICTIONS = registry.register(Counter(
+    "crop_disease_predictions_total",
+    "Model predictions by predicted class",
+    labels=("disease",),
+))
+MOCK_PREDICTIONS = registry.register(Counter(
+    "crop_disease_mock_predictions_total",
+    "Predictions served by the mock fallback because no model was available",
+))
+EXIT_LAYER = registry.register(Histogram(
+    "crop_disease_exit_layer",
+    "Encoder layer each prediction exited after, when early exit is enabled",
+    buckets=tuple(range(1, 13)) + (16, 24),
+))
+TILES_PER_REQUEST = registry.register(Histogram(
+    "crop_disease_tiles_per_request",
+    "Tiles classified per tiled analysis request",
+    buckets=(1, 4, 16, 32, 64, 128, 256, 512),
+))
+REJECTED_UPLOADS = registry.register(Counter(
+    "crop_disease_rejected_uploads_total",
+    "Uploads rejected before inference",
+    labels=("reason",),
+))
+SHED_REQUESTS = registry.register(Counter(
+    "crop_disease_shed_requests_total",
+    "Predictions dropped before their forward pass by admission control",
+    labels=("reason",),
+))
+STREAM_FRAMES = registry.register(Counter(
+    "crop_disease_stream_frames_total",
+    "WebSocket stream frames by outcome",
+    labels=("status",),
+))
+PROFILED_REQUESTS = registry.register(Counter(
+    "crop_disease_profiled_requests_total",
+    "Requests traced by the per-request profiler",
+    labels=("reason",),
+))
+MODEL_SWAPS = registry.register(Counter(
+    "crop_disease_model_swaps_total",
+    "Model hot swaps by outcome",
+    labels=("outcome",),
+))
+STREAM_CONNECTIONS = registry.register(Gauge(
+    "crop_disease_stream_connections",
+    "Open WebSocket frame streams",
+))
+IN_FLIGHT = registry.register(Gauge(
+    "crop_disease_requests_in_flight",
+    "Analysis requests currently being processed",
+))
+registry.register(CallbackMetric(
+    "process_resident_memory_bytes",
+    "Resident memory of this worker process",
+    _resident_memory_bytes,
+))
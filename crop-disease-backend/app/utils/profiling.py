@@ -0,0 +1,259 @@
+# app/utils/profiling.py
+import contextvars
+import hmac
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from app.utils.config import settings
+from app.utils.metrics import PROFILED_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+TRACE_ID_PATTERN = re.compile(r"^[0-9]+-[0-9a-f]{8}$")
+
+# Chrome trace process ids: Python pipeline stages and torch operators
+STAGES_PID = 1
+TORCH_PID = 2
+
+_current: contextvars.ContextVar[Optional["RequestTrace"]] = contextvars.ContextVar("request_trace", default=None)
+
+# Returned by span() when nothing is being profiled: no allocation, no timing
+_NO_SPAN = nullcontext()
+
+
+def current_trace() -> Optional["RequestTrace"]:
+    """The trace of the request running in this context, if it is being profiled"""
+    return _current.get()
+
+
+def span(name: str):
+    """Time a pipeline stage into the current request's trace; a shared no-op otherwise"""
+    trace = _current.get()
+    return trace.span(name) if trace is not None else _NO_SPAN
+
+
+def start_trace(headers, label: str) -> Optional["RequestTrace"]:
+    """A trace for a request that sent the admin token in PROFILING_HEADER or was sampled"""
+    reason = None
+    if settings.ADMIN_TOKEN:
+        token = headers.get(settings.PROFILING_HEADER)
+        if token is not None and hmac.compare_digest(token, settings.ADMIN_TOKEN):
+            reason = "requested"
+    if reason is None and settings.PROFILING_SAMPLE_RATE > 0 and random.random() < settings.PROFILING_SAMPLE_RATE:
+        reason = "sampled"
+    if reason is None:
+        return None
+    PROFILED_REQUESTS.inc(reason)
+    return RequestTrace(label, reason)
+
+
+class RequestTrace:
+    """Python stage spans and torch profiler events of one request, exported as a Chrome trace.
+
+    Spans are recorded from whichever thread runs the stage while the trace
+    is current (see ``activate`` and ``profile_call``); timestamps are
+    microseconds since the trace started, so both kinds line up in
+    chrome://tracing or Perfetto.
+    """
+
+    def __init__(self, label: str, reason: str):
+        self.id = f"{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}"
+        self.label = label
+        self.reason = reason
+        self.created_at = time.time()
+        self.started = time.perf_counter()
+        self.metadata: Dict[str, Any] = {}
+        self._events: List[Dict[str, Any]] = []
+        self._threads: Dict[Tuple[int, int], str] = {}
+        self._lock = threading.Lock()
+
+    def _ts(self, t: float) -> float:
+        return round((t - self.started) * 1e6, 3)
+
+    @contextmanager
+    def activate(self) -> Iterator["RequestTrace"]:
+        """Make this the current trace for the block, and for tasks and threads started from it"""
+        token = _current.set(self)
+        try:
+            yield self
+        finally:
+            _current.reset(token)
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_span(name, started, time.perf_counter())
+
+    def add_span(self, name: str, started: float, ended: float):
+        thread = threading.current_thread()
+        tid = thread.native_id or 0
+        with self._lock:
+            self._threads.setdefault((STAGES_PID, tid), thread.name)
+            self._events.append({
+                "name": name, "cat": "stage", "ph": "X", "pid": STAGES_PID, "tid": tid,
+                "ts": self._ts(started), "dur": round((ended - started) * 1e6, 3),
+            })
+
+    def profile_call(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Call ``fn`` in this thread under the torch profiler, with this trace current"""
+        from torch.profiler import ProfilerActivity, profile
+
+        with self.activate():
+            with profile(activities=[ProfilerActivity.CPU], record_shapes=True) as prof:
+                # Profiler event times count from about here
+                profiler_started = time.perf_counter()
+                result = fn(*args)
+        self._add_torch_events(prof.events(), profiler_started)
+        return result
+
+    def _add_torch_events(self, events, profiler_started: float):
+        offset = self._ts(profiler_started)
+        with self._lock:
+            for event in events:
+                self._threads.setdefault((TORCH_PID, event.thread), f"torch thread {event.thread}")
+                entry = {
+                    "name": event.name, "cat": "torch", "ph": "X", "pid": TORCH_PID, "tid": event.thread,
+                    "ts": round(offset + event.time_range.start, 3), "dur": round(event.time_range.elapsed_us(), 3),
+                }
+                if event.input_shapes:
+                    entry["args"] = {"input_shapes": str(event.input_shapes)}
+                self._events.append(entry)
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        names = [
+            {"name": "process_name", "ph": "M", "pid": STAGES_PID, "args": {"name": "pipeline stages"}},
+            {"name": "process_name", "ph": "M", "pid": TORCH_PID, "args": {"name": "torch operators"}},
+        ]
+        with self._lock:
+            names += [
+                {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+                for (pid, tid), name in self._threads.items()
+            ]
+            events = list(self._events)
+        return {"traceEvents": names + events, "displayTimeUnit": "ms", "metadata": self.summary()}
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "label": self.label,
+            "reason": self.reason,
+            "created_at": self.created_at,
+            **self.metadata,
+        }
+
+
+@contextmanager
+def label_modules(modules: Sequence[Tuple[str, Any]]) -> Iterator[None]:
+    """Name each module's forward in the torch profiler, for the current trace only.
+
+    The hooks are on the shared modules while the block runs; with more
+    than one inference worker a concurrent batch may show up in the trace.
+    """
+    if _current.get() is None or not modules:
+        yield
+        return
+
+    from torch.profiler import record_function
+
+    open_ranges: Dict[int, List[Any]] = {}
+
+    def enter(name):
+        def hook(module, inputs):
+            scope = record_function(name)
+            scope.__enter__()
+            open_ranges.setdefault(id(module), []).append(scope)
+        return hook
+
+    def leave(module, inputs, output):
+        scopes = open_ranges.get(id(module))
+        if scopes:
+            scopes.pop().__exit__(None, None, None)
+
+    handles = []
+    for name, module in modules:
+        handles.append(module.register_forward_pre_hook(enter(name)))
+        handles.append(module.register_forward_hook(leave))
+    try:
+        yield
+    finally:
+        for handle in handles:
+            handle.remove()
+
+
+class TraceStore:
+    """Bounded on-disk ring of Chrome traces; saving beyond ``max_traces`` deletes the oldest.
+
+    Each trace is ``<id>.json`` next to a small ``<id>.meta.json`` used for
+    listing. Ids start with a millisecond timestamp, so they sort by age.
+    """
+
+    def __init__(self, directory: str, max_traces: int):
+        self.directory = directory
+        self.max_traces = max(1, max_traces)
+
+    def _ids(self) -> List[str]:
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(
+            name[:-len(".meta.json")] for name in os.listdir(self.directory) if name.endswith(".meta.json")
+        )
+
+    def save(self, trace: RequestTrace) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        data = trace.to_chrome_trace()
+        path = os.path.join(self.directory, f"{trace.id}.json")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+        # The listing entry last, so listed traces are always complete
+        with open(os.path.join(self.directory, f"{trace.id}.meta.json"), "w") as f:
+            json.dump({**data["metadata"], "bytes": os.path.getsize(path)}, f)
+        self._prune()
+        logger.info(f"Saved profile trace {trace.id} ({trace.label}, {trace.reason})")
+        return trace.id
+
+    def _prune(self):
+        ids = self._ids()
+        for trace_id in ids[:max(0, len(ids) - self.max_traces)]:
+            # Another worker process may be pruning the same trace
+            for suffix in (".meta.json", ".json"):
+                try:
+                    os.remove(os.path.join(self.directory, trace_id + suffix))
+                except FileNotFoundError:
+                    pass
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Summaries of the stored traces, newest first"""
+        traces = []
+        for trace_id in reversed(self._ids()):
+            try:
+                with open(os.path.join(self.directory, f"{trace_id}.meta.json"), "r") as f:
+                    traces.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return traces
+
+    def path(self, trace_id: str) -> str:
+        """File of a stored trace; ``KeyError`` if there is none"""
+        if not TRACE_ID_PATTERN.match(trace_id):
+            raise KeyError(trace_id)
+        path = os.path.join(self.directory, f"{trace_id}.json")
+        if not os.path.exists(path):
+            raise KeyError(trace_id)
+        return path
+
+
+# Global trace store instance
+trace_store = TraceStore(settings.PROFILING_DIR, settings.PROFILING_MAX_TRACES)
@@ -0,0 +1,205 @@
+# autotune.py
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+from app.utils.config import settings
+
+# Spawned benchmark workers re-import this module: torch and the model code
+# are imported inside the functions that need them
+
+
+def _powers_of_two(limit: int) -> List[int]:
+    values = [1]
+    while values[-1] * 2 <= limit:
+        values.append(values[-1] * 2)
+    if limit not in values:
+        values.append(limit)
+    return values
+
+
+def _parse_list(value: Optional[str]) -> Optional[List[int]]:
+    return [int(item) for item in value.split(",")] if value else None
+
+
+def candidate_grid(cores: int, workers: Optional[List[int]], threads: Optional[List[int]],
+                   interop: Optional[List[int]], batch_sizes: List[int],
+                   oversubscribe: bool) -> List[Dict[str, Any]]:
+    """Combinations to measure; by default workers x threads never exceeds the core count"""
+    grid = []
+    for worker_count in workers or _powers_of_two(cores):
+        for thread_count in threads or _powers_of_two(max(1, cores // worker_count)):
+            if not oversubscribe and worker_count * thread_count > cores:
+                continue
+            for interop_count in interop or [1, 2]:
+                grid.append({
+                    "workers": worker_count,
+                    "torch_threads": thread_count,
+                    "interop_threads": interop_count,
+                    "batch_sizes": batch_sizes,
+                })
+    return grid
+
+
+def bench_worker(model_dir: str, threads: int, interop: int, batch_sizes: List[int],
+                 duration: float, warmup: int, barrier, results):
+    """One serving worker: the model forward at every batch size, in step with the other workers"""
+    import torch
+    # Interop threads can only be set before any parallel work in the process
+    torch.set_num_interop_threads(interop)
+    torch.set_num_threads(threads)
+
+    from app.models.backends import EagerBackend
+    from app.models.preprocessing import TensorPreprocessor
+
+    preprocessor = TensorPreprocessor.from_pretrained(model_dir)
+    backend = EagerBackend(torch.device("cpu"))
+    backend.load(model_dir)
+
+    for batch_size in batch_sizes:
+        pixel_values = torch.rand((batch_size, 3, preprocessor.height, preprocessor.width))
+        for _ in range(warmup):
+            backend.predict_batch(pixel_values)
+
+        # Every worker measures at the same time, competing for cores and cache like in serving
+        barrier.wait()
+        latencies = []
+        started = time.perf_counter()
+        while time.perf_counter() - started < duration:
+            batch_started = time.perf_counter()
+            backend.predict_batch(pixel_values)
+            latencies.append(time.perf_counter() - batch_started)
+        results.put((batch_size, latencies, time.perf_counter() - started))
+        barrier.wait()
+
+
+def measure(model_dir: str, combination: Dict[str, Any], duration: float, warmup: int) -> List[Dict[str, Any]]:
+    """Throughput and p99 batch latency of one worker/thread combination at every batch size"""
+    from benchmarks.stats import summarize
+
+    context = multiprocessing.get_context("spawn")
+    workers = combination["workers"]
+    barrier = context.Barrier(workers)
+    results = context.Queue()
+    processes = [
+        context.Process(target=bench_worker, args=(
+            model_dir, combination["torch_threads"], combination["interop_threads"],
+            combination["batch_sizes"], duration, warmup, barrier, results,
+        ))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+
+    # Result order across workers isn't guaranteed: group by batch size
+    per_batch: Dict[int, List[Any]] = {batch_size: [] for batch_size in combination["batch_sizes"]}
+    try:
+        for _ in range(workers * len(per_batch)):
+            batch_size, latencies, elapsed = results.get(timeout=duration * 20 + 300)
+            per_batch[batch_size].append((latencies, elapsed))
+    finally:
+        for process in processes:
+            process.join(timeout=10)
+            if process.is_alive():
+                process.terminate()
+
+    measurements = []
+    for batch_size, runs in per_batch.items():
+        latencies = [latency for run, _ in runs for latency in run]
+        images_per_sec = sum(batch_size * len(run) / elapsed for run, elapsed in runs)
+        measurements.append({
+            "workers": workers,
+            "torch_threads": combination["torch_threads"],
+            "interop_threads": combination["interop_threads"],
+            "batch_size": batch_size,
+            "batches": len(latencies),
+            "images_per_sec": round(images_per_sec, 2),
+            **summarize(latencies),
+        })
+    return measurements
+
+
+def choose(results: List[Dict[str, Any]], max_p99_ms: float) -> Dict[str, Any]:
+    """Highest throughput within the p99 budget, or the lowest p99 if nothing meets it"""
+    within = [r for r in results if max_p99_ms <= 0 or r["p99_ms"] <= max_p99_ms]
+    if within:
+        return max(within, key=lambda r: (r["images_per_sec"], -r["p99_ms"]))
+    return min(results, key=lambda r: r["p99_ms"])
+
+
+def main():
+    cores = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(
+        description="Sweep threads, workers and batch size on a synthetic model and write the serving profile"
+    )
+    parser.add_argument("--output", default=settings.SERVING_PROFILE)
+    parser.add_argument("--config-dir", default=settings.MODEL_PATH,
+                        help="model directory whose config.json the synthetic model is built from")
+    parser.add_argument("--workers", help="comma-separated worker counts (default powers of two up to the cores)")
+    parser.add_argument("--threads", help="comma-separated intra-op threads per worker (default up to cores / workers)")
+    parser.add_argument("--interop-threads", help="comma-separated interop threads per worker (default 1,2)")
+    parser.add_argument("--batch-sizes", default="1,4,8,16")
+    parser.add_argument("--max-p99-ms", type=float, default=0.0,
+                        help="only pick combinations whose p99 batch latency is within this; 0 means no limit")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds measured per combination and batch size")
+    parser.add_argument("--warmup", type=int, default=2, help="untimed batches before each measurement")
+    parser.add_argument("--oversubscribe", action="store_true", help="also try workers x threads above the core count")
+    parser.add_argument("--dry-run", action="store_true", help="print the profile without writing it")
+    args = parser.parse_args()
+
+    from benchmarks.synthetic import materialize_synthetic_model
+
+    grid = candidate_grid(
+        cores, _parse_list(args.workers), _parse_list(args.threads), _parse_list(args.interop_threads),
+        _parse_list(args.batch_sizes), args.oversubscribe,
+    )
+    if not grid:
+        parser.error("No combination fits the core count; pass --oversubscribe to try them anyway")
+    print(f"{len(grid)} worker/thread combinations x {len(_parse_list(args.batch_sizes))} batch sizes on {cores} cores",
+          file=sys.stderr)
+
+    results = []
+    with tempfile.TemporaryDirectory() as model_dir:
+        materialize_synthetic_model(model_dir, args.config_dir)
+        for combination in grid:
+            for measurement in measure(model_dir, combination, args.duration, args.warmup):
+                results.append(measurement)
+                print(json.dumps(measurement), file=sys.stderr)
+
+    best = choose(results, args.max_p99_ms)
+    import torch
+    profile = {
+        "created_at": time.time(),
+        "hostname": platform.node(),
+        "cpu_count": cores,
+        "torch_version": torch.__version__,
+        "model_config": os.path.join(args.config_dir, "config.json"),
+        "max_p99_ms": args.max_p99_ms,
+        "settings": {
+            "TORCH_NUM_THREADS": best["torch_threads"],
+            "TORCH_INTEROP_THREADS": best["interop_threads"],
+            "WORKERS": best["workers"],
+            "BATCH_MAX_SIZE": best["batch_size"],
+        },
+        "best": best,
+        "results": results,
+    }
+
+    print(json.dumps(profile["settings"]))
+    if not args.dry_run:
+        tmp_path = args.output + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(profile, f, indent=2)
+        os.replace(tmp_path, args.output)
+        print(f"Wrote {args.output}; Settings and the classifier apply it at startup", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
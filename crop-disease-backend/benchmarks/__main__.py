@@ -0,0 +1,95 @@
+# benchmarks/__main__.py
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+import torch
+
+from benchmarks.compare import compare
+from benchmarks.e2e import run_e2e_benchmarks
+from benchmarks.ingestion import run_ingestion_benchmarks
+from benchmarks.stages import run_stage_benchmarks
+from benchmarks.synthetic import parse_sizes
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+
+def _int_list(value: str):
+    return [int(item) for item in value.split(",")]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Offline benchmarks of the analyze path using a synthetic ViT built from config.json",
+    )
+    parser.add_argument("--sizes", type=parse_sizes, default=parse_sizes("640x480,1920x1080,4032x3024"))
+    parser.add_argument("--formats", default="JPEG,PNG")
+    parser.add_argument("--batch-sizes", type=_int_list, default=[1, 8])
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--concurrency", type=_int_list, default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=64, help="requests per concurrency level")
+    parser.add_argument("--e2e-image-size", type=parse_sizes, default=parse_sizes("1280x960"))
+    parser.add_argument("--ingestion-sizes", type=parse_sizes, default=parse_sizes("1280x960,4032x3024"))
+    parser.add_argument("--ingestion-requests", type=int, default=32, help="requests per transport and size")
+    parser.add_argument("--skip-stages", action="store_true")
+    parser.add_argument("--skip-e2e", action="store_true")
+    parser.add_argument("--skip-ingestion", action="store_true")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--update-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative regression")
+    args = parser.parse_args()
+
+    results = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "torch": torch.__version__,
+            "cpu_count": os.cpu_count(),
+            "torch_threads": torch.get_num_threads(),
+            "machine": platform.machine(),
+        }
+    }
+    if not args.skip_stages:
+        print("Running per-stage benchmarks...")
+        results["stages"] = run_stage_benchmarks(
+            args.sizes, args.formats.split(","), args.batch_sizes, args.repeats
+        )
+    if not args.skip_e2e:
+        print("Running end-to-end benchmarks...")
+        results["e2e"] = run_e2e_benchmarks(args.concurrency, args.requests, args.e2e_image_size[0])
+    if not args.skip_ingestion:
+        print("Running ingestion benchmarks...")
+        results["ingestion"] = run_ingestion_benchmarks(args.ingestion_sizes, args.ingestion_requests)
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline updated at {args.baseline}")
+        return True
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update-baseline to store one")
+        return True
+
+    with open(args.baseline, "r") as f:
+        baseline = json.load(f)
+    rows = compare(results, baseline, args.tolerance)
+    regressions = [row for row in rows if row[4]]
+    print(f"Comparing against {args.baseline} (positive change = worse)")
+    for key, before, after, change, regressed in rows:
+        print(f"{'REGRESSION' if regressed else 'ok':10s} {key:48s} {before:>10.2f} -> {after:>10.2f} ({change:+.1%})")
+    print(f"{len(regressions)} regression(s) beyond {args.tolerance:.0%}")
+    return not regressions
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,46 @@
+# benchmarks/compare.py
+from typing import Any, Dict, List, Tuple
+
+# Metrics where a larger value is an improvement; everything else is a latency
+HIGHER_IS_BETTER = ("requests_per_sec", "images_per_sec")
+
+
+def flatten(results: Dict[str, Any]) -> Dict[str, float]:
+    """Key every comparable number by its stage/scenario, e.g. ``e2e.c8.p99_ms``"""
+    metrics = {}
+    for entry in results.get("stages", []):
+        if entry["stage"] == "forward":
+            prefix = f"stages.forward.b{entry['batch_size']}"
+        else:
+            prefix = f"stages.{entry['stage']}.{entry['size']}.{entry['format']}"
+        for key in ("p50_ms", "p95_ms", "images_per_sec"):
+            if key in entry:
+                metrics[f"{prefix}.{key}"] = entry[key]
+    for entry in results.get("e2e", []):
+        prefix = f"e2e.c{entry['concurrency']}"
+        for key in ("p50_ms", "p95_ms", "p99_ms", "requests_per_sec"):
+            metrics[f"{prefix}.{key}"] = entry[key]
+    for entry in results.get("ingestion", []):
+        prefix = f"ingestion.{entry['transport']}.{entry['size']}"
+        for key in ("p50_ms", "p95_ms", "requests_per_sec"):
+            metrics[f"{prefix}.{key}"] = entry[key]
+    return metrics
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[Tuple[str, float, float, float, bool]]:
+    """Return ``(metric, baseline, current, relative change, regressed)`` for shared metrics.
+
+    The relative change is signed so that positive always means worse.
+    """
+    current_metrics = flatten(current)
+    baseline_metrics = flatten(baseline)
+    rows = []
+    for key in sorted(current_metrics.keys() & baseline_metrics.keys()):
+        before, after = baseline_metrics[key], current_metrics[key]
+        if not before:
+            continue
+        change = (after - before) / before
+        if key.endswith(HIGHER_IS_BETTER):
+            change = -change
+        rows.append((key, before, after, change, change > tolerance))
+    return rows
@@ -0,0 +1,71 @@
+# benchmarks/e2e.py
+import asyncio
+import tempfile
+import time
+from typing import Any, Dict, List, Tuple
+
+import httpx
+
+from app.utils.config import settings
+from benchmarks.stats import summarize
+from benchmarks.synthetic import make_image, materialize_synthetic_model
+
+
+async def _run_level(
+    client: httpx.AsyncClient,
+    payloads: List[bytes],
+    concurrency: int,
+) -> Dict[str, Any]:
+    queue: asyncio.Queue = asyncio.Queue()
+    for payload in payloads:
+        queue.put_nowait(payload)
+    latencies: List[float] = []
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        while not queue.empty():
+            payload = queue.get_nowait()
+            started = time.perf_counter()
+            response = await client.post(
+                "/api/v1/analyze", files={"file": ("leaf.jpg", payload, "image/jpeg")}
+            )
+            latencies.append(time.perf_counter() - started)
+            errors += response.status_code != 200
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "concurrency": concurrency,
+        "requests": len(payloads),
+        "errors": errors,
+        "requests_per_sec": round(len(payloads) / elapsed, 2),
+        **summarize(latencies),
+    }
+
+
+async def _run(concurrency_levels: List[int], requests: int, image_size: Tuple[int, int]) -> List[Dict[str, Any]]:
+    # Import the app only after MODEL_PATH points at the synthetic model
+    from app.main import app
+
+    width, height = image_size
+    results = []
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            for index, concurrency in enumerate(concurrency_levels):
+                # Unique images per request so the prediction cache never hits
+                payloads = [
+                    make_image(width, height, "JPEG", seed=index * requests + i) for i in range(requests)
+                ]
+                results.append(await _run_level(client, payloads, concurrency))
+    return results
+
+
+def run_e2e_benchmarks(concurrency_levels: List[int], requests: int, image_size: Tuple[int, int]) -> List[Dict[str, Any]]:
+    """Drive POST /api/v1/analyze in-process through an ASGI client at each concurrency level"""
+    with tempfile.TemporaryDirectory() as model_dir:
+        settings.MODEL_PATH = materialize_synthetic_model(model_dir)
+        return asyncio.run(_run(concurrency_levels, requests, image_size))
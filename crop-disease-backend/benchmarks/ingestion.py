@@ -0,0 +1,79 @@
+# benchmarks/ingestion.py
+import asyncio
+import base64
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+import httpx
+
+from app.utils.config import settings
+from benchmarks.stats import summarize
+from benchmarks.synthetic import make_image, materialize_synthetic_model
+
+# How each transport sends the same image bytes
+TRANSPORTS: Dict[str, Callable[[bytes], Dict[str, Any]]] = {
+    "multipart": lambda payload: {
+        "url": "/api/v1/analyze",
+        "files": {"file": ("leaf.jpg", payload, "image/jpeg")},
+    },
+    "raw": lambda payload: {
+        "url": "/api/v1/analyze/raw",
+        "content": payload,
+        "headers": {"Content-Type": "application/octet-stream"},
+    },
+    "base64": lambda payload: {
+        "url": "/api/v1/analyze/base64",
+        "json": {"image_data": "data:image/jpeg;base64," + base64.b64encode(payload).decode("ascii")},
+    },
+}
+
+
+async def _run_transport(client: httpx.AsyncClient, transport: str, payload: bytes, requests: int) -> Dict[str, Any]:
+    request = TRANSPORTS[transport](payload)
+    url = request.pop("url")
+    latencies: List[float] = []
+    errors = 0
+
+    started = time.perf_counter()
+    for _ in range(requests):
+        request_started = time.perf_counter()
+        response = await client.post(url, **request)
+        latencies.append(time.perf_counter() - request_started)
+        errors += response.status_code != 200
+    elapsed = time.perf_counter() - started
+
+    return {
+        "transport": transport,
+        "requests": requests,
+        "errors": errors,
+        "requests_per_sec": round(requests / elapsed, 2),
+        **summarize(latencies),
+    }
+
+
+async def _run(sizes: List[Tuple[int, int]], requests: int) -> List[Dict[str, Any]]:
+    # Import the app only after MODEL_PATH points at the synthetic model
+    from app.main import app
+
+    results = []
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            for width, height in sizes:
+                payload = make_image(width, height, "JPEG", seed=width * height)
+                # Warm the prediction cache so every timed request skips decode
+                # and inference and only the ingestion path differs
+                await client.post("/api/v1/analyze/raw", content=payload)
+                for name in TRANSPORTS:
+                    entry = await _run_transport(client, name, payload, requests)
+                    results.append({"size": f"{width}x{height}", "bytes": len(payload), **entry})
+    return results
+
+
+def run_ingestion_benchmarks(sizes: List[Tuple[int, int]], requests: int) -> List[Dict[str, Any]]:
+    """Compare multipart, raw-body and base64 JSON uploads of the same image through the app"""
+    with tempfile.TemporaryDirectory() as model_dir:
+        settings.MODEL_PATH = materialize_synthetic_model(model_dir)
+        settings.CACHE_ENABLED = True
+        return asyncio.run(_run(sizes, requests))
@@ -0,0 +1,60 @@
+# benchmarks/stages.py
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+import torch
+
+from app.models.backends import EagerBackend
+from app.models.preprocessing import TensorPreprocessor
+from app.services.image_processing import ImageProcessor
+from benchmarks.stats import summarize
+from benchmarks.synthetic import CONFIG_DIR, build_synthetic_model, make_image
+
+
+def _time(fn: Callable[[], Any], repeats: int, warmup: int = 1) -> List[float]:
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def run_stage_benchmarks(
+    sizes: List[Tuple[int, int]],
+    formats: List[str],
+    batch_sizes: List[int],
+    repeats: int,
+) -> List[Dict[str, Any]]:
+    """Time decode/resize, tensor preprocessing and the model forward separately"""
+    preprocessor = TensorPreprocessor.from_pretrained(CONFIG_DIR)
+    backend = EagerBackend(torch.device("cpu"))
+    backend.model = build_synthetic_model()
+    results = []
+
+    for width, height in sizes:
+        for fmt in formats:
+            image_data = make_image(width, height, fmt)
+            image = ImageProcessor.process_image(image_data)
+            label = {"size": f"{width}x{height}", "format": fmt, "bytes": len(image_data)}
+
+            samples = _time(lambda: ImageProcessor.process_image(image_data), repeats)
+            results.append({"stage": "process_image", **label, **summarize(samples)})
+
+            samples = _time(lambda: preprocessor([image]), repeats)
+            results.append({"stage": "preprocess_image", **label, **summarize(samples)})
+
+    for batch_size in batch_sizes:
+        pixel_values = torch.zeros((batch_size, 3, preprocessor.height, preprocessor.width))
+        samples = _time(lambda: backend.predict_batch(pixel_values), repeats)
+        summary = summarize(samples)
+        results.append({
+            "stage": "forward",
+            "batch_size": batch_size,
+            **summary,
+            "images_per_sec": round(batch_size / (summary["mean_ms"] / 1000), 2) if summary["mean_ms"] else 0.0,
+        })
+
+    return results
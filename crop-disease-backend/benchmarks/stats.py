@@ -0,0 +1,19 @@
+# benchmarks/stats.py
+from typing import Dict, List
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Mean and tail percentiles of timings given in seconds, reported in milliseconds"""
+    if not samples:
+        return {"mean_ms": 0.0, "p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0}
+    ordered = sorted(samples)
+
+    def percentile(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+    return {
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3),
+        "p50_ms": round(percentile(0.50), 3),
+        "p95_ms": round(percentile(0.95), 3),
+        "p99_ms": round(percentile(0.99), 3),
+    }
@@ -0,0 +1,48 @@
+# benchmarks/synthetic.py
+import io
+import os
+import shutil
+from typing import List, Tuple
+
+import numpy as np
+import torch
+from PIL import Image
+from transformers import ViTConfig, ViTForImageClassification
+
+CONFIG_DIR = "app/models/weights/crop_leaf_diseases_vit"
+
+
+def build_synthetic_model(config_dir: str = CONFIG_DIR, seed: int = 0) -> ViTForImageClassification:
+    """Randomly initialised ViT with the production architecture, no download needed"""
+    torch.manual_seed(seed)
+    model = ViTForImageClassification(ViTConfig.from_pretrained(config_dir))
+    return model.eval()
+
+
+def materialize_synthetic_model(directory: str, config_dir: str = CONFIG_DIR, seed: int = 0) -> str:
+    """Write a synthetic model directory that ``CropDiseaseClassifier.load_model`` can load"""
+    build_synthetic_model(config_dir, seed).save_pretrained(directory)
+    preprocessor_config = os.path.join(config_dir, "preprocessor_config.json")
+    if os.path.exists(preprocessor_config):
+        shutil.copy(preprocessor_config, directory)
+    return directory
+
+
+def make_image(width: int, height: int, fmt: str = "JPEG", seed: int = 0) -> bytes:
+    """Photo-like test image: smooth gradients with per-seed noise"""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width]
+    base = np.stack([x * 255 // width, y * 255 // height, (x + y) * 255 // (width + height)], axis=-1)
+    pixels = np.clip(base + rng.integers(-24, 24, size=base.shape), 0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels, "RGB").save(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+def parse_sizes(value: str) -> List[Tuple[int, int]]:
+    """Parse ``"640x480,4032x3024"`` into ``[(640, 480), (4032, 3024)]``"""
+    sizes = []
+    for item in value.split(","):
+        width, height = item.lower().split("x")
+        sizes.append((int(width), int(height)))
+    return sizes
@@ -0,0 +1,333 @@
+# bulk_classify.py
+import argparse
+import csv
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import sys
+import tarfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+# Spawned decode workers re-import this module: keep torch and the model
+# code out of the top-level imports so they start in well under a second
+from app.services.image_processing import ImageProcessor
+from app.utils.config import settings
+
+logger = logging.getLogger("bulk_classify")
+
+FIELDS = ("path", "disease_name", "confidence", "class_index", "error")
+
+# Marks the end of the batch stream on the prefetch queue
+_DONE = object()
+
+
+def iter_images(source: str) -> Iterator[Tuple[str, Union[str, bytes]]]:
+    """``(name, path or bytes)`` for every image in a directory tree or tar archive, in a stable order"""
+    from app.models.precision import IMAGE_EXTENSIONS
+
+    if os.path.isdir(source):
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for filename in sorted(files):
+                if filename.lower().endswith(IMAGE_EXTENSIONS):
+                    path = os.path.join(root, filename)
+                    yield os.path.relpath(path, source), path
+        return
+
+    # Streaming mode reads compressed archives front to back without seeking
+    with tarfile.open(source, "r|*") as archive:
+        for member in archive:
+            if member.isfile() and member.name.lower().endswith(IMAGE_EXTENSIONS):
+                yield member.name, archive.extractfile(member).read()
+
+
+def decode(item: Union[str, bytes], target_size: Tuple[int, int]):
+    """Decode and fit one image in a worker process; returns ``(image, error, seconds)``"""
+    started = time.perf_counter()
+    try:
+        if isinstance(item, str):
+            with open(item, "rb") as f:
+                item = f.read()
+        image = ImageProcessor.process_image(item, target_size)
+        return image, None, time.perf_counter() - started
+    except Exception as e:
+        return None, str(e) or type(e).__name__, time.perf_counter() - started
+
+
+class StageClock:
+    """Busy time per pipeline stage, to tell whether decode or the model is the bottleneck"""
+
+    def __init__(self, decode_workers: int):
+        self.decode_workers = decode_workers
+        self.started = time.perf_counter()
+        self.startup = 0.0  # until the first batch: model load excluded, worker spawn included
+        self.images = 0
+        self.decode = 0.0  # summed over workers
+        self.model = 0.0
+        self.model_starved = 0.0  # model idle, waiting for decoded batches
+        self.decode_blocked = 0.0  # decode idle, prefetch queue full
+
+    def snapshot(self) -> Dict[str, float]:
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        return {
+            "images": self.images,
+            "elapsed_s": round(elapsed, 1),
+            "startup_s": round(self.startup, 1),
+            "images_per_sec": round(self.images / elapsed, 2),
+            "decode_utilisation": round(self.decode / (elapsed * self.decode_workers), 3),
+            "model_utilisation": round(self.model / elapsed, 3),
+            "model_starved": round(self.model_starved / elapsed, 3),
+            "decode_blocked": round(self.decode_blocked / elapsed, 3),
+        }
+
+    def report(self) -> str:
+        stats = self.snapshot()
+        bottleneck = "decode" if stats["model_starved"] > stats["decode_blocked"] else "model"
+        return (
+            f"{stats['images']} images, {stats['images_per_sec']:.1f} img/s | "
+            f"decode {stats['decode_utilisation']:.0%} of {self.decode_workers} workers, "
+            f"model {stats['model_utilisation']:.0%} busy, starved {stats['model_starved']:.0%} | "
+            f"bottleneck: {bottleneck}"
+        )
+
+
+class ResultWriter:
+    """Appends result rows as CSV or JSONL and checkpoints how far the run got.
+
+    The checkpoint records how many source images are fully written and the
+    output size at that point; resuming truncates rows written after it
+    and skips that many images, so every image appears exactly once.
+    """
+
+    def __init__(self, path: str, source: str, resume: bool):
+        self.path = path
+        self.checkpoint_path = path + ".checkpoint.json"
+        self.jsonl = path.endswith((".jsonl", ".ndjson"))
+        self.done = 0
+
+        checkpoint = self._read_checkpoint() if resume else None
+        if checkpoint is not None:
+            if checkpoint["source"] != os.path.abspath(source):
+                raise ValueError(f"Checkpoint {self.checkpoint_path} belongs to {checkpoint['source']}")
+            self.done = checkpoint["done"]
+            self.file = open(path, "r+", newline="")
+            self.file.truncate(checkpoint["output_bytes"])
+            self.file.seek(checkpoint["output_bytes"])
+        else:
+            self.file = open(path, "w", newline="")
+        self.csv = None if self.jsonl else csv.DictWriter(self.file, fieldnames=FIELDS)
+        if self.csv is not None and self.file.tell() == 0:
+            self.csv.writeheader()
+        self.source = os.path.abspath(source)
+        self.complete = bool(checkpoint and checkpoint.get("complete"))
+
+    def _read_checkpoint(self) -> Optional[Dict[str, Any]]:
+        if not (os.path.exists(self.checkpoint_path) and os.path.exists(self.path)):
+            return None
+        with open(self.checkpoint_path, "r") as f:
+            return json.load(f)
+
+    def write(self, row: Dict[str, Any]):
+        if self.jsonl:
+            self.file.write(json.dumps(row) + "\n")
+        else:
+            self.csv.writerow(row)
+        self.done += 1
+
+    def checkpoint(self, complete: bool = False):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        state = {"source": self.source, "done": self.done, "output_bytes": self.file.tell(), "complete": complete}
+        tmp_path = self.checkpoint_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def close(self):
+        self.file.close()
+
+
+def produce_batches(items, pool, batch_size: int, window: int, batches: queue.Queue,
+                    clock: StageClock, target_size: Tuple[int, int], stop: threading.Event):
+    """Decode images on the pool, in order, and queue fixed-size batches for the model"""
+
+    def put(batch):
+        started = time.perf_counter()
+        while not stop.is_set():
+            try:
+                batches.put(batch, timeout=0.5)
+                break
+            except queue.Full:
+                continue
+        clock.decode_blocked += time.perf_counter() - started
+
+    try:
+        in_flight: deque = deque()
+        batch: List[Tuple[str, Any, Optional[str]]] = []
+        items = iter(items)
+        exhausted = False
+        while not stop.is_set() and (in_flight or not exhausted):
+            # Keep a bounded number of decodes in flight so memory stays flat
+            while not exhausted and len(in_flight) < window:
+                item = next(items, None)
+                if item is None:
+                    exhausted = True
+                    break
+                name, payload = item
+                in_flight.append((name, pool.submit(decode, payload, target_size)))
+            if not in_flight:
+                break
+
+            name, future = in_flight.popleft()
+            image, error, seconds = future.result()
+            clock.decode += seconds
+            batch.append((name, image, error))
+            if len(batch) == batch_size:
+                put(batch)
+                batch = []
+        if batch:
+            put(batch)
+    except Exception as e:
+        logger.error(f"Reading images failed: {str(e)}")
+        put(e)
+    finally:
+        put(_DONE)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Classify a directory tree or tar archive of images offline, with resumable CSV/JSONL output"
+    )
+    parser.add_argument("source", help="image directory or .tar/.tar.gz archive")
+    parser.add_argument("--output", default="bulk_results.csv", help="results file; .jsonl writes JSON lines, anything else CSV")
+    parser.add_argument("--model-path", default=settings.MODEL_PATH)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--decode-workers", type=int, default=max(1, (os.cpu_count() or 2) - 1))
+    parser.add_argument("--prefetch", type=int, default=4, help="decoded batches queued ahead of the model")
+    parser.add_argument("--torch-threads", type=int, default=settings.TORCH_NUM_THREADS, help="0 keeps torch's default")
+    parser.add_argument("--checkpoint-every", type=int, default=20, help="batches between checkpoints")
+    parser.add_argument("--report-every", type=float, default=10.0, help="seconds between progress lines")
+    parser.add_argument("--restart", action="store_true", help="ignore an existing checkpoint and start over")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    if not os.path.exists(args.source):
+        parser.error(f"{args.source} does not exist")
+
+    import torch
+    from app.models.disease_classifier import classifier
+
+    if args.torch_threads > 0:
+        torch.set_num_threads(args.torch_threads)
+    settings.MODEL_PATH = args.model_path
+    settings.SIMILARITY_ENABLED = False
+    try:
+        classifier.load_model()
+    except Exception as e:
+        print(f"No model could be loaded from {args.model_path}: {str(e)}", file=sys.stderr)
+        return 1
+    if classifier.backend is None:
+        print(f"No model could be loaded from {args.model_path}", file=sys.stderr)
+        return 1
+    target_size = (classifier.preprocessor.width, classifier.preprocessor.height)
+
+    writer = ResultWriter(args.output, args.source, resume=not args.restart)
+    if writer.complete:
+        print(f"{args.output} is already complete ({writer.done} images); use --restart to run again")
+        writer.close()
+        return 0
+    if writer.done:
+        print(f"Resuming after {writer.done} images already in {args.output}")
+
+    # Resumed runs skip already written images without decoding them
+    items = iter_images(args.source)
+    for _ in range(writer.done):
+        if next(items, None) is None:
+            break
+
+    clock = StageClock(args.decode_workers)
+    batches: queue.Queue = queue.Queue(maxsize=max(1, args.prefetch))
+    stop = threading.Event()
+    pool = ProcessPoolExecutor(
+        max_workers=args.decode_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+    )
+    producer = threading.Thread(
+        target=produce_batches,
+        args=(items, pool, args.batch_size, args.decode_workers * 4, batches, clock, target_size, stop),
+        daemon=True,
+    )
+    producer.start()
+
+    status = 0
+    batches_written = 0
+    last_report = time.perf_counter()
+    try:
+        while True:
+            started = time.perf_counter()
+            batch = batches.get()
+            if batches_written == 0:
+                # Spawning decode workers isn't steady-state starvation
+                clock.started = time.perf_counter()
+                clock.startup = clock.started - started
+            else:
+                clock.model_starved += time.perf_counter() - started
+            if batch is _DONE:
+                break
+            if isinstance(batch, Exception):
+                status = 1
+                break
+
+            images = [image for _, image, _ in batch if image is not None]
+            started = time.perf_counter()
+            predictions = classifier.predict_batch(images) if images else []
+            clock.model += time.perf_counter() - started
+            # predict_batch falls back to random mock predictions when the forward pass fails;
+            # stop before they reach the output, so a rerun resumes at this batch
+            if any(prediction[5] is None for prediction in predictions):
+                raise RuntimeError(f"Model inference failed after image {writer.done}; see the log above")
+            predictions = iter(predictions)
+
+            for name, image, error in batch:
+                if image is None:
+                    writer.write({"path": name, "disease_name": "", "confidence": "", "class_index": "", "error": error})
+                    continue
+                disease_name, confidence, class_index, _, _, _ = next(predictions)
+                writer.write({
+                    "path": name, "disease_name": disease_name, "confidence": round(confidence, 2),
+                    "class_index": class_index, "error": "",
+                })
+            clock.images += len(batch)
+
+            batches_written += 1
+            if batches_written % args.checkpoint_every == 0:
+                writer.checkpoint()
+            if time.perf_counter() - last_report >= args.report_every:
+                print(clock.report(), file=sys.stderr)
+                last_report = time.perf_counter()
+    except KeyboardInterrupt:
+        print(f"Interrupted; rerun the same command to resume after image {writer.done}", file=sys.stderr)
+        status = 130
+    except Exception:
+        # Not complete: the next run resumes from the last checkpoint
+        status = 1
+        raise
+    finally:
+        stop.set()
+        writer.checkpoint(complete=status == 0)
+        writer.close()
+        pool.shutdown(wait=True, cancel_futures=True)
+
+    print(clock.report())
+    print(json.dumps(clock.snapshot()))
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+# check_preprocessing.py
+import io
+import sys
+
+import numpy as np
+import torch
+from PIL import Image, ImageOps
+from transformers import ViTImageProcessor
+
+from app.models.preprocessing import TensorPreprocessor
+from app.services.image_processing import ImageProcessor
+
+MODEL_PATH = "app/models/weights/crop_leaf_diseases_vit"
+
+# Same fitted pixels in, same tensor out: only float rounding may differ
+FITTED_TOLERANCE = 1e-5
+# JPEG draft decoding changes the pixels fed to the resize, so compare the
+# full bytes -> tensor path on the mean error with a looser bound
+END_TO_END_MEAN_TOLERANCE = 0.05
+
+
+def make_test_images():
+    """Synthetic photos covering small, large, portrait, non-RGB and PNG inputs"""
+    rng = np.random.default_rng(0)
+    cases = []
+    for width, height, fmt, mode in [
+        (224, 224, "JPEG", "RGB"),
+        (640, 480, "JPEG", "RGB"),
+        (4032, 3024, "JPEG", "RGB"),
+        (1080, 1920, "JPEG", "RGB"),
+        (800, 600, "PNG", "RGBA"),
+        (512, 512, "PNG", "L"),
+    ]:
+        # Smooth gradients plus noise behave more like photos than pure noise
+        y, x = np.mgrid[0:height, 0:width]
+        base = np.stack([x * 255 // width, y * 255 // height, (x + y) * 255 // (width + height)], axis=-1)
+        noise = rng.integers(-20, 20, size=base.shape)
+        pixels = np.clip(base + noise, 0, 255).astype(np.uint8)
+        image = Image.fromarray(pixels, "RGB").convert(mode)
+        buffer = io.BytesIO()
+        image.save(buffer, format=fmt)
+        cases.append((f"{width}x{height} {fmt} {mode}", buffer.getvalue()))
+    return cases
+
+
+def reference_pixels(processor: ViTImageProcessor, image_data: bytes) -> torch.Tensor:
+    """The previous path: full decode, LANCZOS fit, then the HF processor"""
+    image = Image.open(io.BytesIO(image_data))
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    image = ImageOps.fit(image, (224, 224), Image.Resampling.LANCZOS)
+    return processor(images=image, return_tensors="pt").pixel_values, image
+
+
+def check_preprocessing():
+    processor = ViTImageProcessor.from_pretrained(MODEL_PATH)
+    preprocessor = TensorPreprocessor.from_pretrained(MODEL_PATH)
+    failures = 0
+
+    for name, image_data in make_test_images():
+        expected, fitted = reference_pixels(processor, image_data)
+
+        fused_fitted = preprocessor([fitted])
+        fitted_diff = (fused_fitted - expected).abs().max().item()
+
+        fused = preprocessor([ImageProcessor.process_image(image_data)])
+        end_to_end_diff = (fused - expected).abs().mean().item()
+
+        ok = fitted_diff <= FITTED_TOLERANCE and end_to_end_diff <= END_TO_END_MEAN_TOLERANCE
+        failures += not ok
+        print(
+            f"{'OK  ' if ok else 'FAIL'} {name:24s} "
+            f"fitted max|diff|={fitted_diff:.2e}  end-to-end mean|diff|={end_to_end_diff:.4f}"
+        )
+
+    # Batched output must match per-image output exactly
+    images = [ImageProcessor.process_image(data) for _, data in make_test_images()]
+    batched = preprocessor(images)
+    single = torch.cat([preprocessor([image]) for image in images])
+    if not torch.equal(batched, single):
+        failures += 1
+        print("FAIL batched output differs from per-image output")
+
+    print("Preprocessing parity:", "passed" if not failures else f"{failures} failure(s)")
+    return failures == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if check_preprocessing() else 1)
@@ -0,0 +1,50 @@
+# evaluate_precision.py
+import argparse
+import json
+import sys
+
+import torch
+
+from app.models.backends import EagerBackend
+from app.models.precision import evaluate_precision
+from app.models.preprocessing import TensorPreprocessor
+from app.utils.config import settings
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare reduced-precision inference against fp32 on a labelled image folder"
+    )
+    parser.add_argument("image_dir", help="folder with one sub-folder of images per class name")
+    parser.add_argument("--model-path", default=settings.MODEL_PATH)
+    parser.add_argument(
+        "--precision", action="append", choices=["int8-dynamic", "bf16"],
+        help="mode to evaluate (repeatable, defaults to all reduced modes)"
+    )
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--limit", type=int, default=0, help="evaluate at most this many images")
+    parser.add_argument("--min-agreement", type=float, default=settings.PRECISION_MIN_AGREEMENT)
+    args = parser.parse_args()
+
+    device = torch.device("cpu")
+    preprocessor = TensorPreprocessor.from_pretrained(args.model_path)
+    reference = EagerBackend(device, "fp32")
+    reference.load(args.model_path)
+
+    passed = True
+    for precision in args.precision or ["int8-dynamic", "bf16"]:
+        candidate = EagerBackend(device, precision)
+        candidate.load(args.model_path)
+        report = evaluate_precision(
+            reference, candidate, preprocessor, settings.DISEASE_CLASSES,
+            args.image_dir, batch_size=args.batch_size, limit=args.limit
+        )
+        report["passes_gate"] = report["top1_agreement"] >= args.min_agreement
+        passed = passed and report["passes_gate"]
+        print(json.dumps(report))
+
+    return passed
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
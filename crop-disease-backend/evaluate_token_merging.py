@@ -0,0 +1,54 @@
+# evaluate_token_merging.py
+import argparse
+import json
+import sys
+
+import torch
+
+from app.models.backends import EagerBackend
+from app.models.encoder import encoder_layers
+from app.models.precision import evaluate_precision
+from app.models.preprocessing import TensorPreprocessor
+from app.models.token_merging import parse_schedule
+from app.utils.config import settings
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Throughput gain vs top-1 agreement of token merging schedules against the unmodified model"
+    )
+    parser.add_argument("image_dir", help="folder with one sub-folder of images per class name")
+    parser.add_argument("--model-path", default=settings.MODEL_PATH)
+    parser.add_argument(
+        "--schedule", action="append",
+        help="tokens merged per layer: one value or one per layer (repeatable, default 4, 8, 12, 16)"
+    )
+    parser.add_argument("--precision", default="fp32", choices=["fp32", "int8-dynamic", "bf16"])
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--limit", type=int, default=0, help="evaluate at most this many images")
+    args = parser.parse_args()
+
+    device = torch.device("cpu")
+    preprocessor = TensorPreprocessor.from_pretrained(args.model_path)
+    reference = EagerBackend(device, args.precision)
+    reference.load(args.model_path)
+    candidate = EagerBackend(device, args.precision)
+    candidate.load(args.model_path)
+    num_layers = len(encoder_layers(candidate.model))
+
+    for value in args.schedule or ["4", "8", "12", "16"]:
+        schedule = parse_schedule(value, num_layers)
+        candidate.enable_token_merging(schedule)
+        report = evaluate_precision(
+            reference, candidate, preprocessor, settings.DISEASE_CLASSES,
+            args.image_dir, batch_size=args.batch_size, limit=args.limit
+        )
+        report["schedule"] = value
+        report["throughput_gain"] = round(report["reference_batch_ms"] / report["candidate_batch_ms"], 3)
+        print(json.dumps(report))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
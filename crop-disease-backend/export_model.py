@@ -0,0 +1,120 @@
+# export_model.py
+import argparse
+import os
+import sys
+
+import torch
+import torch.nn as nn
+from transformers import ViTConfig, ViTForImageClassification
+
+from app.models.backends import OnnxRuntimeBackend, TorchScriptBackend
+from app.utils.config import settings
+
+# Max absolute logit difference allowed between eager and exported graphs
+LOGIT_TOLERANCE = 1e-3
+
+
+class LogitsOnly(nn.Module):
+    """Wrap the HF model so the exported graph returns a plain logits tensor"""
+
+    def __init__(self, model: ViTForImageClassification):
+        super().__init__()
+        self.model = model
+
+    def forward(self, pixel_values: torch.Tensor) -> torch.Tensor:
+        return self.model(pixel_values).logits
+
+
+def load_eager_model(model_path: str, random_init: bool) -> ViTForImageClassification:
+    if random_init:
+        # The repository only ships config.json; a randomly initialised model
+        # still exercises the export and parity check end to end
+        print(f"Building randomly initialised model from {model_path}/config.json")
+        model = ViTForImageClassification(ViTConfig.from_pretrained(model_path))
+    else:
+        model = ViTForImageClassification.from_pretrained(model_path)
+    return model.eval()
+
+
+def export_torchscript(wrapper: nn.Module, example: torch.Tensor, path: str):
+    with torch.no_grad():
+        traced = torch.jit.trace(wrapper, example)
+        traced = torch.jit.freeze(traced)
+    traced.save(path)
+    print(f"TorchScript graph written to {path}")
+
+
+def export_onnx(wrapper: nn.Module, example: torch.Tensor, path: str):
+    with torch.no_grad():
+        torch.onnx.export(
+            wrapper,
+            (example,),
+            path,
+            input_names=["pixel_values"],
+            output_names=["logits"],
+            dynamic_axes={"pixel_values": {0: "batch"}, "logits": {0: "batch"}},
+            opset_version=17,
+            dynamo=False,
+        )
+    print(f"ONNX graph written to {path}")
+
+
+def check_parity(model: ViTForImageClassification, output_dir: str, image_size: int) -> bool:
+    """Compare logits of every exported backend against eager PyTorch"""
+    device = torch.device("cpu")
+    backends = []
+    for backend_class in (TorchScriptBackend, OnnxRuntimeBackend):
+        backend = backend_class(device)
+        try:
+            backend.load(output_dir)
+        except (ImportError, FileNotFoundError) as e:
+            print(f"Skipping {backend_class.name}: {e}")
+            continue
+        backends.append(backend)
+
+    ok = True
+    generator = torch.Generator().manual_seed(0)
+    for batch_size in (1, 4):
+        pixel_values = torch.randn((batch_size, 3, image_size, image_size), generator=generator)
+        with torch.no_grad():
+            expected = model(pixel_values).logits
+        for backend in backends:
+            logits = backend.predict_batch(pixel_values)
+            diff = (logits - expected).abs().max().item()
+            same_top1 = torch.equal(logits.argmax(-1), expected.argmax(-1))
+            passed = diff <= LOGIT_TOLERANCE and same_top1
+            ok = ok and passed
+            print(
+                f"{'OK  ' if passed else 'FAIL'} {backend.name:12s} batch={batch_size} "
+                f"max|logit diff|={diff:.2e} top1 match={same_top1}"
+            )
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the ViT model to TorchScript and ONNX")
+    parser.add_argument("--model-path", default=settings.MODEL_PATH)
+    parser.add_argument("--output-dir", default=None, help="defaults to --model-path")
+    parser.add_argument("--random-init", action="store_true", help="export a randomly initialised model built from config.json")
+    parser.add_argument("--skip-onnx", action="store_true")
+    args = parser.parse_args()
+
+    output_dir = args.output_dir or args.model_path
+    os.makedirs(output_dir, exist_ok=True)
+
+    model = load_eager_model(args.model_path, args.random_init)
+    image_size = model.config.image_size
+    wrapper = LogitsOnly(model).eval()
+    example = torch.zeros((2, 3, image_size, image_size))
+
+    export_torchscript(wrapper, example, os.path.join(output_dir, settings.TORCHSCRIPT_FILE))
+    if not args.skip_onnx:
+        export_onnx(wrapper, example, os.path.join(output_dir, settings.ONNX_FILE))
+
+    ok = check_parity(model, output_dir, image_size)
+    print("Backend parity:", "passed" if ok else "FAILED")
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
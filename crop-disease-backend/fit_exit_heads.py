@@ -0,0 +1,164 @@
+# fit_exit_heads.py
+import argparse
+import json
+import os
+import random
+import sys
+from typing import Dict, List
+
+import torch
+import torch.nn.functional as F
+
+from app.models.backends import EagerBackend
+from app.models.early_exit import ExitHeads
+from app.models.encoder import classify, embed, encoder_layers, run_layer
+from app.models.precision import load_labelled_images
+from app.models.preprocessing import TensorPreprocessor
+from app.services.image_processing import ImageProcessor
+from app.utils.config import settings
+
+
+@torch.no_grad()
+def extract_features(model, preprocessor, paths: List[str], layers: List[int], batch_size: int):
+    """CLS token after each candidate layer, plus the full model's logits, for every image"""
+    features: Dict[int, List[torch.Tensor]] = {layer: [] for layer in layers}
+    final_logits = []
+    blocks = encoder_layers(model)
+    for start in range(0, len(paths), batch_size):
+        images = []
+        for path in paths[start:start + batch_size]:
+            with open(path, "rb") as f:
+                images.append(ImageProcessor.process_image(f.read()))
+        hidden_states = embed(model, preprocessor(images))
+        for number, block in enumerate(blocks, start=1):
+            hidden_states = run_layer(block, hidden_states)
+            if number in features:
+                features[number].append(hidden_states[:, 0].float())
+        final_logits.append(classify(model, hidden_states))
+        print(f"  features {min(start + batch_size, len(paths))}/{len(paths)}", file=sys.stderr)
+    return {layer: torch.cat(chunks) for layer, chunks in features.items()}, torch.cat(final_logits)
+
+
+def fit_head(head, features: torch.Tensor, targets: torch.Tensor, soft_targets: torch.Tensor,
+             epochs: int, lr: float, distill_weight: float):
+    """Cross-entropy on the labels plus KL towards the full model's predictions"""
+    optimizer = torch.optim.AdamW(head.parameters(), lr=lr, weight_decay=1e-4)
+    head.train()
+    for _ in range(epochs):
+        order = torch.randperm(len(features))
+        for start in range(0, len(order), 64):
+            batch = order[start:start + 64]
+            logits = head(features[batch])
+            loss = F.cross_entropy(logits, targets[batch])
+            if distill_weight > 0:
+                loss = loss + distill_weight * F.kl_div(
+                    F.log_softmax(logits, dim=-1), soft_targets[batch], reduction="batchmean"
+                )
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+    head.eval()
+
+
+@torch.no_grad()
+def simulate(heads: ExitHeads, features, final_logits, labels, num_layers: int, threshold: float):
+    """Accuracy, agreement with the full model and mean exit layer at one threshold"""
+    count = len(final_logits)
+    predictions = final_logits.argmax(dim=-1).clone()
+    exits = torch.full((count,), num_layers)
+    pending = torch.ones(count, dtype=torch.bool)
+    for layer in heads.layers:
+        if layer >= num_layers:
+            continue
+        probabilities = torch.softmax(heads(layer, features[layer]), dim=-1)
+        confidence, predicted = probabilities.max(dim=-1)
+        done = pending & (confidence >= threshold)
+        predictions[done] = predicted[done]
+        exits[done] = layer
+        pending &= ~done
+
+    full = final_logits.argmax(dim=-1)
+    mean_exit = exits.float().mean().item()
+    return {
+        "threshold": threshold,
+        "accuracy": round((predictions == labels).float().mean().item(), 4),
+        "full_model_accuracy": round((full == labels).float().mean().item(), 4),
+        "agreement_with_full_model": round((predictions == full).float().mean().item(), 4),
+        "mean_exit_layer": round(mean_exit, 2),
+        # Embeddings and heads are cheap next to the encoder blocks
+        "encoder_compute_fraction": round(mean_exit / num_layers, 3),
+        "exit_histogram": {str(layer): int((exits == layer).sum()) for layer in heads.layers + [num_layers]},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Fit early-exit classifier heads on intermediate ViT layers from a labelled image folder"
+    )
+    parser.add_argument("image_dir", help="folder with one sub-folder of images per class name")
+    parser.add_argument("--model-path", default=settings.MODEL_PATH)
+    parser.add_argument("--layers", default="3,6,9", help="comma-separated 1-based layers to attach heads to")
+    parser.add_argument("--epochs", type=int, default=30)
+    parser.add_argument("--lr", type=float, default=1e-3)
+    parser.add_argument("--distill-weight", type=float, default=1.0,
+                        help="weight of matching the full model's predictions (0 trains on labels only)")
+    parser.add_argument("--val-fraction", type=float, default=0.2)
+    parser.add_argument("--thresholds", default="0.8,0.85,0.9,0.95,0.99")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--limit", type=int, default=0, help="use at most this many images")
+    parser.add_argument("--output", help=f"defaults to MODEL_PATH/{settings.EARLY_EXIT_HEADS_FILE}")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    torch.manual_seed(args.seed)
+    samples = [
+        (path, label) for path, label in load_labelled_images(args.image_dir)
+        if label in settings.DISEASE_CLASSES
+    ]
+    random.Random(args.seed).shuffle(samples)
+    if args.limit:
+        samples = samples[:args.limit]
+    if len(samples) < 10:
+        parser.error(f"need at least 10 images labelled with known classes in {args.image_dir}")
+
+    backend = EagerBackend(torch.device("cpu"), "fp32")
+    backend.load(args.model_path)
+    model = backend.model
+    num_layers = len(encoder_layers(model))
+    layers = sorted({int(layer) for layer in args.layers.split(",")})
+    if not all(1 <= layer < num_layers for layer in layers):
+        parser.error(f"layers must be between 1 and {num_layers - 1}")
+
+    preprocessor = TensorPreprocessor.from_pretrained(args.model_path)
+    features, final_logits = extract_features(
+        model, preprocessor, [path for path, _ in samples], layers, args.batch_size
+    )
+    labels = torch.tensor([settings.DISEASE_CLASSES.index(label) for _, label in samples])
+    soft_targets = torch.softmax(final_logits, dim=-1)
+
+    split = max(1, int(len(samples) * args.val_fraction))
+    val, train = slice(0, split), slice(split, None)
+
+    heads = ExitHeads.from_model(model, layers)
+    for layer in layers:
+        fit_head(
+            heads.heads[str(layer)], features[layer][train], labels[train], soft_targets[train],
+            args.epochs, args.lr, args.distill_weight
+        )
+
+    val_features = {layer: tensor[val] for layer, tensor in features.items()}
+    report = [
+        simulate(heads, val_features, final_logits[val], labels[val], num_layers, float(threshold))
+        for threshold in args.thresholds.split(",")
+    ]
+    for row in report:
+        print(json.dumps(row))
+
+    output = args.output or os.path.join(args.model_path, settings.EARLY_EXIT_HEADS_FILE)
+    heads.save(output, {"train_images": len(samples) - split, "val_images": split, "thresholds": report})
+    print(f"Saved heads for layers {layers} to {output}; enable with EARLY_EXIT_ENABLED=true", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
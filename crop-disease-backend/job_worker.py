@@ -0,0 +1,46 @@
+# job_worker.py
+import argparse
+import logging
+import signal
+import threading
+
+from app.models.disease_classifier import classifier
+from app.services.jobs import create_job_queue
+from app.services.jobs.worker import JobWorker
+from app.services.prediction_log import prediction_log
+from app.utils.config import settings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Standalone worker for queued analysis jobs")
+    parser.add_argument("--backend", default=settings.JOB_QUEUE_BACKEND, choices=["sqlite", "redis"])
+    parser.add_argument("--batch-size", type=int, default=settings.JOB_BATCH_SIZE)
+    parser.add_argument("--poll-timeout", type=float, default=settings.JOB_POLL_TIMEOUT)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    warmup_batch_sizes = settings.WARMUP_BATCH_SIZES or sorted({1, args.batch_size})
+    classifier.load_and_warmup(warmup_batch_sizes, settings.WARMUP_ITERATIONS)
+
+    stop_event = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop_event.set())
+
+    # Results are flushed to the shared prediction log from a side thread
+    flush_stop = threading.Event()
+    flusher = threading.Thread(target=prediction_log.run_forever, args=(flush_stop,), name="prediction-log", daemon=True)
+    if prediction_log.enabled:
+        flusher.start()
+
+    worker = JobWorker(create_job_queue(args.backend), args.batch_size, args.poll_timeout)
+    try:
+        worker.run_forever(stop_event)
+    finally:
+        if flusher.is_alive():
+            flush_stop.set()
+            flusher.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# memory_report.py
+import argparse
+import json
+import os
+import sys
+from typing import Dict, List
+
+# smaps_rollup fields, in kB
+FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty")
+
+
+def read_memory(pid: int) -> Dict[str, int]:
+    """Memory totals of one process in bytes, from /proc/<pid>/smaps_rollup (or smaps on older kernels)"""
+    totals = dict.fromkeys(FIELDS, 0)
+    path = f"/proc/{pid}/smaps_rollup"
+    if not os.path.exists(path):
+        path = f"/proc/{pid}/smaps"
+    with open(path, "r") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if key in totals:
+                totals[key] += int(rest.split()[0]) * 1024
+    return totals
+
+
+def children_of(pid: int) -> List[int]:
+    children = []
+    for task in os.listdir(f"/proc/{pid}/task"):
+        with open(f"/proc/{pid}/task/{task}/children", "r") as f:
+            children.extend(int(child) for child in f.read().split())
+    return sorted(children)
+
+
+def command_line(pid: int) -> str:
+    with open(f"/proc/{pid}/cmdline", "rb") as f:
+        return f.read().replace(b"\0", b" ").decode(errors="replace").strip()
+
+
+def report(pids: List[int]) -> Dict[str, object]:
+    processes = []
+    for pid in pids:
+        memory = read_memory(pid)
+        processes.append({
+            "pid": pid,
+            "command": command_line(pid),
+            "rss": memory["Rss"],
+            "pss": memory["Pss"],
+            # Pages nobody else maps: what this process alone costs
+            "unique": memory["Private_Clean"] + memory["Private_Dirty"],
+            "shared": memory["Shared_Clean"] + memory["Shared_Dirty"],
+        })
+    return {
+        "processes": processes,
+        # Sum of RSS counts shared pages once per process: the cost without sharing
+        "total_rss": sum(p["rss"] for p in processes),
+        # Sum of PSS splits shared pages between their users: the real footprint
+        "total_pss": sum(p["pss"] for p in processes),
+    }
+
+
+def _mb(value: int) -> str:
+    return f"{value / (1024 * 1024):9.1f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Per-process unique vs shared memory of the serving workers (Linux only)"
+    )
+    parser.add_argument("pids", nargs="*", type=int, help="processes to report")
+    parser.add_argument("--master", type=int, help="report this serve.py master and all its workers")
+    parser.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    args = parser.parse_args()
+
+    pids = list(args.pids)
+    if args.master:
+        pids = [args.master] + children_of(args.master) + pids
+    if not pids:
+        parser.error("give process ids or --master")
+
+    result = report(pids)
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return 0
+
+    print(f"{'pid':>8} {'rss MB':>9} {'pss MB':>9} {'unique MB':>9} {'shared MB':>9}  command")
+    for p in result["processes"]:
+        print(
+            f"{p['pid']:>8} {_mb(p['rss'])} {_mb(p['pss'])} {_mb(p['unique'])} {_mb(p['shared'])}  "
+            f"{p['command'][:60]}"
+        )
+    saved = result["total_rss"] - result["total_pss"]
+    print(f"\ntotal RSS {_mb(result['total_rss']).strip()} MB, total PSS {_mb(result['total_pss']).strip()} MB "
+          f"({_mb(saved).strip()} MB saved by sharing)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
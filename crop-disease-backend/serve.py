@@ -0,0 +1,131 @@
+# serve.py
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Dict
+
+import uvicorn
+
+from app.utils.config import settings
+
+logger = logging.getLogger("serve")
+
+# Backends whose loaded state cannot cross a fork: ONNX Runtime starts its
+# thread pool when the session is created, and forked children get none
+FORK_UNSAFE_BACKENDS = ("onnx",)
+
+
+def preload_model():
+    """Load the model once in the master so every worker inherits the same pages.
+
+    After fork the weight tensors are shared copy-on-write. Inference never
+    writes to them, and their storage is allocated apart from the Python
+    objects, so refcount updates on ``Parameter`` objects only dirty small
+    object headers. ``gc.freeze()`` moves everything allocated so far out of
+    the collector's reach, so garbage collection in the workers doesn't
+    touch (and copy) those objects either.
+    """
+    from app.models.disease_classifier import classifier
+
+    if settings.INFERENCE_BACKEND in FORK_UNSAFE_BACKENDS:
+        logger.warning(f"{settings.INFERENCE_BACKEND} backend can't be shared across fork; each worker loads its own")
+    elif classifier.device.type == "cuda":
+        logger.warning("CUDA can't be initialized before fork; each worker loads its own model")
+    else:
+        started = time.perf_counter()
+        try:
+            classifier.load_model()
+        except Exception as e:
+            # Each worker retries and reports the failure through /ready
+            logger.error(f"Model preload failed, workers load their own: {str(e)}")
+            return
+        logger.info(f"Preloaded model in {time.perf_counter() - started:.2f}s for sharing across workers")
+
+
+def spawn_worker(app, sock: socket.socket) -> int:
+    pid = os.fork()
+    if pid:
+        return pid
+
+    # Worker: default signal handling, then serve on the inherited socket
+    for sig in (signal.SIGINT, signal.SIGTERM, signal.SIGCHLD):
+        signal.signal(sig, signal.SIG_DFL)
+    config = uvicorn.Config(app, host=settings.HOST, port=settings.PORT, log_level="info")
+    try:
+        uvicorn.Server(config).run(sockets=[sock])
+    finally:
+        os._exit(0)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Pre-fork server: load the model once, then fork uvicorn workers that share it"
+    )
+    parser.add_argument("--workers", type=int, default=settings.WORKERS)
+    parser.add_argument("--host", default=settings.HOST)
+    parser.add_argument("--port", type=int, default=settings.PORT)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    settings.HOST, settings.PORT = args.host, args.port
+
+    # Split the cores between workers instead of every worker claiming all of them
+    if settings.TORCH_NUM_THREADS <= 0:
+        settings.TORCH_NUM_THREADS = max(1, (os.cpu_count() or 1) // args.workers)
+
+    sock = uvicorn.Config("app.main:app", host=args.host, port=args.port).bind_socket()
+    sock.set_inheritable(True)
+
+    preload_model()
+    from app.main import app
+
+    gc.collect()
+    gc.freeze()
+
+    workers: Dict[int, float] = {}
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    for _ in range(args.workers):
+        workers[spawn_worker(app, sock)] = time.monotonic()
+    logger.info(f"Master {os.getpid()} serving on {args.host}:{args.port} with workers {sorted(workers)}")
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        started = workers.pop(pid, None)
+        if started is None or stopping:
+            continue
+
+        logger.warning(f"Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}; restarting")
+        # Don't spin if workers die right after starting
+        if time.monotonic() - started < 1.0:
+            time.sleep(1.0)
+        workers[spawn_worker(app, sock)] = time.monotonic()
+
+    sock.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())